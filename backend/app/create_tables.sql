@@ -1,3 +1,16 @@
+-- Version counters used to invalidate process-local caches across workers
+CREATE TABLE IF NOT EXISTS cache_versions (
+    name VARCHAR(150) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- One-off data migrations already applied to this database, see run_migrations
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    name VARCHAR(150) PRIMARY KEY,
+    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 CREATE TABLE IF NOT EXISTS users (
     id INT AUTO_INCREMENT PRIMARY KEY,
     username VARCHAR(50) NOT NULL UNIQUE,
@@ -55,11 +68,19 @@ CREATE TABLE IF NOT EXISTS products (
     reorder_amount INT DEFAULT 100,
     category VARCHAR(100) NOT NULL,
     image_url VARCHAR(500),
+    thumbnail_url VARCHAR(500),
+    image_width INT,
+    image_height INT,
+    image_color CHAR(7),
+    version INT NOT NULL DEFAULT 1,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (supplier_id) REFERENCES suppliers(id) ON DELETE RESTRICT,
     INDEX idx_products_supplier_id (supplier_id),
-    INDEX idx_products_category (category)
+    UNIQUE INDEX idx_products_supplier_name (supplier_id, name),
+    INDEX idx_products_category (category),
+    INDEX idx_products_updated_at (updated_at, id),
+    FULLTEXT INDEX ft_products_name_description (name, description)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 CREATE TABLE IF NOT EXISTS supplier_orders (
@@ -69,11 +90,16 @@ CREATE TABLE IF NOT EXISTS supplier_orders (
     status ENUM('processing', 'arrived', 'completed') NOT NULL DEFAULT 'processing',
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    arrived_at DATETIME,
     completed_at DATETIME,
+    -- set only while the order is open, so each supplier has at most one
+    open_supplier_id INT AS (IF(status = 'processing', supplier_id, NULL)) STORED,
     FOREIGN KEY (supplier_id) REFERENCES suppliers(id) ON DELETE RESTRICT,
     FOREIGN KEY (employee_id) REFERENCES users(id) ON DELETE SET NULL,
     INDEX idx_supplier_orders_supplier_id (supplier_id),
-    INDEX idx_supplier_orders_status (status)
+    INDEX idx_supplier_orders_status (status),
+    INDEX idx_supplier_orders_supplier_status (supplier_id, status),
+    UNIQUE INDEX idx_supplier_orders_open_supplier (open_supplier_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 CREATE TABLE IF NOT EXISTS supplier_order_items (
@@ -85,12 +111,61 @@ CREATE TABLE IF NOT EXISTS supplier_order_items (
     FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Who added each quantity to an order line, as requests merge into open orders
+CREATE TABLE IF NOT EXISTS supplier_order_item_additions (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    supplier_order_id INT NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL,
+    employee_id INT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (supplier_order_id) REFERENCES supplier_orders(id) ON DELETE CASCADE,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+    FOREIGN KEY (employee_id) REFERENCES users(id) ON DELETE SET NULL,
+    INDEX idx_supplier_order_item_additions_order (supplier_order_id, product_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Append-only history of received supplier order lines (written on completion)
+CREATE TABLE IF NOT EXISTS supplier_receiving_ledger (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    supplier_order_id INT NOT NULL,
+    supplier_id INT NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL,
+    unit_cost DECIMAL(10, 2) NOT NULL,
+    ordered_at DATETIME NOT NULL,
+    arrived_at DATETIME,
+    completed_at DATETIME NOT NULL,
+    INDEX idx_receiving_completed_at (completed_at),
+    INDEX idx_receiving_supplier_completed (supplier_id, completed_at),
+    INDEX idx_receiving_product_completed (product_id, completed_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Per-supplier lead-time aggregates, updated on each supplier order transition
+CREATE TABLE IF NOT EXISTS supplier_lead_time_stats (
+    supplier_id INT PRIMARY KEY,
+    arrivals INT NOT NULL DEFAULT 0,
+    on_time_arrivals INT NOT NULL DEFAULT 0,
+    mean_arrival_hours DOUBLE,
+    p90_arrival_hours DOUBLE,
+    completions INT NOT NULL DEFAULT 0,
+    mean_lead_hours DOUBLE,
+    p90_lead_hours DOUBLE,
+    last_arrival_at DATETIME,
+    last_completed_at DATETIME,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (supplier_id) REFERENCES suppliers(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 CREATE TABLE IF NOT EXISTS customer_orders (
     id INT AUTO_INCREMENT PRIMARY KEY,
     customer_id INT NOT NULL,
     employee_id INT,
     status ENUM('pending', 'processing', 'completed', 'cancelled') NOT NULL DEFAULT 'pending',
     total_amount DECIMAL(12, 2) NOT NULL DEFAULT 0.00,
+    paid_total DECIMAL(12, 2) NOT NULL DEFAULT 0.00,
+    refunded_total DECIMAL(12, 2) NOT NULL DEFAULT 0.00,
+    payment_count INT NOT NULL DEFAULT 0,
     notes TEXT,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
@@ -99,7 +174,9 @@ CREATE TABLE IF NOT EXISTS customer_orders (
     FOREIGN KEY (employee_id) REFERENCES users(id) ON DELETE SET NULL,
     INDEX idx_customer_orders_customer_id (customer_id),
     INDEX idx_customer_orders_employee_id (employee_id),
-    INDEX idx_customer_orders_status (status)
+    INDEX idx_customer_orders_status (status),
+    INDEX idx_customer_orders_created_at (created_at),
+    INDEX idx_customer_orders_updated_at (updated_at, id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 CREATE TABLE IF NOT EXISTS customer_order_items (
@@ -112,6 +189,19 @@ CREATE TABLE IF NOT EXISTS customer_order_items (
     FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE RESTRICT
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Forecast-driven reorder suggestions awaiting admin review
+CREATE TABLE IF NOT EXISTS reorder_suggestions (
+    product_id INT PRIMARY KEY,
+    suggested_reorder_level INT NOT NULL,
+    suggested_reorder_amount INT NOT NULL,
+    daily_demand DOUBLE NOT NULL,
+    demand_std DOUBLE NOT NULL,
+    lead_time_days DOUBLE NOT NULL,
+    generated_at DATETIME NOT NULL,
+    applied_at DATETIME,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 CREATE TABLE IF NOT EXISTS payments (
     id INT AUTO_INCREMENT PRIMARY KEY,
     customer_order_id INT NOT NULL,
@@ -123,7 +213,123 @@ CREATE TABLE IF NOT EXISTS payments (
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (customer_order_id) REFERENCES customer_orders(id) ON DELETE RESTRICT,
-    INDEX idx_payments_customer_order_id (customer_order_id),
-    INDEX idx_payments_status (payment_status),
-    INDEX idx_payments_method (payment_method)
+    UNIQUE INDEX idx_payments_transaction_reference (transaction_reference),
+    INDEX idx_payments_customer_order_id (customer_order_id, created_at, id),
+    INDEX idx_payments_status (payment_status, created_at, id),
+    INDEX idx_payments_method (payment_method, created_at, id),
+    INDEX idx_payments_created_at (created_at, id),
+    INDEX idx_payments_updated_at (updated_at, id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Daily sales rollups, maintained on order completion and payment settlement
+CREATE TABLE IF NOT EXISTS sales_daily (
+    day DATE PRIMARY KEY,
+    quantity INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    order_count INT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS sales_daily_product (
+    day DATE NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    order_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, product_id),
+    INDEX idx_sales_daily_product_product (product_id, day)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS sales_daily_category (
+    day DATE NOT NULL,
+    category VARCHAR(100) NOT NULL,
+    quantity INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    order_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, category)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS sales_daily_payment_method (
+    day DATE NOT NULL,
+    payment_method ENUM('cash', 'credit_card', 'debit_card', 'bank_transfer', 'e_wallet') NOT NULL,
+    amount DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    payment_count INT NOT NULL DEFAULT 0,
+    refunded_amount DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    refund_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, payment_method)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Running on-hand inventory value, adjusted by stock and price deltas
+CREATE TABLE IF NOT EXISTS inventory_value_by_category (
+    category VARCHAR(100) PRIMARY KEY,
+    units BIGINT NOT NULL DEFAULT 0,
+    cost_value DECIMAL(16, 2) NOT NULL DEFAULT 0.00,
+    retail_value DECIMAL(16, 2) NOT NULL DEFAULT 0.00,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS inventory_value_by_supplier (
+    supplier_id INT PRIMARY KEY,
+    units BIGINT NOT NULL DEFAULT 0,
+    cost_value DECIMAL(16, 2) NOT NULL DEFAULT 0.00,
+    retail_value DECIMAL(16, 2) NOT NULL DEFAULT 0.00,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Per-customer recency/frequency/monetary metrics from the segmentation job
+CREATE TABLE IF NOT EXISTS customer_metrics (
+    customer_id INT PRIMARY KEY,
+    order_count INT NOT NULL,
+    total_spent DECIMAL(14, 2) NOT NULL,
+    avg_order_value DECIMAL(12, 2) NOT NULL,
+    last_order_at DATETIME NOT NULL,
+    recency_days INT NOT NULL,
+    r_score TINYINT NOT NULL,
+    f_score TINYINT NOT NULL,
+    m_score TINYINT NOT NULL,
+    rfm_score SMALLINT NOT NULL,
+    segment VARCHAR(30) NOT NULL,
+    computed_at DATETIME NOT NULL,
+    FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE CASCADE,
+    INDEX idx_customer_metrics_segment (segment, rfm_score),
+    INDEX idx_customer_metrics_rfm (rfm_score),
+    INDEX idx_customer_metrics_spent (total_spent),
+    INDEX idx_customer_metrics_last_order (last_order_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Last (updated_at, id) exported per table for incremental columnar extracts
+CREATE TABLE IF NOT EXISTS export_watermarks (
+    table_name VARCHAR(50) PRIMARY KEY,
+    last_updated_at DATETIME NOT NULL,
+    last_id INT NOT NULL,
+    exported_at DATETIME NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- One row per stock change, replayed from the nearest snapshot for as-of queries
+CREATE TABLE IF NOT EXISTS stock_movements (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    product_id INT NOT NULL,
+    delta INT NOT NULL,
+    reason ENUM('customer_order', 'customer_order_cancelled', 'supplier_order', 'adjustment', 'product_created') NOT NULL,
+    reference_id INT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_stock_movements_product (product_id, id),
+    INDEX idx_stock_movements_product_created (product_id, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS stock_snapshots (
+    product_id INT NOT NULL,
+    taken_at DATETIME NOT NULL,
+    stock INT NOT NULL,
+    last_movement_id BIGINT NOT NULL,
+    PRIMARY KEY (product_id, taken_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Selling/purchase price in effect from valid_from until the product's next row
+CREATE TABLE IF NOT EXISTS product_price_history (
+    product_id INT NOT NULL,
+    valid_from DATETIME(6) NOT NULL,
+    selling_price DECIMAL(10, 2) NOT NULL,
+    purchase_price DECIMAL(10, 2) NOT NULL,
+    PRIMARY KEY (product_id, valid_from),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
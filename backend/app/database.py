@@ -1,11 +1,13 @@
 import os
 from pathlib import Path
-from typing import Generator
+from typing import Callable, Generator
 from urllib.parse import urlparse
 
 import pymysql
 from pymysql.cursors import DictCursor
 
+from app.utils.cache import bump_versions
+
 DATABASE_URL = os.getenv(
     "DATABASE_URL", "mysql+pymysql://retail_user:retail_password@db:3306/retail"
 )
@@ -40,20 +42,118 @@ def get_connection():
     )
 
 
+def new_db(conn) -> dict:
+    """The ``db`` dict services take, for one transaction on ``conn``.
+    Commit it with commit_db so queued cache version bumps are applied."""
+    return {
+        "conn": conn,
+        "cursor": conn.cursor(),
+        # cache_versions names to bump just before commit
+        "pending_versions": set(),
+        # callbacks to run once the transaction is committed
+        "after_commit": [],
+    }
+
+
+def commit_db(db: dict) -> None:
+    if db["pending_versions"]:
+        bump_versions(db["cursor"], db["pending_versions"])
+        db["pending_versions"].clear()
+    db["conn"].commit()
+    callbacks, db["after_commit"] = db["after_commit"], []
+    for callback in callbacks:
+        callback()
+
+
 def get_db() -> Generator[dict, None, None]:
     conn = get_connection()
-    cursor = conn.cursor()
+    db = new_db(conn)
     try:
-        yield {"conn": conn, "cursor": cursor}
-        conn.commit()
+        yield db
+        commit_db(db)
     except Exception:
         conn.rollback()
         raise
     finally:
-        cursor.close()
+        db["cursor"].close()
         conn.close()
 
 
+# CREATE TABLE IF NOT EXISTS leaves tables from earlier releases untouched,
+# so columns and indexes added since are applied here when missing.
+SCHEMA_COLUMNS = [
+    ("products", "thumbnail_url", "VARCHAR(500) AFTER image_url"),
+    ("products", "image_width", "INT AFTER thumbnail_url"),
+    ("products", "image_height", "INT AFTER image_width"),
+    ("products", "image_color", "CHAR(7) AFTER image_height"),
+    ("products", "version", "INT NOT NULL DEFAULT 1 AFTER image_color"),
+    ("supplier_orders", "arrived_at", "DATETIME AFTER updated_at"),
+    (
+        "supplier_orders",
+        "open_supplier_id",
+        "INT AS (IF(status = 'processing', supplier_id, NULL)) STORED AFTER completed_at",
+    ),
+    ("customer_orders", "paid_total", "DECIMAL(12, 2) NOT NULL DEFAULT 0.00 AFTER total_amount"),
+    ("customer_orders", "refunded_total", "DECIMAL(12, 2) NOT NULL DEFAULT 0.00 AFTER paid_total"),
+    ("customer_orders", "payment_count", "INT NOT NULL DEFAULT 0 AFTER refunded_total"),
+]
+
+# (table, index name, kind, columns); an index whose columns differ is rebuilt
+SCHEMA_INDEXES = [
+    ("products", "idx_products_supplier_name", "UNIQUE INDEX", ("supplier_id", "name")),
+    ("products", "idx_products_updated_at", "INDEX", ("updated_at", "id")),
+    ("products", "ft_products_name_description", "FULLTEXT INDEX", ("name", "description")),
+    ("supplier_orders", "idx_supplier_orders_supplier_status", "INDEX", ("supplier_id", "status")),
+    ("supplier_orders", "idx_supplier_orders_open_supplier", "UNIQUE INDEX", ("open_supplier_id",)),
+    ("customer_orders", "idx_customer_orders_created_at", "INDEX", ("created_at",)),
+    ("customer_orders", "idx_customer_orders_updated_at", "INDEX", ("updated_at", "id")),
+    ("payments", "idx_payments_transaction_reference", "UNIQUE INDEX", ("transaction_reference",)),
+    ("payments", "idx_payments_customer_order_id", "INDEX", ("customer_order_id", "created_at", "id")),
+    ("payments", "idx_payments_status", "INDEX", ("payment_status", "created_at", "id")),
+    ("payments", "idx_payments_method", "INDEX", ("payment_method", "created_at", "id")),
+    ("payments", "idx_payments_created_at", "INDEX", ("created_at", "id")),
+    ("payments", "idx_payments_updated_at", "INDEX", ("updated_at", "id")),
+]
+
+
+def upgrade_schema(cursor) -> None:
+    """Idempotently add missing columns and indexes to existing tables"""
+    for table, column, definition in SCHEMA_COLUMNS:
+        cursor.execute(
+            """
+            SELECT 1 FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+            """,
+            (table, column),
+        )
+        if not cursor.fetchone():
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            print(f"Added column {table}.{column}")
+
+    for table, index, kind, columns in SCHEMA_INDEXES:
+        cursor.execute(
+            """
+            SELECT COLUMN_NAME as column_name FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+            ORDER BY SEQ_IN_INDEX
+            """,
+            (table, index),
+        )
+        existing = tuple(r["column_name"] for r in cursor.fetchall())
+        if existing == columns:
+            continue
+        # drop and re-add in one statement so foreign keys keep an index
+        drop = f"DROP INDEX {index}, " if existing else ""
+        try:
+            cursor.execute(
+                f"ALTER TABLE {table} {drop}ADD {kind} {index} ({', '.join(columns)})"
+            )
+            print(f"Created index {table}.{index}")
+        except pymysql.err.IntegrityError as e:
+            # e.g. duplicate rows that predate a new unique key
+            print(f"Could not create unique index {table}.{index}, fix duplicates first: {e}")
+
+
 def init_db():
     sql_file = Path(__file__).parent / "create_tables.sql"
     with open(sql_file, "r") as f:
@@ -65,6 +165,7 @@ def init_db():
         statements = [s.strip() for s in sql_content.split(";") if s.strip()]
         for statement in statements:
             cursor.execute(statement)
+        upgrade_schema(cursor)
         conn.commit()
         print("Database tables initialized successfully.")
     except Exception as e:
@@ -74,3 +175,29 @@ def init_db():
     finally:
         cursor.close()
         conn.close()
+
+
+def run_migrations(migrations: list[tuple[str, Callable[[dict], object]]]) -> None:
+    """Run each one-off data migration once per database, in order.
+
+    A migration is claimed and run in one transaction, so a failed one is
+    retried on the next start and a worker starting at the same time waits
+    for it instead of running it again.
+    """
+    conn = get_connection()
+    db = new_db(conn)
+    try:
+        for name, migrate in migrations:
+            db["cursor"].execute(
+                "INSERT IGNORE INTO schema_migrations (name) VALUES (%s)", (name,)
+            )
+            if db["cursor"].rowcount:
+                result = migrate(db)
+                print(f"Applied migration {name}: {result}")
+            commit_db(db)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        db["cursor"].close()
+        conn.close()
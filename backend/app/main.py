@@ -1,21 +1,36 @@
+import os
+
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from fastapi.staticfiles import StaticFiles
 from pydantic import ValidationError
 
-from app.database import init_db
+from app.database import init_db, run_migrations
 from app.routers import (
+    analytics,
     auth,
     customer_orders,
     customers,
+    dashboard,
     employees,
+    exports,
+    forecast,
     payments,
     products,
     supplier,
     supplier_orders,
     users
 )
+from app.services import (
+    inventory_valuation_service,
+    payment_service,
+    price_history_service,
+    product_image_service,
+    stock_journal_service,
+    supplier_service,
+)
 
 load_dotenv()
 
@@ -34,6 +49,31 @@ except ImportError:
 except Exception as e:
     print(f"Error during database seeding: {e}")
 
+# Warm the in-memory supplier directory
+try:
+    supplier_service.preload_supplier_cache()
+except Exception as e:
+    print(f"Error preloading supplier cache: {e}")
+
+# One-off backfills of data that predates the code maintaining it. Full
+# rebuilds are command-line jobs, e.g. python -m app.services.payment_service
+run_migrations(
+    [
+        ("backfill_payment_balances", payment_service.rebuild_payment_balances),
+        (
+            "backfill_inventory_valuation",
+            inventory_valuation_service.rebuild_inventory_valuation,
+        ),
+        ("backfill_price_history", price_history_service.backfill_price_history),
+    ]
+)
+
+# Baseline stock checkpoint for products that have never been snapshotted
+try:
+    stock_journal_service.run_baseline_snapshot_job()
+except Exception as e:
+    print(f"Error taking baseline stock snapshots: {e}")
+
 
 # Custom exception handler for Pydantic validation errors
 @app.exception_handler(ValidationError)
@@ -63,6 +103,23 @@ app.include_router(payments.router)
 app.include_router(customers.router)
 app.include_router(employees.router)
 app.include_router(users.router)
+app.include_router(forecast.router)
+app.include_router(analytics.router)
+app.include_router(dashboard.router)
+app.include_router(exports.router)
+
+# Uploaded product images and their thumbnails
+os.makedirs(product_image_service.IMAGE_STORAGE_DIR, exist_ok=True)
+app.mount(
+    product_image_service.IMAGE_BASE_URL,
+    StaticFiles(directory=product_image_service.IMAGE_STORAGE_DIR),
+    name="media",
+)
+
+
+@app.on_event("shutdown")
+def shutdown_image_workers():
+    product_image_service.shutdown_image_pool()
 
 
 @app.get("/")
@@ -0,0 +1,56 @@
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.database import get_db
+from app.schemas.analytics import (
+    InventoryValueReport,
+    MarginReport,
+    SalesGroupBy,
+    SalesReport,
+)
+from app.services import (
+    analytics_service,
+    inventory_valuation_service,
+    price_history_service,
+)
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+@router.get("/sales", response_model=SalesReport)
+def get_sales_report(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    group_by: SalesGroupBy = SalesGroupBy.DAY,
+    db=Depends(get_db),
+):
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    return analytics_service.get_sales_report(db, date_from, date_to, group_by)
+
+
+@router.post("/sales/rebuild")
+def rebuild_sales_rollups(db=Depends(get_db)):
+    return analytics_service.rebuild_sales_rollups(db)
+
+
+@router.get("/margin", response_model=MarginReport)
+def get_margin_report(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    db=Depends(get_db),
+):
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    return price_history_service.get_margin_report(db, date_from, date_to)
+
+
+@router.get("/inventory-value", response_model=InventoryValueReport)
+def get_inventory_value(db=Depends(get_db)):
+    return inventory_valuation_service.get_inventory_value(db)
+
+
+@router.post("/inventory-value/rebuild")
+def rebuild_inventory_value(db=Depends(get_db)):
+    return inventory_valuation_service.rebuild_inventory_valuation(db)
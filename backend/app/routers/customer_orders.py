@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
 
@@ -10,12 +10,18 @@ from app.schemas.customer_order import (
     CustomerOrderWithItems,
 )
 from app.services import customer_order_service
+from app.utils.fields import parse_fields, sparse_response
 
 router = APIRouter(prefix="/customer-orders", tags=["customer-orders"])
 
 
 @router.get("/", response_model=List[CustomerOrderListResponse])
-def get_all_customer_orders(db=Depends(get_db)):
+def get_all_customer_orders(fields: Optional[str] = None, db=Depends(get_db)):
+    selected = parse_fields(fields, customer_order_service.CUSTOMER_ORDER_LIST_COLUMNS)
+    if selected is not None:
+        return sparse_response(
+            customer_order_service.get_customer_orders_sparse(db, selected)
+        )
     return customer_order_service.get_all_customer_orders(db)
 
 
@@ -25,7 +31,14 @@ def get_pending_customer_orders(db=Depends(get_db)):
 
 
 @router.get("/customer/{customer_id}", response_model=List[CustomerOrderListResponse])
-def get_customer_orders_by_customer(customer_id: int, db=Depends(get_db)):
+def get_customer_orders_by_customer(
+    customer_id: int, fields: Optional[str] = None, db=Depends(get_db)
+):
+    selected = parse_fields(fields, customer_order_service.CUSTOMER_ORDER_LIST_COLUMNS)
+    if selected is not None:
+        return sparse_response(
+            customer_order_service.get_customer_orders_sparse(db, selected, customer_id)
+        )
     return customer_order_service.get_customer_orders_by_customer(db, customer_id)
 
 
@@ -1,12 +1,21 @@
-from typing import List
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 
 from app.database import get_db
-from app.schemas.customer import CustomerResponse, CustomerUpdate
+from app.schemas.customer import CustomerResponse, CustomerSegmentPage, CustomerUpdate
+from app.services import customer_metrics_service
+from app.utils.fields import parse_fields, select_list, sparse_response
 
 router = APIRouter(prefix="/customers", tags=["customers"])
 
+# ?fields= names for GET /customers/
+CUSTOMER_LIST_COLUMNS = {
+    field: "u.username" if field == "username" else f"c.{field}"
+    for field in CustomerResponse.model_fields
+    if field != "metrics"
+}
+
 
 @router.get("/user/{user_id}", response_model=CustomerResponse)
 def get_customer_by_user_id(user_id: int, db=Depends(get_db)):
@@ -42,6 +51,28 @@ def get_customer_by_user_id(user_id: int, db=Depends(get_db)):
     )
 
 
+@router.get("/segments", response_model=CustomerSegmentPage)
+def get_customer_segments(
+    segment: Optional[str] = None,
+    sort_by: Literal[
+        "rfm_score", "total_spent", "order_count", "last_order_at", "recency_days"
+    ] = "rfm_score",
+    order: Literal["asc", "desc"] = "desc",
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db=Depends(get_db),
+):
+    """Customers ranked by their precomputed RFM metrics"""
+    return customer_metrics_service.get_customer_segments(
+        db, segment, sort_by, order == "desc", limit, offset
+    )
+
+
+@router.post("/segments/recompute")
+def recompute_customer_segments(db=Depends(get_db)):
+    return customer_metrics_service.compute_customer_metrics(db)
+
+
 @router.get("/{customer_id}", response_model=CustomerResponse)
 def get_customer(customer_id: int, db=Depends(get_db)):
     """Get customer details by customer_id"""
@@ -72,14 +103,26 @@ def get_customer(customer_id: int, db=Depends(get_db)):
             "user_id": customer["user_id"],
             "username": customer["username"],
             "created_at": customer.get("created_at"),
+            "metrics": customer_metrics_service.get_customer_metrics(db, customer_id),
         }
     )
 
 
 @router.get("/", response_model=List[CustomerResponse])
-def get_all_customers(db=Depends(get_db)):
+def get_all_customers(fields: Optional[str] = None, db=Depends(get_db)):
     """Get all customers (for admin)"""
     cursor = db["cursor"]
+    selected = parse_fields(fields, CUSTOMER_LIST_COLUMNS)
+    if selected is not None:
+        cursor.execute(
+            f"""
+            SELECT {select_list(selected, CUSTOMER_LIST_COLUMNS)}
+            FROM customers c
+            JOIN users u ON c.user_id = u.id
+            ORDER BY c.created_at DESC
+            """
+        )
+        return sparse_response(cursor.fetchall())
     cursor.execute(
         """
         SELECT c.*, u.username
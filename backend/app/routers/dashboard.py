@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+
+from app.schemas.dashboard import DashboardSummary
+from app.services import dashboard_service
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+
+@router.get("/summary", response_model=DashboardSummary)
+def get_dashboard_summary():
+    return dashboard_service.get_dashboard_summary()
@@ -0,0 +1,37 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from app.database import get_db
+from app.schemas.export import ExportFormat, ExportRunResult
+from app.services import export_service
+
+router = APIRouter(prefix="/exports", tags=["exports"])
+
+
+@router.post("/run", response_model=ExportRunResult)
+def run_export(
+    format: ExportFormat = ExportFormat.PARQUET,
+    tables: Optional[str] = None,
+    full: bool = False,
+    db=Depends(get_db),
+):
+    selected = None
+    if tables:
+        selected = [t.strip() for t in tables.split(",") if t.strip()]
+        unknown = [t for t in selected if t not in export_service.EXPORT_SPECS]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown tables: {', '.join(unknown)}. Must be among: {', '.join(export_service.EXPORT_SPECS)}",
+            )
+    return export_service.run_export(db, selected, format, full)
+
+
+@router.get("/files/{filename}")
+def download_export(filename: str):
+    path = export_service.get_export_path(filename)
+    if not path:
+        raise HTTPException(status_code=404, detail="Export file not found")
+    return FileResponse(path, filename=filename, media_type="application/octet-stream")
@@ -0,0 +1,33 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+
+from app.database import get_db
+from app.schemas.forecast import (
+    ApplySuggestionsRequest,
+    ForecastRunResult,
+    ReorderSuggestion,
+)
+from app.services import forecast_service
+
+router = APIRouter(prefix="/forecast", tags=["forecast"])
+
+
+@router.post("/run", response_model=ForecastRunResult)
+def run_forecast(
+    history_days: int = Query(forecast_service.HISTORY_DAYS, ge=7, le=730),
+    db=Depends(get_db),
+):
+    return forecast_service.run_forecast(db, history_days)
+
+
+@router.get("/suggestions", response_model=List[ReorderSuggestion])
+def get_reorder_suggestions(pending_only: bool = False, db=Depends(get_db)):
+    return forecast_service.get_reorder_suggestions(db, pending_only)
+
+
+@router.post("/suggestions/apply")
+def apply_reorder_suggestions(
+    request: ApplySuggestionsRequest, db=Depends(get_db)
+):
+    return forecast_service.apply_reorder_suggestions(db, request.product_ids)
@@ -1,25 +1,75 @@
-from typing import List
+import contextlib
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
 from app.database import get_db
 from app.schemas.payment import (
     PaymentCreate,
     PaymentListResponse,
+    PaymentMethod,
     PaymentResponse,
+    PaymentSearchPage,
+    PaymentSettlementRequest,
+    PaymentSettlementResponse,
+    PaymentStatus,
     PaymentSummary,
     PaymentWithOrderInfo,
 )
-from app.services import payment_service
+from app.services import payment_service, reconciliation_service
+from app.utils.fields import parse_fields, sparse_response
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
 
 @router.get("/", response_model=List[PaymentListResponse])
-def get_all_payments(db=Depends(get_db)):
+def get_all_payments(fields: Optional[str] = None, db=Depends(get_db)):
+    selected = parse_fields(fields, payment_service.PAYMENT_LIST_COLUMNS)
+    if selected is not None:
+        return sparse_response(payment_service.get_payments_sparse(db, selected))
     return payment_service.get_all_payments(db)
 
 
+@router.get("/search", response_model=PaymentSearchPage)
+def search_payments(
+    status: Optional[PaymentStatus] = None,
+    method: Optional[PaymentMethod] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    order_id: Optional[int] = None,
+    customer_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db=Depends(get_db),
+):
+    after = None
+    if cursor:
+        after = payment_service.decode_search_cursor(cursor)
+        if not after:
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    return payment_service.search_payments(
+        db,
+        status=status.value if status else None,
+        method=method.value if method else None,
+        date_from=date_from,
+        date_to=date_to,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        order_id=order_id,
+        customer_id=customer_id,
+        after=after,
+        limit=limit,
+    )
+
+
 @router.get("/status/{status}", response_model=List[PaymentListResponse])
 def get_payments_by_status(status: str, db=Depends(get_db)):
     valid_statuses = ["pending", "completed", "failed", "refunded"]
@@ -55,6 +105,21 @@ def get_payment_summary(order_id: int, db=Depends(get_db)):
     return summary
 
 
+@router.get("/summary", response_model=List[PaymentSummary])
+def get_payment_summaries(order_ids: str, db=Depends(get_db)):
+    try:
+        ids = sorted({int(i) for i in order_ids.split(",") if i.strip()})
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail="order_ids must be a comma-separated list of IDs"
+        )
+    if len(ids) > 500:
+        raise HTTPException(
+            status_code=400, detail="At most 500 order IDs can be requested at once"
+        )
+    return payment_service.get_payment_summaries(db, ids)
+
+
 @router.get("/{payment_id}", response_model=PaymentResponse)
 def get_payment(payment_id: int, db=Depends(get_db)):
     payment = payment_service.get_payment_by_id(db, payment_id)
@@ -73,7 +138,10 @@ def get_payment_details(payment_id: int, db=Depends(get_db)):
 
 @router.post("/", response_model=PaymentResponse)
 def create_payment(payment_data: PaymentCreate, db=Depends(get_db)):
-    payment = payment_service.create_payment(db, payment_data)
+    try:
+        payment = payment_service.create_payment(db, payment_data)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if not payment:
         raise HTTPException(
             status_code=400,
@@ -82,6 +150,48 @@ def create_payment(payment_data: PaymentCreate, db=Depends(get_db)):
     return payment
 
 
+@router.post("/settle", response_model=PaymentSettlementResponse)
+def settle_payments(request: PaymentSettlementRequest, db=Depends(get_db)):
+    return payment_service.settle_payments(db, request.items)
+
+
+@router.post("/balances/rebuild")
+def rebuild_payment_balances(db=Depends(get_db)):
+    return payment_service.rebuild_payment_balances(db)
+
+
+def _remove_spool(path: str) -> None:
+    # the report deletes the file when it finishes; this covers a client
+    # that disconnects before the stream starts
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+
+@router.post("/reconcile")
+def reconcile_statement(
+    file: UploadFile = File(...),
+    reference_column: str = "transaction_reference",
+    amount_column: str = "amount",
+    only_exceptions: bool = False,
+):
+    # The upload is closed once this handler returns, so spool it to a file
+    # the streamed report can keep reading from.
+    with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as spool:
+        try:
+            shutil.copyfileobj(file.file, spool)
+        except Exception:
+            os.remove(spool.name)
+            raise
+    return StreamingResponse(
+        reconciliation_service.reconcile_statement(
+            spool.name, reference_column, amount_column, only_exceptions
+        ),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=reconciliation.csv"},
+        background=BackgroundTask(_remove_spool, spool.name),
+    )
+
+
 @router.put("/{payment_id}/complete")
 def complete_payment(payment_id: int, db=Depends(get_db)):
     result = payment_service.complete_payment(db, payment_id)
@@ -1,123 +1,308 @@
+import io
 from datetime import datetime
-from typing import List
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+import pymysql
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+)
 
 from app.database import get_db
 from app.schemas.product import (
+    CategorySummary,
+    ProductBrowsePage,
+    ProductBulkUpdateRequest,
+    ProductBulkUpdateResult,
     ProductCreate,
+    ProductImportReport,
+    ProductPricePoint,
     ProductListResponse,
     ProductResponse,
+    ProductSearchPage,
     ProductUpdate,
 )
+from app.schemas.stock import StockAsOf
+from app.services import (
+    catalog_service,
+    category_service,
+    inventory_valuation_service,
+    price_history_service,
+    product_browse_service,
+    product_bulk_service,
+    product_image_service,
+    product_import_service,
+    product_search_service,
+    stock_journal_service,
+    supplier_service,
+)
+from app.utils.fields import parse_fields, sparse_response
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+VERSION_CONFLICT_DETAIL = (
+    "Product was modified by another request. Reload it and try again."
+)
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Expected product version from an If-Match header, None if unconditional"""
+    if not if_match or if_match.strip() == "*":
+        return None
+    tag = if_match.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
+
+
+def product_etag(product: dict) -> str:
+    return f'"{product["version"]}"'
+
 
 @router.get("/", response_model=List[ProductListResponse])
-def get_products(db: dict = Depends(get_db)):
-    cursor = db["cursor"]
-    cursor.execute(
-        """
-        SELECT p.*, s.name as supplier_name
-        FROM products p
-        LEFT JOIN suppliers s ON p.supplier_id = s.id
-        ORDER BY p.name
-        """
+def get_products(
+    fields: Optional[str] = None, if_none_match: Optional[str] = Header(None)
+):
+    selected = parse_fields(fields, catalog_service.PRODUCT_LIST_COLUMNS)
+    if selected is not None:
+        return sparse_response(catalog_service.get_products_sparse(selected))
+    # Revalidation against a fresh snapshot never touches the database
+    cached_etag = catalog_service.get_cached_etag()
+    if catalog_service.etag_matches(if_none_match, cached_etag):
+        return Response(status_code=304, headers={"ETag": cached_etag})
+    etag, body = catalog_service.get_catalog_snapshot()
+    if catalog_service.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(
+        content=body, media_type="application/json", headers={"ETag": etag}
+    )
+
+
+@router.get("/categories", response_model=List[CategorySummary])
+def get_categories(
+    if_none_match: Optional[str] = Header(None), db: dict = Depends(get_db)
+):
+    etag, body = category_service.get_category_list(db)
+    if catalog_service.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(
+        content=body, media_type="application/json", headers={"ETag": etag}
+    )
+
+
+# :path so names such as "Abnormalities / E.G.O" can be used as-is
+@router.get("/category/{name:path}", response_model=List[ProductListResponse])
+def get_products_by_category(
+    name: str, if_none_match: Optional[str] = Header(None), db: dict = Depends(get_db)
+):
+    snapshot = category_service.get_category_products(db, name)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Category not found")
+    etag, body = snapshot
+    if catalog_service.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(
+        content=body, media_type="application/json", headers={"ETag": etag}
+    )
+
+
+@router.get("/search", response_model=ProductSearchPage)
+def search_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    category: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=product_search_service.MAX_CANDIDATES),
+    db: dict = Depends(get_db),
+):
+    return product_search_service.search_products(
+        db, q, category=category, limit=limit, offset=offset
+    )
+
+
+@router.get("/browse", response_model=ProductBrowsePage)
+def browse_products(
+    category: Optional[List[str]] = Query(None),
+    supplier_id: Optional[List[int]] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: Optional[bool] = None,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db: dict = Depends(get_db),
+):
+    return product_browse_service.browse_products(
+        db,
+        categories=category,
+        supplier_ids=supplier_id,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock=in_stock,
+        limit=limit,
+        offset=offset,
     )
-    rows = cursor.fetchall()
-    # Map DB rows into the response model expected by Pydantic
-    results = []
-    for p in rows:
-        results.append(
-            ProductListResponse.model_validate(
-                {
-                    "id": p["id"],
-                    "name": p["name"],
-                    "description": p["description"],
-                    "selling_price": p["selling_price"],
-                    "purchase_price": p["purchase_price"],
-                    "supplier_id": p["supplier_id"],
-                    "supplier_name": p.get("supplier_name") or "Unknown",
-                    "stock": p["stock"],
-                    "reorder_level": p["reorder_level"],
-                    "reorder_amount": p["reorder_amount"],
-                    "category": p["category"],
-                    "image_url": p["image_url"],
-                    "created_at": p.get("created_at"),
-                    "updated_at": p.get("updated_at"),
-                }
-            )
-        )
-    return results
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
-def get_product(product_id: int, db: dict = Depends(get_db)):
+def get_product(product_id: int, response: Response, db: dict = Depends(get_db)):
     cursor = db["cursor"]
     cursor.execute("SELECT * FROM products WHERE id = %s", (product_id,))
     product = cursor.fetchone()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    response.headers["ETag"] = product_etag(product)
     return product
 
 
+@router.get("/{product_id}/stock", response_model=StockAsOf)
+def get_product_stock_as_of(
+    product_id: int, as_of: Optional[datetime] = None, db: dict = Depends(get_db)
+):
+    result = stock_journal_service.get_stock_as_of(
+        db, product_id, as_of or datetime.utcnow()
+    )
+    if not result:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return result
+
+
+@router.post("/stock/snapshots")
+def take_stock_snapshots(db: dict = Depends(get_db)):
+    return stock_journal_service.take_snapshots(db)
+
+
+@router.get("/{product_id}/price-history", response_model=List[ProductPricePoint])
+def get_price_history(product_id: int, db: dict = Depends(get_db)):
+    history = price_history_service.get_price_history(db, product_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return history
+
+
 @router.post("/", response_model=ProductResponse)
 def create_product(product_data: ProductCreate, db: dict = Depends(get_db)):
     cursor = db["cursor"]
     # Verify supplier exists
-    cursor.execute(
-        "SELECT id FROM suppliers WHERE id = %s", (product_data.supplier_id,)
-    )
-    if not cursor.fetchone():
+    if not supplier_service.get_supplier_by_id(db, product_data.supplier_id):
         raise HTTPException(status_code=400, detail="Supplier not found")
 
-    cursor.execute(
-        """
-        INSERT INTO products
-        (name, description, selling_price, purchase_price, supplier_id, stock, reorder_level, reorder_amount, category, image_url, created_at, updated_at)
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """,
-        (
-            product_data.name,
-            product_data.description,
-            product_data.selling_price,
-            product_data.purchase_price,
-            product_data.supplier_id,
-            product_data.stock or 0,
-            product_data.reorder_level or 50,
-            product_data.reorder_amount or 100,
-            product_data.category,
-            product_data.image_url,
-            datetime.utcnow(),
-            datetime.utcnow(),
-        ),
-    )
+    try:
+        cursor.execute(
+            """
+            INSERT INTO products
+            (name, description, selling_price, purchase_price, supplier_id, stock, reorder_level, reorder_amount, category, image_url, created_at, updated_at)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+            """,
+            (
+                product_data.name,
+                product_data.description,
+                product_data.selling_price,
+                product_data.purchase_price,
+                product_data.supplier_id,
+                product_data.stock or 0,
+                product_data.reorder_level or 50,
+                product_data.reorder_amount or 100,
+                product_data.category,
+                product_data.image_url,
+                datetime.utcnow(),
+                datetime.utcnow(),
+            ),
+        )
+    except pymysql.err.IntegrityError:
+        raise HTTPException(
+            status_code=400, detail="Supplier already has a product with this name"
+        )
     new_id = cursor.lastrowid
     cursor.execute("SELECT * FROM products WHERE id = %s", (new_id,))
-    return cursor.fetchone()
+    product = cursor.fetchone()
+    inventory_valuation_service.apply_product_contribution(db, product, 1)
+    price_history_service.record_prices_where(db, "p.id = %s", (new_id,))
+    stock_journal_service.record_movements(
+        db, [(new_id, product["stock"] or 0)], "product_created", new_id
+    )
+    catalog_service.invalidate_catalog(
+        db, categories=[product["category"]], names_changed=True
+    )
+    return product
+
+
+@router.post("/import", response_model=ProductImportReport)
+def import_products(
+    file: UploadFile = File(...),
+    file_format: Optional[Literal["csv", "ndjson"]] = Query(None, alias="format"),
+):
+    if file_format is None:
+        filename = (file.filename or "").lower()
+        file_format = "ndjson" if filename.endswith((".ndjson", ".jsonl")) else "csv"
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    # commits chunk by chunk on its own connection, see the report for how far
+    try:
+        return product_import_service.import_products(stream, file_format)
+    finally:
+        # leave the upload for FastAPI to close
+        stream.detach()
+
+
+@router.post("/{product_id}/image", response_model=ProductResponse)
+def upload_product_image(
+    product_id: int,
+    response: Response,
+    file: UploadFile = File(...),
+    db: dict = Depends(get_db),
+):
+    try:
+        product = product_image_service.save_product_image(db, product_id, file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    response.headers["ETag"] = product_etag(product)
+    return product
+
+
+@router.patch("/bulk", response_model=ProductBulkUpdateResult)
+def bulk_update_products(
+    request: ProductBulkUpdateRequest, db: dict = Depends(get_db)
+):
+    try:
+        return product_bulk_service.bulk_update_products(db, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.put("/{product_id}", response_model=ProductResponse)
 def update_product(
-    product_id: int, product_data: ProductUpdate, db: dict = Depends(get_db)
+    product_id: int,
+    product_data: ProductUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: dict = Depends(get_db),
 ):
     cursor = db["cursor"]
+    expected_version = parse_if_match(if_match)
     cursor.execute("SELECT * FROM products WHERE id = %s", (product_id,))
     existing = cursor.fetchone()
     if not existing:
         raise HTTPException(status_code=404, detail="Product not found")
+    if expected_version is not None and expected_version != existing["version"]:
+        raise HTTPException(status_code=409, detail=VERSION_CONFLICT_DETAIL)
 
     update_data = product_data.model_dump(exclude_unset=True)
 
     if "supplier_id" in update_data and update_data["supplier_id"] is not None:
-        cursor.execute(
-            "SELECT id FROM suppliers WHERE id = %s", (update_data["supplier_id"],)
-        )
-        if not cursor.fetchone():
+        if not supplier_service.get_supplier_by_id(db, update_data["supplier_id"]):
             raise HTTPException(status_code=400, detail="Supplier not found")
 
     if not update_data:
+        response.headers["ETag"] = product_etag(existing)
         return existing
 
     set_clauses = []
@@ -125,21 +310,61 @@ def update_product(
     for k, v in update_data.items():
         set_clauses.append(f"{k} = %s")
         params.append(v)
-    params.append(product_id)
-    sql = f"UPDATE products SET {', '.join(set_clauses)}, updated_at = %s WHERE id = %s"
-    params.insert(-1, datetime.utcnow())  # insert updated_at before id
-    cursor.execute(sql, tuple(params))
+    if "image_url" in update_data and update_data["image_url"] != existing["image_url"]:
+        # the stored thumbnail and measurements describe the old image
+        set_clauses.extend(
+            f"{column} = NULL"
+            for column in product_image_service.IMAGE_METADATA_COLUMNS
+        )
+    params.extend([datetime.utcnow(), product_id, existing["version"]])
+    # Only applies if nobody has written the row since we read it
+    sql = f"""
+        UPDATE products SET {', '.join(set_clauses)}, updated_at = %s, version = version + 1
+        WHERE id = %s AND version = %s
+    """
+    try:
+        cursor.execute(sql, tuple(params))
+    except pymysql.err.IntegrityError:
+        raise HTTPException(
+            status_code=400, detail="Supplier already has a product with this name"
+        )
+    if cursor.rowcount == 0:
+        raise HTTPException(status_code=409, detail=VERSION_CONFLICT_DETAIL)
     cursor.execute("SELECT * FROM products WHERE id = %s", (product_id,))
-    return cursor.fetchone()
+    updated = cursor.fetchone()
+    if "selling_price" in update_data or "purchase_price" in update_data:
+        price_history_service.record_prices_where(db, "p.id = %s", (product_id,))
+    if inventory_valuation_service.valuation_changed(existing, updated):
+        inventory_valuation_service.apply_product_contribution(db, existing, -1)
+        inventory_valuation_service.apply_product_contribution(db, updated, 1)
+    stock_journal_service.record_movements(
+        db,
+        [(product_id, (updated["stock"] or 0) - (existing["stock"] or 0))],
+        "adjustment",
+    )
+    catalog_service.invalidate_catalog(
+        db,
+        categories=[existing["category"], updated["category"]],
+        names_changed=bool(catalog_service.NAME_FIELDS & update_data.keys()),
+    )
+    response.headers["ETag"] = product_etag(updated)
+    return updated
 
 
 @router.delete("/{product_id}")
-def delete_product(product_id: int, db: dict = Depends(get_db)):
+def delete_product(
+    product_id: int,
+    if_match: Optional[str] = Header(None),
+    db: dict = Depends(get_db),
+):
     cursor = db["cursor"]
+    expected_version = parse_if_match(if_match)
     cursor.execute("SELECT * FROM products WHERE id = %s", (product_id,))
     product = cursor.fetchone()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    if expected_version is not None and expected_version != product["version"]:
+        raise HTTPException(status_code=409, detail=VERSION_CONFLICT_DETAIL)
 
     cursor.execute(
         """
@@ -157,5 +382,14 @@ def delete_product(product_id: int, db: dict = Depends(get_db)):
             detail="Cannot delete product while there are incoming supplier orders (processing or arrived).",
         )
 
-    cursor.execute("DELETE FROM products WHERE id = %s", (product_id,))
+    cursor.execute(
+        "DELETE FROM products WHERE id = %s AND version = %s",
+        (product_id, product["version"]),
+    )
+    if cursor.rowcount == 0:
+        raise HTTPException(status_code=409, detail=VERSION_CONFLICT_DETAIL)
+    inventory_valuation_service.apply_product_contribution(db, product, -1)
+    catalog_service.invalidate_catalog(
+        db, categories=[product["category"]], names_changed=True
+    )
     return {"message": "Product deleted successfully"}
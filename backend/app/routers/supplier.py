@@ -3,8 +3,8 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException
 
 from app.database import get_db
-from app.schemas.supplier import SupplierBrief, SupplierResponse
-from app.services import supplier_service
+from app.schemas.supplier import SupplierBrief, SupplierResponse, SupplierStats
+from app.services import supplier_service, supplier_stats_service
 
 router = APIRouter(prefix="/suppliers", tags=["suppliers"])
 
@@ -27,6 +27,14 @@ def get_supplier(supplier_id: int, db=Depends(get_db)):
     return supplier
 
 
+@router.get("/{supplier_id}/stats", response_model=SupplierStats)
+def get_supplier_stats(supplier_id: int, db=Depends(get_db)):
+    stats = supplier_stats_service.get_supplier_stats(db, supplier_id)
+    if not stats:
+        raise HTTPException(status_code=404, detail="Supplier not found")
+    return stats
+
+
 @router.post("/seed")
 def seed_suppliers(db=Depends(get_db)):
     return supplier_service.seed_suppliers(db)
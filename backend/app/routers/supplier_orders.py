@@ -1,10 +1,12 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 
 from app.database import get_db
 from app.schemas.supplier_order import (
     BulkSupplierOrderCreate,
+    ReceivingLedgerEntry,
     SupplierOrderCreate,
     SupplierOrderListResponse,
     SupplierOrderWithItems,
@@ -24,6 +26,20 @@ def get_pending_supplier_orders(db=Depends(get_db)):
     return supplier_order_service.get_pending_supplier_orders(db)
 
 
+@router.get("/history", response_model=List[ReceivingLedgerEntry])
+def get_receiving_history(
+    supplier_id: Optional[int] = None,
+    product_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db=Depends(get_db),
+):
+    return supplier_order_service.get_receiving_history(
+        db, supplier_id, product_id, date_from, date_to, limit
+    )
+
+
 @router.get("/{order_id}", response_model=SupplierOrderWithItems)
 def get_supplier_order(order_id: int, db=Depends(get_db)):
     order = supplier_order_service.get_supplier_order(db, order_id)
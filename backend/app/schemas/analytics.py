@@ -0,0 +1,63 @@
+from datetime import date
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class SalesGroupBy(str, Enum):
+    DAY = "day"
+    PRODUCT = "product"
+    CATEGORY = "category"
+    PAYMENT_METHOD = "payment_method"
+
+
+class SalesRow(BaseModel):
+    key: str
+    label: str
+    quantity: Optional[int] = None
+    amount: float
+    count: int
+    refunded_amount: Optional[float] = None
+
+
+class SalesReport(BaseModel):
+    date_from: date
+    date_to: date
+    group_by: SalesGroupBy
+    total_amount: float
+    rows: list[SalesRow]
+
+
+class InventoryValueRow(BaseModel):
+    key: str
+    label: str
+    units: int
+    cost_value: float
+    retail_value: float
+
+
+class InventoryValueReport(BaseModel):
+    units: int
+    cost_value: float
+    retail_value: float
+    by_category: list[InventoryValueRow]
+    by_supplier: list[InventoryValueRow]
+
+
+class MarginRow(BaseModel):
+    product_id: int
+    product_name: str
+    quantity: int
+    revenue: float
+    cost: float
+    margin: float
+
+
+class MarginReport(BaseModel):
+    date_from: date
+    date_to: date
+    revenue: float
+    cost: float
+    margin: float
+    rows: list[MarginRow]
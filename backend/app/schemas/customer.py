@@ -4,6 +4,20 @@ from typing import Optional
 from pydantic import BaseModel
 
 
+class CustomerMetrics(BaseModel):
+    order_count: int
+    total_spent: float
+    avg_order_value: float
+    last_order_at: datetime
+    recency_days: int
+    r_score: int
+    f_score: int
+    m_score: int
+    rfm_score: int
+    segment: str
+    computed_at: datetime
+
+
 class CustomerResponse(BaseModel):
     id: int
     first_name: str
@@ -16,6 +30,7 @@ class CustomerResponse(BaseModel):
     user_id: int
     username: str
     created_at: Optional[datetime] = None
+    metrics: Optional[CustomerMetrics] = None
 
     class Config:
         from_attributes = True
@@ -29,3 +44,13 @@ class CustomerUpdate(BaseModel):
     address: Optional[str] = None
     city: Optional[str] = None
     postal_code: Optional[str] = None
+
+
+class CustomerSegmentEntry(CustomerMetrics):
+    customer_id: int
+    customer_name: str
+
+
+class CustomerSegmentPage(BaseModel):
+    total: int
+    items: list[CustomerSegmentEntry]
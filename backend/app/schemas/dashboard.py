@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class DashboardSummary(BaseModel):
+    pending_customer_orders: int
+    processing_customer_orders: int
+    low_stock_products: int
+    out_of_stock_products: int
+    today_revenue: float
+    today_order_count: int
+    today_payments_received: float
+    open_supplier_orders: int
+    arrived_supplier_orders: int
+    unpaid_order_count: int
+    unpaid_balance: float
+    generated_at: datetime
@@ -0,0 +1,24 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class ExportFormat(str, Enum):
+    PARQUET = "parquet"
+    ARROW = "arrow"
+
+
+class ExportedTable(BaseModel):
+    table: str
+    rows: int
+    file: Optional[str] = None
+    watermark_updated_at: Optional[datetime] = None
+    watermark_id: Optional[int] = None
+
+
+class ExportRunResult(BaseModel):
+    format: ExportFormat
+    full: bool
+    tables: list[ExportedTable]
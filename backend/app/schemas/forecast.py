@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class ReorderSuggestion(BaseModel):
+    product_id: int
+    product_name: str
+    category: str
+    stock: int
+    current_reorder_level: int
+    current_reorder_amount: int
+    suggested_reorder_level: int
+    suggested_reorder_amount: int
+    daily_demand: float
+    demand_std: float
+    lead_time_days: float
+    generated_at: datetime
+    applied_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ForecastRunResult(BaseModel):
+    products: int
+    order_lines: int
+    history_days: int
+    generated_at: datetime
+
+
+class ApplySuggestionsRequest(BaseModel):
+    """Product IDs to apply; omit to apply every pending suggestion"""
+
+    product_ids: Optional[list[int]] = None
@@ -95,9 +95,57 @@ class PaymentSummary(BaseModel):
     customer_order_id: int
     order_total: float
     total_paid: float
+    total_refunded: float = 0
     remaining_balance: float
     payment_count: int
     is_fully_paid: bool
 
     class Config:
         from_attributes = True
+
+
+class PaymentSearchPage(BaseModel):
+    items: list[PaymentListResponse]
+    next_cursor: Optional[str] = None
+
+
+class PaymentSettlementItem(BaseModel):
+    payment_id: int
+    outcome: PaymentStatus
+    reason: Optional[str] = None
+
+    @field_validator("outcome")
+    @classmethod
+    def outcome_must_be_final(cls, v: PaymentStatus) -> PaymentStatus:
+        if v == PaymentStatus.PENDING:
+            raise ValueError("Settlement outcome must be completed, failed or refunded")
+        return v
+
+
+class PaymentSettlementRequest(BaseModel):
+    items: list[PaymentSettlementItem]
+
+    @field_validator("items")
+    @classmethod
+    def items_within_limit(
+        cls, v: list[PaymentSettlementItem]
+    ) -> list[PaymentSettlementItem]:
+        if not v:
+            raise ValueError("At least one payment is required")
+        if len(v) > 5000:
+            raise ValueError("At most 5000 payments can be settled at once")
+        return v
+
+
+class PaymentSettlementResult(BaseModel):
+    payment_id: int
+    outcome: PaymentStatus
+    success: bool
+    previous_status: Optional[PaymentStatus] = None
+    detail: Optional[str] = None
+
+
+class PaymentSettlementResponse(BaseModel):
+    settled: int
+    rejected: int
+    results: list[PaymentSettlementResult]
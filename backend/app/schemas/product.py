@@ -1,9 +1,25 @@
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
+from urllib.parse import urlparse
 
 from pydantic import BaseModel, field_validator
 
 
+def validate_image_url(v: Optional[str]) -> Optional[str]:
+    if not v or not v.strip():
+        return None
+    v = v.strip()
+    if len(v) > 500:
+        raise ValueError("Image URL is too long")
+    parsed = urlparse(v)
+    # absolute http(s) URLs, or paths on this API such as uploaded images
+    if parsed.scheme in ("http", "https") and parsed.netloc:
+        return v
+    if not parsed.scheme and v.startswith("/") and not v.startswith("//"):
+        return v
+    raise ValueError("Image URL must be an http(s) URL")
+
+
 class ProductBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -74,7 +90,11 @@ class ProductBase(BaseModel):
 
 
 class ProductCreate(ProductBase):
-    pass
+    # only checked on input, so legacy rows with free-form URLs still load
+    @field_validator("image_url")
+    @classmethod
+    def image_url_valid(cls, v: Optional[str]) -> Optional[str]:
+        return validate_image_url(v)
 
 
 class ProductUpdate(BaseModel):
@@ -145,9 +165,19 @@ class ProductUpdate(BaseModel):
             raise ValueError("Category cannot be empty")
         return v.strip() if v else v
 
+    @field_validator("image_url")
+    @classmethod
+    def image_url_valid(cls, v: Optional[str]) -> Optional[str]:
+        return validate_image_url(v)
+
 
 class ProductResponse(ProductBase):
     id: int
+    thumbnail_url: Optional[str] = None
+    image_width: Optional[int] = None
+    image_height: Optional[int] = None
+    image_color: Optional[str] = None
+    version: int = 1
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -168,8 +198,118 @@ class ProductListResponse(BaseModel):
     reorder_amount: int
     category: str
     image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    image_width: Optional[int] = None
+    image_height: Optional[int] = None
+    image_color: Optional[str] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
+
+
+class CategorySummary(BaseModel):
+    name: str
+    product_count: int
+    min_price: float
+    max_price: float
+
+
+class ProductSearchHit(ProductListResponse):
+    score: float
+
+
+class ProductSearchPage(BaseModel):
+    items: list[ProductSearchHit]
+    total: int
+    limit: int
+    offset: int
+
+
+class FacetCount(BaseModel):
+    value: str
+    label: str
+    count: int
+
+
+class PriceRangeFacet(BaseModel):
+    min_price: float
+    max_price: Optional[float] = None
+    count: int
+
+
+class ProductFacets(BaseModel):
+    categories: list[FacetCount]
+    suppliers: list[FacetCount]
+    price_ranges: list[PriceRangeFacet]
+    in_stock: int
+    out_of_stock: int
+
+
+class ProductBrowsePage(BaseModel):
+    items: list[ProductListResponse]
+    total: int
+    limit: int
+    offset: int
+    facets: ProductFacets
+
+
+class ProductImportError(BaseModel):
+    line: int
+    error: str
+
+
+class ProductImportReport(BaseModel):
+    processed: int
+    created: int
+    updated: int
+    failed: int
+    errors: list[ProductImportError]
+    errors_truncated: bool = False
+    # rows up to this input line are saved; later ones are not if aborted is set
+    committed_through_line: int = 0
+    aborted: Optional[str] = None
+
+
+class ProductBulkItem(BaseModel):
+    id: int
+    fields: ProductUpdate
+
+
+class ProductBulkFilter(BaseModel):
+    category: Optional[str] = None
+    supplier_id: Optional[int] = None
+    ids: Optional[list[int]] = None
+
+
+class ProductBulkRule(BaseModel):
+    """e.g. {"field": "selling_price", "operation": "percent", "value": 5,
+    "where": {"category": "Food"}} raises Food prices by 5%"""
+
+    field: Literal[
+        "selling_price", "purchase_price", "stock", "reorder_level", "reorder_amount"
+    ]
+    operation: Literal["set", "add", "multiply", "percent"]
+    value: float
+    where: ProductBulkFilter = ProductBulkFilter()
+
+
+class ProductBulkUpdateRequest(BaseModel):
+    items: list[ProductBulkItem] = []
+    rules: list[ProductBulkRule] = []
+
+
+class ProductBulkUpdateResult(BaseModel):
+    items_updated: int
+    items_not_found: list[int]
+    rules_matched: list[int]
+    rules_updated: list[int]
+
+
+class ProductPricePoint(BaseModel):
+    valid_from: datetime
+    valid_to: Optional[datetime] = None
+    selling_price: float
+    purchase_price: float
+    margin: float
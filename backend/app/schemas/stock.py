@@ -0,0 +1,12 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class StockAsOf(BaseModel):
+    product_id: int
+    as_of: datetime
+    stock: int
+    checkpoint_at: Optional[datetime] = None
+    replayed_movements: int
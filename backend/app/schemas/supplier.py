@@ -46,3 +46,20 @@ class SupplierBrief(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class SupplierStats(BaseModel):
+    """Rolling lead-time statistics for a supplier"""
+
+    supplier_id: int
+    supplier_name: str
+    arrivals: int
+    completions: int
+    mean_arrival_hours: Optional[float] = None
+    p90_arrival_hours: Optional[float] = None
+    mean_lead_hours: Optional[float] = None
+    p90_lead_hours: Optional[float] = None
+    on_time_rate: Optional[float] = None
+    on_time_threshold_hours: float
+    last_arrival_at: Optional[datetime] = None
+    last_completed_at: Optional[datetime] = None
@@ -95,3 +95,23 @@ class SupplierOrderWithItems(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class ReceivingLedgerEntry(BaseModel):
+    """One received line from a completed supplier order"""
+
+    id: int
+    supplier_order_id: int
+    supplier_id: int
+    supplier_name: str
+    product_id: int
+    product_name: str
+    quantity: int
+    unit_cost: float
+    line_total: float
+    ordered_at: datetime
+    arrived_at: Optional[datetime] = None
+    completed_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -1,13 +1,47 @@
 from app.services import (
+    analytics_service,
+    catalog_service,
+    category_service,
+    customer_metrics_service,
     customer_order_service,
+    dashboard_service,
+    export_service,
+    forecast_service,
+    inventory_valuation_service,
     payment_service,
+    price_history_service,
+    product_browse_service,
+    product_bulk_service,
+    product_image_service,
+    product_import_service,
+    product_search_service,
+    reconciliation_service,
+    stock_journal_service,
     supplier_order_service,
     supplier_service,
+    supplier_stats_service,
 )
 
 __all__ = [
+    "analytics_service",
+    "catalog_service",
+    "category_service",
+    "customer_metrics_service",
     "customer_order_service",
+    "dashboard_service",
+    "export_service",
+    "forecast_service",
+    "inventory_valuation_service",
     "payment_service",
+    "price_history_service",
+    "product_browse_service",
+    "product_bulk_service",
+    "product_image_service",
+    "product_import_service",
+    "product_search_service",
+    "reconciliation_service",
+    "stock_journal_service",
     "supplier_order_service",
     "supplier_service",
+    "supplier_stats_service",
 ]
@@ -0,0 +1,261 @@
+from datetime import date
+
+from app.schemas.analytics import SalesGroupBy, SalesReport, SalesRow
+from app.utils.sql import in_clause
+
+
+def record_order_completed(db: dict, order_id: int) -> None:
+    """Add a newly completed order to today's sales rollups"""
+    cursor = db["cursor"]
+    cursor.execute(
+        """
+        INSERT INTO sales_daily_product (day, product_id, quantity, revenue, order_count)
+        SELECT CURRENT_DATE, coi.product_id, coi.quantity, coi.quantity * coi.unit_price, 1
+        FROM customer_order_items coi
+        WHERE coi.customer_order_id = %s
+        ON DUPLICATE KEY UPDATE
+            sales_daily_product.quantity = sales_daily_product.quantity + VALUES(quantity),
+            sales_daily_product.revenue = sales_daily_product.revenue + VALUES(revenue),
+            sales_daily_product.order_count = sales_daily_product.order_count + 1
+        """,
+        (order_id,),
+    )
+    cursor.execute(
+        """
+        INSERT INTO sales_daily_category (day, category, quantity, revenue, order_count)
+        SELECT CURRENT_DATE, p.category, SUM(coi.quantity), SUM(coi.quantity * coi.unit_price), 1
+        FROM customer_order_items coi
+        JOIN products p ON coi.product_id = p.id
+        WHERE coi.customer_order_id = %s
+        GROUP BY p.category
+        ON DUPLICATE KEY UPDATE
+            quantity = quantity + VALUES(quantity),
+            revenue = revenue + VALUES(revenue),
+            order_count = order_count + 1
+        """,
+        (order_id,),
+    )
+    cursor.execute(
+        """
+        INSERT INTO sales_daily (day, quantity, revenue, order_count)
+        SELECT CURRENT_DATE, COALESCE(SUM(coi.quantity), 0),
+               COALESCE(SUM(coi.quantity * coi.unit_price), 0), 1
+        FROM customer_order_items coi
+        WHERE coi.customer_order_id = %s
+        ON DUPLICATE KEY UPDATE
+            sales_daily.quantity = sales_daily.quantity + VALUES(quantity),
+            sales_daily.revenue = sales_daily.revenue + VALUES(revenue),
+            sales_daily.order_count = sales_daily.order_count + 1
+        """,
+        (order_id,),
+    )
+
+
+def record_payments_completed(db: dict, payment_ids: list[int]) -> None:
+    if not payment_ids:
+        return
+    db["cursor"].execute(
+        f"""
+        INSERT INTO sales_daily_payment_method (day, payment_method, amount, payment_count)
+        SELECT CURRENT_DATE, payment_method, SUM(amount), COUNT(*)
+        FROM payments
+        WHERE id IN ({in_clause(payment_ids)})
+        GROUP BY payment_method
+        ON DUPLICATE KEY UPDATE
+            amount = amount + VALUES(amount),
+            payment_count = payment_count + VALUES(payment_count)
+        """,
+        tuple(payment_ids),
+    )
+
+
+def record_payments_refunded(db: dict, payment_ids: list[int]) -> None:
+    if not payment_ids:
+        return
+    db["cursor"].execute(
+        f"""
+        INSERT INTO sales_daily_payment_method (day, payment_method, refunded_amount, refund_count)
+        SELECT CURRENT_DATE, payment_method, SUM(amount), COUNT(*)
+        FROM payments
+        WHERE id IN ({in_clause(payment_ids)})
+        GROUP BY payment_method
+        ON DUPLICATE KEY UPDATE
+            refunded_amount = refunded_amount + VALUES(refunded_amount),
+            refund_count = refund_count + VALUES(refund_count)
+        """,
+        tuple(payment_ids),
+    )
+
+
+def rebuild_sales_rollups(db: dict) -> dict:
+    """Recompute every rollup from the raw order and payment tables"""
+    cursor = db["cursor"]
+    for table in (
+        "sales_daily",
+        "sales_daily_product",
+        "sales_daily_category",
+        "sales_daily_payment_method",
+    ):
+        cursor.execute(f"DELETE FROM {table}")
+
+    cursor.execute(
+        """
+        INSERT INTO sales_daily_product (day, product_id, quantity, revenue, order_count)
+        SELECT DATE(co.completed_at), coi.product_id, SUM(coi.quantity),
+               SUM(coi.quantity * coi.unit_price), COUNT(DISTINCT co.id)
+        FROM customer_orders co
+        JOIN customer_order_items coi ON coi.customer_order_id = co.id
+        WHERE co.status = 'completed' AND co.completed_at IS NOT NULL
+        GROUP BY DATE(co.completed_at), coi.product_id
+        """
+    )
+    cursor.execute(
+        """
+        INSERT INTO sales_daily_category (day, category, quantity, revenue, order_count)
+        SELECT DATE(co.completed_at), p.category, SUM(coi.quantity),
+               SUM(coi.quantity * coi.unit_price), COUNT(DISTINCT co.id)
+        FROM customer_orders co
+        JOIN customer_order_items coi ON coi.customer_order_id = co.id
+        JOIN products p ON coi.product_id = p.id
+        WHERE co.status = 'completed' AND co.completed_at IS NOT NULL
+        GROUP BY DATE(co.completed_at), p.category
+        """
+    )
+    cursor.execute(
+        """
+        INSERT INTO sales_daily (day, quantity, revenue, order_count)
+        SELECT DATE(co.completed_at), COALESCE(SUM(coi.quantity), 0),
+               COALESCE(SUM(coi.quantity * coi.unit_price), 0), COUNT(DISTINCT co.id)
+        FROM customer_orders co
+        LEFT JOIN customer_order_items coi ON coi.customer_order_id = co.id
+        WHERE co.status = 'completed' AND co.completed_at IS NOT NULL
+        GROUP BY DATE(co.completed_at)
+        """
+    )
+    cursor.execute(
+        """
+        INSERT INTO sales_daily_payment_method (day, payment_method, amount, payment_count)
+        SELECT DATE(payment_date), payment_method, SUM(amount), COUNT(*)
+        FROM payments
+        WHERE payment_status IN ('completed', 'refunded') AND payment_date IS NOT NULL
+        GROUP BY DATE(payment_date), payment_method
+        """
+    )
+    cursor.execute(
+        """
+        INSERT INTO sales_daily_payment_method (day, payment_method, refunded_amount, refund_count)
+        SELECT DATE(updated_at), payment_method, SUM(amount), COUNT(*)
+        FROM payments
+        WHERE payment_status = 'refunded'
+        GROUP BY DATE(updated_at), payment_method
+        ON DUPLICATE KEY UPDATE
+            refunded_amount = VALUES(refunded_amount),
+            refund_count = VALUES(refund_count)
+        """
+    )
+    return {"message": "Sales rollups rebuilt"}
+
+
+def get_sales_report(
+    db: dict, date_from: date, date_to: date, group_by: SalesGroupBy
+) -> SalesReport:
+    cursor = db["cursor"]
+    params = (date_from, date_to)
+
+    if group_by == SalesGroupBy.DAY:
+        cursor.execute(
+            """
+            SELECT day, SUM(quantity) as quantity, SUM(revenue) as amount,
+                   SUM(order_count) as count
+            FROM sales_daily
+            WHERE day BETWEEN %s AND %s
+            GROUP BY day
+            ORDER BY day
+            """,
+            params,
+        )
+        rows = [
+            SalesRow(
+                key=r["day"].isoformat(),
+                label=r["day"].isoformat(),
+                quantity=int(r["quantity"]),
+                amount=float(r["amount"]),
+                count=int(r["count"]),
+            )
+            for r in cursor.fetchall()
+        ]
+    elif group_by == SalesGroupBy.PRODUCT:
+        cursor.execute(
+            """
+            SELECT s.product_id, p.name, SUM(s.quantity) as quantity,
+                   SUM(s.revenue) as amount, SUM(s.order_count) as count
+            FROM sales_daily_product s
+            LEFT JOIN products p ON s.product_id = p.id
+            WHERE s.day BETWEEN %s AND %s
+            GROUP BY s.product_id, p.name
+            ORDER BY amount DESC
+            """,
+            params,
+        )
+        rows = [
+            SalesRow(
+                key=str(r["product_id"]),
+                label=r["name"] or "Unknown",
+                quantity=int(r["quantity"]),
+                amount=float(r["amount"]),
+                count=int(r["count"]),
+            )
+            for r in cursor.fetchall()
+        ]
+    elif group_by == SalesGroupBy.CATEGORY:
+        cursor.execute(
+            """
+            SELECT category, SUM(quantity) as quantity, SUM(revenue) as amount,
+                   SUM(order_count) as count
+            FROM sales_daily_category
+            WHERE day BETWEEN %s AND %s
+            GROUP BY category
+            ORDER BY amount DESC
+            """,
+            params,
+        )
+        rows = [
+            SalesRow(
+                key=r["category"],
+                label=r["category"],
+                quantity=int(r["quantity"]),
+                amount=float(r["amount"]),
+                count=int(r["count"]),
+            )
+            for r in cursor.fetchall()
+        ]
+    else:
+        cursor.execute(
+            """
+            SELECT payment_method, SUM(amount) as amount, SUM(payment_count) as count,
+                   SUM(refunded_amount) as refunded_amount
+            FROM sales_daily_payment_method
+            WHERE day BETWEEN %s AND %s
+            GROUP BY payment_method
+            ORDER BY amount DESC
+            """,
+            params,
+        )
+        rows = [
+            SalesRow(
+                key=r["payment_method"],
+                label=r["payment_method"].replace("_", " ").title(),
+                amount=float(r["amount"]),
+                count=int(r["count"]),
+                refunded_amount=float(r["refunded_amount"]),
+            )
+            for r in cursor.fetchall()
+        ]
+
+    return SalesReport(
+        date_from=date_from,
+        date_to=date_to,
+        group_by=group_by,
+        total_amount=sum(r.amount for r in rows),
+        rows=rows,
+    )
@@ -0,0 +1,177 @@
+import hashlib
+import os
+from typing import Iterable, List, Optional
+
+from pydantic import TypeAdapter
+
+from app.database import get_connection
+from app.schemas.product import ProductListResponse
+from app.services import supplier_service
+from app.utils.cache import (
+    VersionedValue,
+    after_commit,
+    bump_versions_on_commit,
+    get_version,
+)
+from app.utils.fields import select_list
+
+CATALOG_CACHE_KEY = "catalog"
+# Bumped only when products are added or removed or renamed or recategorised
+PRODUCT_NAMES_CACHE_KEY = "catalog:names"
+NAME_FIELDS = {"name", "category"}
+# Per-category versions are "category:<name>" rows in cache_versions
+CATEGORY_CACHE_PREFIX = "category:"
+# How long a worker trusts its cached snapshot before re-checking the version
+CATALOG_CACHE_CHECK_SECONDS = float(os.getenv("CATALOG_CACHE_CHECK_SECONDS", "2"))
+
+_product_list_adapter = TypeAdapter(List[ProductListResponse])
+
+# ?fields= names for GET /products/; supplier_name is resolved from the id
+PRODUCT_LIST_COLUMNS = {
+    field: "p.supplier_id" if field == "supplier_name" else f"p.{field}"
+    for field in ProductListResponse.model_fields
+}
+
+# (etag, body) of the full product list
+_catalog_cache: VersionedValue[tuple[str, bytes]] = VersionedValue(
+    CATALOG_CACHE_CHECK_SECONDS
+)
+
+
+def touch_categories(
+    db: dict,
+    categories: Iterable[str] = (),
+    where_sql: Optional[str] = None,
+    params: tuple = (),
+) -> None:
+    """Bump the version of the named categories and of the categories of
+    products matching a WHERE clause over ``products p``, at commit"""
+    names = {c for c in categories if c}
+    if where_sql:
+        cursor = db["cursor"]
+        cursor.execute(
+            f"SELECT DISTINCT p.category FROM products p WHERE {where_sql}",
+            tuple(params),
+        )
+        names.update(r["category"] for r in cursor.fetchall() if r["category"])
+    bump_versions_on_commit(db, (CATEGORY_CACHE_PREFIX + name for name in names))
+
+
+def invalidate_catalog(
+    db: dict,
+    categories: Iterable[str] = (),
+    where_sql: Optional[str] = None,
+    params: tuple = (),
+    names_changed: bool = False,
+) -> None:
+    """Call from any write that changes what GET /products/ returns, naming
+    the affected categories directly or via a WHERE clause over ``products p``.
+    Pass names_changed for creates, deletes and name or category edits."""
+    names = [CATALOG_CACHE_KEY]
+    if names_changed:
+        names.append(PRODUCT_NAMES_CACHE_KEY)
+    bump_versions_on_commit(db, names)
+    touch_categories(db, categories, where_sql, params)
+    # expiring before the commit would let a refresh re-cache the old version
+    after_commit(db, _catalog_cache.expire)
+
+
+def build_catalog_body(db: dict) -> bytes:
+    cursor = db["cursor"]
+    cursor.execute("SELECT * FROM products ORDER BY name")
+    rows = cursor.fetchall()
+    products = [
+        ProductListResponse.model_validate(
+            {
+                **p,
+                "supplier_name": supplier_service.get_supplier_name(
+                    db, p["supplier_id"]
+                )
+                or "Unknown",
+            }
+        )
+        for p in rows
+    ]
+    return _product_list_adapter.dump_json(products)
+
+
+def catalog_version(db: dict) -> tuple[int, int]:
+    cursor = db["cursor"]
+    # Supplier renames change supplier_name in the snapshot too
+    return (
+        get_version(cursor, CATALOG_CACHE_KEY),
+        get_version(cursor, supplier_service.SUPPLIER_CACHE_KEY),
+    )
+
+
+def build_catalog_snapshot(db: dict) -> tuple[str, bytes]:
+    body = build_catalog_body(db)
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"', body
+
+
+def get_cached_etag() -> Optional[str]:
+    """ETag of the snapshot if it is still within its check window, no DB access"""
+    snapshot = _catalog_cache.peek()
+    return snapshot[0] if snapshot else None
+
+
+def get_catalog_snapshot() -> tuple[str, bytes]:
+    """Return (etag, serialized JSON) for the full product list"""
+    snapshot = _catalog_cache.peek()
+    if snapshot:
+        return snapshot
+
+    # opened only by the caller that ends up checking the version
+    db: dict = {}
+
+    def connect() -> dict:
+        if not db:
+            conn = get_connection()
+            db.update(conn=conn, cursor=conn.cursor())
+        return db
+
+    try:
+        snapshot = _catalog_cache.get(
+            lambda: catalog_version(connect()),
+            lambda version, previous: build_catalog_snapshot(connect()),
+        )
+        if db:
+            db["conn"].commit()
+        return snapshot
+    finally:
+        if db:
+            db["cursor"].close()
+            db["conn"].close()
+
+
+def get_products_sparse(fields: list[str]) -> list[dict]:
+    """Only the requested columns, straight from the database"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    db = {"conn": conn, "cursor": cursor}
+    try:
+        cursor.execute(
+            f"""
+            SELECT {select_list(fields, PRODUCT_LIST_COLUMNS)}
+            FROM products p ORDER BY p.name
+            """
+        )
+        rows = cursor.fetchall()
+        if "supplier_name" in fields:
+            for row in rows:
+                row["supplier_name"] = (
+                    supplier_service.get_supplier_name(db, row["supplier_name"])
+                    or "Unknown"
+                )
+        conn.commit()
+        return rows
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    if not if_none_match or not etag:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
@@ -0,0 +1,124 @@
+import hashlib
+import os
+from typing import List, Optional
+
+from pydantic import TypeAdapter
+
+from app.schemas.product import CategorySummary, ProductListResponse
+from app.services import supplier_service
+from app.services.catalog_service import CATEGORY_CACHE_PREFIX
+from app.utils.cache import VersionedValue, get_version
+
+CATEGORY_CACHE_CHECK_SECONDS = float(os.getenv("CATEGORY_CACHE_CHECK_SECONDS", "2"))
+
+_product_list_adapter = TypeAdapter(List[ProductListResponse])
+_summary_list_adapter = TypeAdapter(List[CategorySummary])
+
+# {"supplier_version", "versions", "snapshots": name -> {"etag", "body",
+# "summary"}, "list": (etag, body) of the summary list}
+_category_cache: VersionedValue[dict] = VersionedValue(CATEGORY_CACHE_CHECK_SECONDS)
+
+
+def _etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def build_category_snapshot(db: dict, name: str) -> Optional[dict]:
+    cursor = db["cursor"]
+    # served by idx_products_category
+    cursor.execute("SELECT * FROM products WHERE category = %s ORDER BY name", (name,))
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    products = [
+        ProductListResponse.model_validate(
+            {
+                **p,
+                "supplier_name": supplier_service.get_supplier_name(
+                    db, p["supplier_id"]
+                )
+                or "Unknown",
+            }
+        )
+        for p in rows
+    ]
+    body = _product_list_adapter.dump_json(products)
+    prices = [p.selling_price for p in products]
+    return {
+        "etag": _etag(body),
+        "body": body,
+        "summary": CategorySummary(
+            name=name,
+            product_count=len(products),
+            min_price=min(prices),
+            max_price=max(prices),
+        ),
+    }
+
+
+def category_versions(db: dict) -> tuple[int, dict[str, int]]:
+    cursor = db["cursor"]
+    # supplier names are embedded, so a supplier change rebuilds everything
+    supplier_version = get_version(cursor, supplier_service.SUPPLIER_CACHE_KEY)
+    cursor.execute(
+        "SELECT name, version FROM cache_versions WHERE name LIKE %s",
+        (CATEGORY_CACHE_PREFIX + "%",),
+    )
+    versions = {
+        r["name"][len(CATEGORY_CACHE_PREFIX) :]: r["version"] for r in cursor.fetchall()
+    }
+    return supplier_version, versions
+
+
+def build_category_cache(
+    db: dict, version: tuple[int, dict[str, int]], previous: Optional[dict]
+) -> dict:
+    supplier_version, versions = version
+    if previous is None or supplier_version != previous["supplier_version"]:
+        cursor = db["cursor"]
+        cursor.execute("SELECT DISTINCT category FROM products")
+        stale = {r["category"] for r in cursor.fetchall()}
+        snapshots: dict = {}
+    else:
+        # only categories a write has touched since the last check
+        stale = {
+            name
+            for name, v in versions.items()
+            if previous["versions"].get(name) != v
+        }
+        snapshots = dict(previous["snapshots"])
+
+    for name in stale:
+        snapshot = build_category_snapshot(db, name)
+        if snapshot:
+            snapshots[name] = snapshot
+        else:
+            snapshots.pop(name, None)
+
+    body = _summary_list_adapter.dump_json(
+        [snapshots[name]["summary"] for name in sorted(snapshots)]
+    )
+    return {
+        "supplier_version": supplier_version,
+        "versions": versions,
+        "snapshots": snapshots,
+        "list": (_etag(body), body),
+    }
+
+
+def refresh_category_cache(db: dict) -> dict:
+    return _category_cache.get(
+        lambda: category_versions(db),
+        lambda version, previous: build_category_cache(db, version, previous),
+    )
+
+
+def get_category_list(db: dict) -> tuple[str, bytes]:
+    return refresh_category_cache(db)["list"]
+
+
+def get_category_products(db: dict, name: str) -> Optional[tuple[str, bytes]]:
+    snapshot = refresh_category_cache(db)["snapshots"].get(name)
+    if not snapshot:
+        return None
+    return snapshot["etag"], snapshot["body"]
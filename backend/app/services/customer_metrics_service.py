@@ -0,0 +1,209 @@
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from pymysql.cursors import SSDictCursor
+
+from app.database import get_connection
+from app.schemas.customer import CustomerMetrics, CustomerSegmentEntry, CustomerSegmentPage
+
+RFM_BUCKETS = 5
+WRITE_CHUNK_SIZE = 1000
+SEGMENT_SORT_COLUMNS = {
+    "rfm_score": "m.rfm_score",
+    "total_spent": "m.total_spent",
+    "order_count": "m.order_count",
+    "last_order_at": "m.last_order_at",
+    "recency_days": "m.recency_days",
+}
+
+
+def score_quintiles(values: np.ndarray, higher_is_better: bool = True) -> np.ndarray:
+    """Bucket values into 1..5 by percentile rank, 5 being the best bucket.
+
+    Ties share the rank of the lowest tied position, so a value held by most
+    customers (e.g. a single order) does not get pushed into a high bucket.
+    """
+    if values.size == 0:
+        return values.astype(np.int64)
+    keyed = values if higher_is_better else -values
+    below = np.searchsorted(np.sort(keyed), keyed, side="left")
+    return below * RFM_BUCKETS // values.size + 1
+
+
+def assign_segments(r: np.ndarray, f: np.ndarray, m: np.ndarray) -> np.ndarray:
+    conditions = [
+        (r >= 4) & (f >= 4) & (m >= 4),
+        (r >= 3) & (f >= 3),
+        (r >= 4) & (f <= 2),
+        (r <= 2) & (f >= 3),
+        (r <= 2) & (f <= 2),
+    ]
+    choices = ["champions", "loyal", "new", "at_risk", "hibernating"]
+    return np.select(conditions, choices, default="needs_attention")
+
+
+def compute_customer_metrics(db: dict) -> dict:
+    cursor = db["cursor"]
+    # DATETIME columns drop fractional seconds; keep the stale-row cutoff exact
+    computed_at = datetime.utcnow().replace(microsecond=0)
+
+    # Stream one aggregated row per customer over a separate unbuffered connection
+    ids, counts, spent, last_order = [], [], [], []
+    read_conn = get_connection()
+    read_cursor = read_conn.cursor(SSDictCursor)
+    try:
+        read_cursor.execute(
+            """
+            SELECT customer_id, COUNT(*) as order_count,
+                   SUM(paid_total) as total_spent, MAX(created_at) as last_order_at
+            FROM customer_orders
+            WHERE status <> 'cancelled'
+            GROUP BY customer_id
+            """
+        )
+        for row in read_cursor:
+            ids.append(row["customer_id"])
+            counts.append(row["order_count"])
+            spent.append(float(row["total_spent"] or 0))
+            last_order.append(row["last_order_at"])
+    finally:
+        read_cursor.close()
+        read_conn.close()
+
+    customer_ids = np.asarray(ids, dtype=np.int64)
+    frequency = np.asarray(counts, dtype=np.int64)
+    monetary = np.asarray(spent, dtype=np.float64)
+    recency = np.asarray(
+        [max((computed_at - t).days, 0) for t in last_order], dtype=np.int64
+    )
+
+    r = score_quintiles(recency, higher_is_better=False)
+    f = score_quintiles(frequency)
+    m = score_quintiles(monetary)
+    rfm = r * 100 + f * 10 + m
+    segments = assign_segments(r, f, m)
+    avg_order = np.divide(
+        monetary, frequency, out=np.zeros_like(monetary), where=frequency > 0
+    )
+
+    params = [
+        (
+            int(customer_ids[i]),
+            int(frequency[i]),
+            round(float(monetary[i]), 2),
+            round(float(avg_order[i]), 2),
+            last_order[i],
+            int(recency[i]),
+            int(r[i]),
+            int(f[i]),
+            int(m[i]),
+            int(rfm[i]),
+            str(segments[i]),
+            computed_at,
+        )
+        for i in range(customer_ids.size)
+    ]
+    for offset in range(0, len(params), WRITE_CHUNK_SIZE):
+        cursor.executemany(
+            """
+            REPLACE INTO customer_metrics
+            (customer_id, order_count, total_spent, avg_order_value, last_order_at,
+             recency_days, r_score, f_score, m_score, rfm_score, segment, computed_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            params[offset : offset + WRITE_CHUNK_SIZE],
+        )
+    # customers with no remaining orders since the last run
+    cursor.execute("DELETE FROM customer_metrics WHERE computed_at < %s", (computed_at,))
+
+    return {
+        "message": f"Computed RFM metrics for {len(params)} customers",
+        "customers": len(params),
+        "computed_at": computed_at,
+    }
+
+
+def metrics_from_row(row: dict) -> CustomerMetrics:
+    return CustomerMetrics.model_validate(
+        {
+            "order_count": row["order_count"],
+            "total_spent": float(row["total_spent"]),
+            "avg_order_value": float(row["avg_order_value"]),
+            "last_order_at": row["last_order_at"],
+            "recency_days": row["recency_days"],
+            "r_score": row["r_score"],
+            "f_score": row["f_score"],
+            "m_score": row["m_score"],
+            "rfm_score": row["rfm_score"],
+            "segment": row["segment"],
+            "computed_at": row["computed_at"],
+        }
+    )
+
+
+def get_customer_metrics(db: dict, customer_id: int) -> Optional[CustomerMetrics]:
+    cursor = db["cursor"]
+    cursor.execute("SELECT * FROM customer_metrics WHERE customer_id = %s", (customer_id,))
+    row = cursor.fetchone()
+    return metrics_from_row(row) if row else None
+
+
+def get_customer_segments(
+    db: dict,
+    segment: Optional[str] = None,
+    sort_by: str = "rfm_score",
+    descending: bool = True,
+    limit: int = 50,
+    offset: int = 0,
+) -> CustomerSegmentPage:
+    cursor = db["cursor"]
+    where = "WHERE m.segment = %s" if segment else ""
+    filter_params = (segment,) if segment else ()
+
+    cursor.execute(f"SELECT COUNT(*) as total FROM customer_metrics m {where}", filter_params)
+    total = cursor.fetchone()["total"]
+
+    direction = "DESC" if descending else "ASC"
+    cursor.execute(
+        f"""
+        SELECT m.*, CONCAT(c.first_name, ' ', c.last_name) as customer_name
+        FROM customer_metrics m
+        JOIN customers c ON m.customer_id = c.id
+        {where}
+        ORDER BY {SEGMENT_SORT_COLUMNS[sort_by]} {direction}, m.customer_id {direction}
+        LIMIT %s OFFSET %s
+        """,
+        filter_params + (limit, offset),
+    )
+    items = [
+        CustomerSegmentEntry.model_validate(
+            {
+                **metrics_from_row(r).model_dump(),
+                "customer_id": r["customer_id"],
+                "customer_name": r["customer_name"],
+            }
+        )
+        for r in cursor.fetchall()
+    ]
+    return CustomerSegmentPage(total=total, items=items)
+
+
+def run_segmentation_job() -> dict:
+    """Recompute RFM metrics outside the API, e.g. from a nightly cron"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        result = compute_customer_metrics({"conn": conn, "cursor": cursor})
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    print(run_segmentation_job())
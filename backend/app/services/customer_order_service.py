@@ -6,6 +6,14 @@ from app.schemas.customer_order import (
     CustomerOrderListResponse,
     CustomerOrderWithItems,
 )
+from app.services import (
+    analytics_service,
+    catalog_service,
+    inventory_valuation_service,
+    stock_journal_service,
+)
+from app.utils.fields import select_list
+from app.utils.sql import in_clause
 
 
 def calculate_total_amount(items: list[dict]) -> float:
@@ -46,6 +54,43 @@ def build_order_response(order_row: dict, items: list[dict]) -> CustomerOrderWit
     )
 
 
+# ?fields= names for the order list endpoints
+CUSTOMER_ORDER_LIST_COLUMNS = {
+    "id": "co.id",
+    "customer_id": "co.customer_id",
+    "customer_name": "COALESCE(CONCAT(c.first_name, ' ', c.last_name), 'Unknown')",
+    "employee_id": "co.employee_id",
+    "employee_username": "u.username",
+    "status": "co.status",
+    "total_amount": "co.total_amount",
+    "item_count": """(
+        SELECT COUNT(*) FROM customer_order_items coi
+        WHERE coi.customer_order_id = co.id
+    )""",
+    "created_at": "co.created_at",
+    "completed_at": "co.completed_at",
+}
+
+
+def get_customer_orders_sparse(
+    db: dict, fields: list[str], customer_id: Optional[int] = None
+) -> list[dict]:
+    sql = f"""
+        SELECT {select_list(fields, CUSTOMER_ORDER_LIST_COLUMNS)}
+        FROM customer_orders co
+        LEFT JOIN customers c ON co.customer_id = c.id
+        LEFT JOIN users u ON co.employee_id = u.id
+    """
+    params: tuple = ()
+    if customer_id is not None:
+        sql += " WHERE co.customer_id = %s"
+        params = (customer_id,)
+    sql += " ORDER BY co.created_at DESC"
+    cursor = db["cursor"]
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+
 def get_all_customer_orders(db: dict) -> List[CustomerOrderListResponse]:
     cursor = db["cursor"]
     cursor.execute(
@@ -277,9 +322,25 @@ def create_customer_order(
             (order_id, item["product_id"], item["quantity"], item["unit_price"]),
         )
         cursor.execute(
-            "UPDATE products SET stock = stock - %s WHERE id = %s",
+            """
+            UPDATE products SET stock = stock - %s, version = version + 1
+            WHERE id = %s
+            """,
             (item["quantity"], item["product_id"]),
         )
+    stock_deltas = [
+        (item["product_id"], -item["quantity"]) for item in items_with_prices
+    ]
+    inventory_valuation_service.apply_stock_deltas(db, stock_deltas)
+    stock_journal_service.record_movements(
+        db, stock_deltas, "customer_order", order_id
+    )
+    if stock_deltas:
+        catalog_service.invalidate_catalog(
+            db,
+            where_sql=f"p.id IN ({in_clause(stock_deltas)})",
+            params=tuple(pid for pid, _ in stock_deltas),
+        )
 
     return get_customer_order(db, order_id)
 
@@ -287,7 +348,10 @@ def create_customer_order(
 def update_order_status(db: dict, order_id: int, new_status: str) -> Optional[dict]:
     cursor = db["cursor"]
 
-    cursor.execute("SELECT status FROM customer_orders WHERE id = %s", (order_id,))
+    # Lock the order so concurrent completions can't both record the sale
+    cursor.execute(
+        "SELECT status FROM customer_orders WHERE id = %s FOR UPDATE", (order_id,)
+    )
     order = cursor.fetchone()
     if not order:
         return None
@@ -314,6 +378,7 @@ def update_order_status(db: dict, order_id: int, new_status: str) -> Optional[di
             """,
             (new_status, order_id),
         )
+        analytics_service.record_order_completed(db, order_id)
     else:
         cursor.execute(
             """
@@ -349,9 +414,23 @@ def cancel_customer_order(db: dict, order_id: int) -> Optional[dict]:
 
     for item in items:
         cursor.execute(
-            "UPDATE products SET stock = stock + %s WHERE id = %s",
+            """
+            UPDATE products SET stock = stock + %s, version = version + 1
+            WHERE id = %s
+            """,
             (item["quantity"], item["product_id"]),
         )
+    stock_deltas = [(item["product_id"], item["quantity"]) for item in items]
+    inventory_valuation_service.apply_stock_deltas(db, stock_deltas)
+    stock_journal_service.record_movements(
+        db, stock_deltas, "customer_order_cancelled", order_id
+    )
+    if stock_deltas:
+        catalog_service.invalidate_catalog(
+            db,
+            where_sql=f"p.id IN ({in_clause(stock_deltas)})",
+            params=tuple(pid for pid, _ in stock_deltas),
+        )
 
     cursor.execute(
         """
@@ -0,0 +1,63 @@
+import os
+from datetime import datetime
+
+from app.database import get_connection
+from app.schemas.dashboard import DashboardSummary
+from app.utils.cache import CoalescedValue
+
+DASHBOARD_CACHE_SECONDS = float(os.getenv("DASHBOARD_CACHE_SECONDS", "5"))
+
+_summary_cache = CoalescedValue(DASHBOARD_CACHE_SECONDS)
+
+
+def compute_dashboard_summary(db: dict) -> DashboardSummary:
+    cursor = db["cursor"]
+    # One round trip: every figure is a scalar subquery over an index or a rollup
+    cursor.execute(
+        """
+        SELECT
+            (SELECT COUNT(*) FROM customer_orders WHERE status = 'pending') as pending_customer_orders,
+            (SELECT COUNT(*) FROM customer_orders WHERE status = 'processing') as processing_customer_orders,
+            (SELECT COUNT(*) FROM products WHERE stock > 0 AND stock <= reorder_level) as low_stock_products,
+            (SELECT COUNT(*) FROM products WHERE stock <= 0) as out_of_stock_products,
+            (SELECT COALESCE(SUM(revenue), 0) FROM sales_daily WHERE day = CURRENT_DATE) as today_revenue,
+            (SELECT COALESCE(SUM(order_count), 0) FROM sales_daily WHERE day = CURRENT_DATE) as today_order_count,
+            (SELECT COALESCE(SUM(amount), 0) FROM sales_daily_payment_method WHERE day = CURRENT_DATE) as today_payments_received,
+            (SELECT COUNT(*) FROM supplier_orders WHERE status = 'processing') as open_supplier_orders,
+            (SELECT COUNT(*) FROM supplier_orders WHERE status = 'arrived') as arrived_supplier_orders,
+            (SELECT COUNT(*) FROM customer_orders
+             WHERE status <> 'cancelled' AND paid_total < total_amount) as unpaid_order_count,
+            (SELECT COALESCE(SUM(total_amount - paid_total), 0) FROM customer_orders
+             WHERE status <> 'cancelled' AND paid_total < total_amount) as unpaid_balance
+        """
+    )
+    row = cursor.fetchone()
+    return DashboardSummary(
+        pending_customer_orders=row["pending_customer_orders"],
+        processing_customer_orders=row["processing_customer_orders"],
+        low_stock_products=row["low_stock_products"],
+        out_of_stock_products=row["out_of_stock_products"],
+        today_revenue=float(row["today_revenue"]),
+        today_order_count=int(row["today_order_count"]),
+        today_payments_received=float(row["today_payments_received"]),
+        open_supplier_orders=row["open_supplier_orders"],
+        arrived_supplier_orders=row["arrived_supplier_orders"],
+        unpaid_order_count=row["unpaid_order_count"],
+        unpaid_balance=float(row["unpaid_balance"]),
+        generated_at=datetime.utcnow(),
+    )
+
+
+def _load_summary() -> DashboardSummary:
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        return compute_dashboard_summary({"conn": conn, "cursor": cursor})
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_dashboard_summary() -> DashboardSummary:
+    """Serve the cached summary, opening a connection only when it expires"""
+    return _summary_cache.get(_load_summary)
@@ -0,0 +1,250 @@
+import os
+from datetime import datetime
+from typing import Iterator
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.database import get_connection
+from app.schemas.export import ExportedTable, ExportFormat, ExportRunResult
+from app.utils.sql import in_clause
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_BATCH_SIZE = 10000
+EPOCH = datetime(1970, 1, 1)
+
+_money = pa.decimal128(12, 2)
+_price = pa.decimal128(10, 2)
+_ts = pa.timestamp("s")
+
+# Each export walks its driver table in (updated_at, id) order
+EXPORT_SPECS = {
+    "products": {
+        "driver": "products",
+        "schema": pa.schema(
+            [
+                ("id", pa.int32()),
+                ("name", pa.string()),
+                ("description", pa.string()),
+                ("selling_price", _price),
+                ("purchase_price", _price),
+                ("supplier_id", pa.int32()),
+                ("stock", pa.int32()),
+                ("reorder_level", pa.int32()),
+                ("reorder_amount", pa.int32()),
+                ("category", pa.string()),
+                ("image_url", pa.string()),
+                ("created_at", _ts),
+                ("updated_at", _ts),
+            ]
+        ),
+    },
+    "customer_orders": {
+        "driver": "customer_orders",
+        "schema": pa.schema(
+            [
+                ("id", pa.int32()),
+                ("customer_id", pa.int32()),
+                ("employee_id", pa.int32()),
+                ("status", pa.string()),
+                ("total_amount", _money),
+                ("paid_total", _money),
+                ("refunded_total", _money),
+                ("payment_count", pa.int32()),
+                ("notes", pa.string()),
+                ("created_at", _ts),
+                ("updated_at", _ts),
+                ("completed_at", _ts),
+            ]
+        ),
+    },
+    # items carry no timestamp of their own, so they follow their order
+    "customer_order_items": {
+        "driver": "customer_orders",
+        "schema": pa.schema(
+            [
+                ("customer_order_id", pa.int32()),
+                ("product_id", pa.int32()),
+                ("quantity", pa.int32()),
+                ("unit_price", _price),
+                ("order_updated_at", _ts),
+            ]
+        ),
+    },
+    "payments": {
+        "driver": "payments",
+        "schema": pa.schema(
+            [
+                ("id", pa.int32()),
+                ("customer_order_id", pa.int32()),
+                ("amount", _money),
+                ("payment_method", pa.string()),
+                ("payment_status", pa.string()),
+                ("transaction_reference", pa.string()),
+                ("payment_date", _ts),
+                ("created_at", _ts),
+                ("updated_at", _ts),
+            ]
+        ),
+    },
+}
+
+
+def get_watermark(cursor, table: str) -> tuple[datetime, int]:
+    cursor.execute(
+        "SELECT last_updated_at, last_id FROM export_watermarks WHERE table_name = %s",
+        (table,),
+    )
+    row = cursor.fetchone()
+    return (row["last_updated_at"], row["last_id"]) if row else (EPOCH, 0)
+
+
+def _iter_batches(
+    cursor,
+    table: str,
+    since: tuple[datetime, int],
+    cutoff: datetime,
+    batch_size: int,
+) -> Iterator[tuple[list[dict], tuple[datetime, int]]]:
+    spec = EXPORT_SPECS[table]
+    last_at, last_id = since
+    while True:
+        cursor.execute(
+            f"""
+            SELECT * FROM {spec['driver']} t
+            WHERE t.updated_at < %s
+              AND (t.updated_at > %s OR (t.updated_at = %s AND t.id > %s))
+            ORDER BY t.updated_at, t.id
+            LIMIT %s
+            """,
+            (cutoff, last_at, last_at, last_id, batch_size),
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        last_at, last_id = rows[-1]["updated_at"], rows[-1]["id"]
+
+        if table == "customer_order_items":
+            updated = {r["id"]: r["updated_at"] for r in rows}
+            cursor.execute(
+                f"""
+                SELECT customer_order_id, product_id, quantity, unit_price
+                FROM customer_order_items
+                WHERE customer_order_id IN ({in_clause(updated)})
+                """,
+                tuple(updated),
+            )
+            items = cursor.fetchall()
+            for item in items:
+                item["order_updated_at"] = updated[item["customer_order_id"]]
+            yield items, (last_at, last_id)
+        else:
+            yield rows, (last_at, last_id)
+
+        if len(rows) < batch_size:
+            return
+
+
+def _open_writer(path: str, schema: pa.Schema, fmt: ExportFormat):
+    if fmt == ExportFormat.PARQUET:
+        return pq.ParquetWriter(path, schema, compression="zstd")
+    return pa.ipc.new_file(path, schema)
+
+
+def export_table(
+    db: dict,
+    table: str,
+    fmt: ExportFormat,
+    full: bool = False,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> ExportedTable:
+    cursor = db["cursor"]
+    schema = EXPORT_SPECS[table]["schema"]
+    since = (EPOCH, 0) if full else get_watermark(cursor, table)
+    # Stop short of the current second so rows still being written in it are
+    # picked up by the next run instead of skipped by the watermark.
+    cursor.execute("SELECT NOW() as now")
+    cutoff = cursor.fetchone()["now"]
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    filename = f"{table}_{'full' if full else 'delta'}_{stamp}.{fmt.value}"
+    path = os.path.join(EXPORT_DIR, filename)
+    partial = path + ".partial"
+
+    writer = None
+    rows_written = 0
+    watermark = since
+    try:
+        for rows, watermark in _iter_batches(cursor, table, since, cutoff, batch_size):
+            if not rows:
+                continue
+            if writer is None:
+                writer = _open_writer(partial, schema, fmt)
+            writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+            rows_written += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        return ExportedTable(table=table, rows=0)
+
+    os.replace(partial, path)
+    cursor.execute(
+        """
+        INSERT INTO export_watermarks (table_name, last_updated_at, last_id, exported_at)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            last_updated_at = VALUES(last_updated_at),
+            last_id = VALUES(last_id),
+            exported_at = VALUES(exported_at)
+        """,
+        (table, watermark[0], watermark[1], datetime.utcnow()),
+    )
+    return ExportedTable(
+        table=table,
+        rows=rows_written,
+        file=filename,
+        watermark_updated_at=watermark[0],
+        watermark_id=watermark[1],
+    )
+
+
+def run_export(
+    db: dict,
+    tables: list[str] | None = None,
+    fmt: ExportFormat = ExportFormat.PARQUET,
+    full: bool = False,
+) -> ExportRunResult:
+    results = [
+        export_table(db, table, fmt, full) for table in (tables or list(EXPORT_SPECS))
+    ]
+    return ExportRunResult(format=fmt, full=full, tables=results)
+
+
+def get_export_path(filename: str) -> str | None:
+    path = os.path.join(EXPORT_DIR, os.path.basename(filename))
+    if not os.path.isfile(path) or path.endswith(".partial"):
+        return None
+    return path
+
+
+def run_export_job(fmt: ExportFormat = ExportFormat.PARQUET) -> ExportRunResult:
+    """Incremental export of every table, e.g. from a nightly cron"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        result = run_export({"conn": conn, "cursor": cursor}, fmt=fmt)
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    print(run_export_job())
@@ -0,0 +1,232 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import numpy as np
+
+from app.database import get_connection
+from app.schemas.forecast import ForecastRunResult, ReorderSuggestion
+from app.services import catalog_service
+from app.utils.sql import in_clause
+
+HISTORY_DAYS = 90
+# Daily decay for the demand moving average (higher reacts faster)
+EWMA_ALPHA = 0.1
+# z-score for a ~95% cycle service level
+SERVICE_LEVEL_Z = 1.65
+# Days of demand a single reorder should cover
+REVIEW_PERIOD_DAYS = 14
+DEFAULT_LEAD_TIME_DAYS = 7.0
+WRITE_CHUNK_SIZE = 1000
+
+
+def compute_reorder_points(
+    demand: np.ndarray, lead_time_days: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Forecast every product at once from a (products x days) demand matrix.
+
+    Returns the exponentially weighted daily demand, its weighted standard
+    deviation, and the resulting reorder level and reorder amount.
+    """
+    days = demand.shape[1]
+    weights = (1 - EWMA_ALPHA) ** np.arange(days - 1, -1, -1, dtype=np.float64)
+    weights /= weights.sum()
+
+    mean = demand @ weights
+    std = np.sqrt(((demand - mean[:, None]) ** 2) @ weights)
+
+    safety_stock = SERVICE_LEVEL_Z * std * np.sqrt(lead_time_days)
+    reorder_level = np.ceil(mean * lead_time_days + safety_stock).astype(np.int64)
+    reorder_amount = np.maximum(np.ceil(mean * REVIEW_PERIOD_DAYS), 1).astype(np.int64)
+    return mean, std, reorder_level, reorder_amount
+
+
+def run_forecast(db: dict, history_days: int = HISTORY_DAYS) -> ForecastRunResult:
+    cursor = db["cursor"]
+    generated_at = datetime.utcnow()
+    end = generated_at.date() + timedelta(days=1)
+    start = end - timedelta(days=history_days)
+
+    cursor.execute("SELECT id, supplier_id FROM products ORDER BY id")
+    products = cursor.fetchall()
+    if not products:
+        return ForecastRunResult(
+            products=0, order_lines=0, history_days=history_days, generated_at=generated_at
+        )
+
+    cursor.execute(
+        "SELECT supplier_id, mean_lead_hours FROM supplier_lead_time_stats WHERE mean_lead_hours IS NOT NULL"
+    )
+    lead_by_supplier = {
+        r["supplier_id"]: r["mean_lead_hours"] / 24 for r in cursor.fetchall()
+    }
+
+    count = len(products)
+    product_ids = np.fromiter((p["id"] for p in products), dtype=np.int64, count=count)
+    lead_time_days = np.fromiter(
+        (
+            max(lead_by_supplier.get(p["supplier_id"], DEFAULT_LEAD_TIME_DAYS), 1.0)
+            for p in products
+        ),
+        dtype=np.float64,
+        count=count,
+    )
+
+    # Pre-aggregate to one row per product and day so the transfer stays small
+    cursor.execute(
+        """
+        SELECT coi.product_id, DATE(co.created_at) as day,
+               SUM(coi.quantity) as quantity, COUNT(*) as line_count
+        FROM customer_orders co
+        JOIN customer_order_items coi ON coi.customer_order_id = co.id
+        WHERE co.created_at >= %s AND co.created_at < %s AND co.status <> 'cancelled'
+        GROUP BY coi.product_id, DATE(co.created_at)
+        """,
+        (start, end),
+    )
+    rows = cursor.fetchall()
+    n = len(rows)
+    hist_pid = np.fromiter((r["product_id"] for r in rows), dtype=np.int64, count=n)
+    hist_day = np.fromiter(((r["day"] - start).days for r in rows), dtype=np.int64, count=n)
+    hist_qty = np.fromiter((float(r["quantity"]) for r in rows), dtype=np.float64, count=n)
+    order_lines = int(sum(r["line_count"] for r in rows))
+
+    demand = np.zeros((count, history_days), dtype=np.float64)
+    if n:
+        idx = np.clip(np.searchsorted(product_ids, hist_pid), 0, count - 1)
+        valid = product_ids[idx] == hist_pid
+        np.add.at(demand, (idx[valid], hist_day[valid]), hist_qty[valid])
+
+    mean, std, reorder_level, reorder_amount = compute_reorder_points(
+        demand, lead_time_days
+    )
+
+    params = [
+        (
+            int(product_ids[i]),
+            int(reorder_level[i]),
+            int(reorder_amount[i]),
+            float(mean[i]),
+            float(std[i]),
+            float(lead_time_days[i]),
+            generated_at,
+        )
+        for i in range(count)
+    ]
+    for offset in range(0, count, WRITE_CHUNK_SIZE):
+        cursor.executemany(
+            """
+            INSERT INTO reorder_suggestions
+            (product_id, suggested_reorder_level, suggested_reorder_amount,
+             daily_demand, demand_std, lead_time_days, generated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                suggested_reorder_level = VALUES(suggested_reorder_level),
+                suggested_reorder_amount = VALUES(suggested_reorder_amount),
+                daily_demand = VALUES(daily_demand),
+                demand_std = VALUES(demand_std),
+                lead_time_days = VALUES(lead_time_days),
+                generated_at = VALUES(generated_at),
+                applied_at = NULL
+            """,
+            params[offset : offset + WRITE_CHUNK_SIZE],
+        )
+
+    return ForecastRunResult(
+        products=count,
+        order_lines=order_lines,
+        history_days=history_days,
+        generated_at=generated_at,
+    )
+
+
+def get_reorder_suggestions(
+    db: dict, pending_only: bool = False
+) -> List[ReorderSuggestion]:
+    cursor = db["cursor"]
+    where = "WHERE r.applied_at IS NULL" if pending_only else ""
+    cursor.execute(
+        f"""
+        SELECT r.*, p.name as product_name, p.category, p.stock,
+               p.reorder_level, p.reorder_amount
+        FROM reorder_suggestions r
+        JOIN products p ON r.product_id = p.id
+        {where}
+        ORDER BY p.name
+        """
+    )
+    return [
+        ReorderSuggestion.model_validate(
+            {
+                "product_id": r["product_id"],
+                "product_name": r["product_name"],
+                "category": r["category"],
+                "stock": r["stock"],
+                "current_reorder_level": r["reorder_level"],
+                "current_reorder_amount": r["reorder_amount"],
+                "suggested_reorder_level": r["suggested_reorder_level"],
+                "suggested_reorder_amount": r["suggested_reorder_amount"],
+                "daily_demand": r["daily_demand"],
+                "demand_std": r["demand_std"],
+                "lead_time_days": r["lead_time_days"],
+                "generated_at": r["generated_at"],
+                "applied_at": r.get("applied_at"),
+            }
+        )
+        for r in cursor.fetchall()
+    ]
+
+
+def apply_reorder_suggestions(
+    db: dict, product_ids: Optional[list[int]] = None
+) -> dict:
+    cursor = db["cursor"]
+    if product_ids is not None and not product_ids:
+        return {"message": "No suggestions applied", "applied": 0}
+
+    sql = """
+        UPDATE products p
+        JOIN reorder_suggestions r ON r.product_id = p.id
+        SET p.reorder_level = r.suggested_reorder_level,
+            p.reorder_amount = r.suggested_reorder_amount,
+            p.updated_at = %s,
+            p.version = p.version + 1,
+            r.applied_at = %s
+        WHERE r.applied_at IS NULL
+    """
+    now = datetime.utcnow()
+    params: list = [now, now]
+    if product_ids:
+        sql += f" AND r.product_id IN ({in_clause(product_ids)})"
+        params.extend(product_ids)
+    cursor.execute(sql, tuple(params))
+    # multi-table UPDATE counts rows changed in both tables
+    applied = cursor.rowcount // 2
+    if applied:
+        catalog_service.invalidate_catalog(
+            db,
+            where_sql="""p.id IN (
+                SELECT r.product_id FROM reorder_suggestions r WHERE r.applied_at = %s
+            )""",
+            params=(now,),
+        )
+    return {"message": f"Applied {applied} reorder suggestions", "applied": applied}
+
+
+def run_forecast_job(history_days: int = HISTORY_DAYS) -> ForecastRunResult:
+    """Run the forecast outside the API, e.g. from a nightly cron"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        result = run_forecast({"conn": conn, "cursor": cursor}, history_days)
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    print(run_forecast_job())
@@ -0,0 +1,196 @@
+from app.database import get_connection
+from app.schemas.analytics import InventoryValueReport, InventoryValueRow
+from app.services import supplier_service
+
+# (table, key column, product expression) for each valuation dimension
+VALUATION_DIMENSIONS = [
+    ("inventory_value_by_category", "category", "p.category"),
+    ("inventory_value_by_supplier", "supplier_id", "p.supplier_id"),
+]
+# Product columns that feed into the valuation totals
+VALUATION_FIELDS = ("stock", "purchase_price", "selling_price", "category", "supplier_id")
+
+
+def apply_stock_deltas(db: dict, deltas: list[tuple[int, int]]) -> None:
+    """Adjust the running totals for stock changes of (product_id, delta) pairs"""
+    deltas = [(pid, qty) for pid, qty in deltas if qty]
+    if not deltas:
+        return
+    cursor = db["cursor"]
+    delta_rows = " UNION ALL ".join(["SELECT %s as product_id, %s as delta"] * len(deltas))
+    params = tuple(v for pair in deltas for v in pair)
+    for table, key, expr in VALUATION_DIMENSIONS:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({key}, units, cost_value, retail_value)
+            SELECT {expr}, SUM(d.delta), SUM(d.delta * p.purchase_price),
+                   SUM(d.delta * p.selling_price)
+            FROM ({delta_rows}) d
+            JOIN products p ON p.id = d.product_id
+            GROUP BY {expr}
+            ON DUPLICATE KEY UPDATE
+                units = units + VALUES(units),
+                cost_value = cost_value + VALUES(cost_value),
+                retail_value = retail_value + VALUES(retail_value)
+            """,
+            params,
+        )
+
+
+def apply_product_contribution(db: dict, product: dict, sign: int) -> None:
+    """Add (sign=1) or remove (sign=-1) a product row's whole contribution"""
+    stock = product.get("stock") or 0
+    if not stock:
+        return
+    cursor = db["cursor"]
+    units = sign * stock
+    for table, key, _ in VALUATION_DIMENSIONS:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({key}, units, cost_value, retail_value)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                units = units + VALUES(units),
+                cost_value = cost_value + VALUES(cost_value),
+                retail_value = retail_value + VALUES(retail_value)
+            """,
+            (
+                product[key],
+                units,
+                units * float(product["purchase_price"]),
+                units * float(product["selling_price"]),
+            ),
+        )
+
+
+def apply_product_contributions(db: dict, changes: list[tuple[dict, int]]) -> None:
+    """Batch form of apply_product_contribution for (product, sign) pairs"""
+    cursor = db["cursor"]
+    for table, key, _ in VALUATION_DIMENSIONS:
+        totals: dict = {}
+        for product, sign in changes:
+            stock = product.get("stock") or 0
+            if not stock:
+                continue
+            units = sign * stock
+            row = totals.setdefault(product[key], [0, 0.0, 0.0])
+            row[0] += units
+            row[1] += units * float(product["purchase_price"])
+            row[2] += units * float(product["selling_price"])
+        if not totals:
+            continue
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({key}, units, cost_value, retail_value)
+            VALUES {', '.join(['(%s, %s, %s, %s)'] * len(totals))}
+            ON DUPLICATE KEY UPDATE
+                units = units + VALUES(units),
+                cost_value = cost_value + VALUES(cost_value),
+                retail_value = retail_value + VALUES(retail_value)
+            """,
+            tuple(v for k, row in totals.items() for v in (k, *row)),
+        )
+
+
+def apply_contributions_where(
+    db: dict, where_sql: str, params: tuple, sign: int
+) -> None:
+    """Add or remove the contribution of every product matching a WHERE clause
+    over ``products p``, without reading the rows back"""
+    cursor = db["cursor"]
+    for table, key, expr in VALUATION_DIMENSIONS:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({key}, units, cost_value, retail_value)
+            SELECT {expr}, %s * SUM(COALESCE(p.stock, 0)),
+                   %s * SUM(COALESCE(p.stock, 0) * p.purchase_price),
+                   %s * SUM(COALESCE(p.stock, 0) * p.selling_price)
+            FROM products p
+            WHERE {where_sql}
+            GROUP BY {expr}
+            ON DUPLICATE KEY UPDATE
+                units = units + VALUES(units),
+                cost_value = cost_value + VALUES(cost_value),
+                retail_value = retail_value + VALUES(retail_value)
+            """,
+            (sign, sign, sign) + tuple(params),
+        )
+
+
+def valuation_changed(before: dict, after: dict) -> bool:
+    return any(before.get(f) != after.get(f) for f in VALUATION_FIELDS)
+
+
+def rebuild_inventory_valuation(db: dict) -> dict:
+    """Recompute the totals from products to correct any drift"""
+    cursor = db["cursor"]
+    for table, key, expr in VALUATION_DIMENSIONS:
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({key}, units, cost_value, retail_value)
+            SELECT {expr}, SUM(COALESCE(p.stock, 0)),
+                   SUM(COALESCE(p.stock, 0) * p.purchase_price),
+                   SUM(COALESCE(p.stock, 0) * p.selling_price)
+            FROM products p
+            GROUP BY {expr}
+            """
+        )
+    return {"message": "Inventory valuation recomputed"}
+
+
+def get_inventory_value(db: dict) -> InventoryValueReport:
+    cursor = db["cursor"]
+    cursor.execute(
+        "SELECT * FROM inventory_value_by_category WHERE units <> 0 ORDER BY cost_value DESC"
+    )
+    by_category = [
+        InventoryValueRow(
+            key=r["category"],
+            label=r["category"],
+            units=int(r["units"]),
+            cost_value=float(r["cost_value"]),
+            retail_value=float(r["retail_value"]),
+        )
+        for r in cursor.fetchall()
+    ]
+    cursor.execute(
+        "SELECT * FROM inventory_value_by_supplier WHERE units <> 0 ORDER BY cost_value DESC"
+    )
+    by_supplier = [
+        InventoryValueRow(
+            key=str(r["supplier_id"]),
+            label=supplier_service.get_supplier_name(db, r["supplier_id"]) or "Unknown",
+            units=int(r["units"]),
+            cost_value=float(r["cost_value"]),
+            retail_value=float(r["retail_value"]),
+        )
+        for r in cursor.fetchall()
+    ]
+    return InventoryValueReport(
+        units=sum(r.units for r in by_category),
+        cost_value=sum(r.cost_value for r in by_category),
+        retail_value=sum(r.retail_value for r in by_category),
+        by_category=by_category,
+        by_supplier=by_supplier,
+    )
+
+
+def run_recompute_job() -> dict:
+    """Full recompute for a periodic (e.g. nightly cron) run"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        result = rebuild_inventory_valuation({"conn": conn, "cursor": cursor})
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    print(run_recompute_job())
@@ -1,12 +1,38 @@
+from datetime import datetime
 from typing import List, Optional
 
+import pymysql
+
+from app.database import get_connection
 from app.schemas.payment import (
     PaymentCreate,
     PaymentListResponse,
     PaymentResponse,
+    PaymentSearchPage,
+    PaymentSettlementItem,
+    PaymentSettlementResponse,
+    PaymentSettlementResult,
     PaymentSummary,
     PaymentWithOrderInfo,
 )
+from app.services import analytics_service
+from app.utils.fields import select_list
+from app.utils.sql import in_clause
+
+
+# ?fields= names for GET /payments/
+PAYMENT_LIST_COLUMNS = {field: field for field in PaymentListResponse.model_fields}
+
+
+def get_payments_sparse(db: dict, fields: list[str]) -> list[dict]:
+    cursor = db["cursor"]
+    cursor.execute(
+        f"""
+        SELECT {select_list(fields, PAYMENT_LIST_COLUMNS)} FROM payments
+        ORDER BY created_at DESC
+        """
+    )
+    return cursor.fetchall()
 
 
 def get_all_payments(db: dict) -> List[PaymentListResponse]:
@@ -127,42 +153,53 @@ def get_payment_with_order_info(
     )
 
 
-def get_payment_summary(db: dict, order_id: int) -> Optional[PaymentSummary]:
-    cursor = db["cursor"]
+def build_payment_summary(order_row: dict) -> PaymentSummary:
+    order_total = float(order_row["total_amount"])
+    total_paid = float(order_row["paid_total"] or 0)
+    remaining_balance = order_total - total_paid
 
-    cursor.execute(
-        "SELECT total_amount FROM customer_orders WHERE id = %s", (order_id,)
+    return PaymentSummary.model_validate(
+        {
+            "customer_order_id": order_row["id"],
+            "order_total": order_total,
+            "total_paid": total_paid,
+            "total_refunded": float(order_row["refunded_total"] or 0),
+            "remaining_balance": remaining_balance,
+            "payment_count": order_row["payment_count"] or 0,
+            "is_fully_paid": remaining_balance <= 0,
+        }
     )
-    order = cursor.fetchone()
-    if not order:
-        return None
 
-    order_total = float(order["total_amount"])
 
+def get_payment_summary(db: dict, order_id: int) -> Optional[PaymentSummary]:
+    cursor = db["cursor"]
     cursor.execute(
         """
-        SELECT COALESCE(SUM(amount), 0) as total_paid, COUNT(*) as payment_count
-        FROM payments
-        WHERE customer_order_id = %s AND payment_status = 'completed'
+        SELECT id, total_amount, paid_total, refunded_total, payment_count
+        FROM customer_orders WHERE id = %s
         """,
         (order_id,),
     )
-    payment_info = cursor.fetchone()
-    total_paid = float(payment_info["total_paid"]) if payment_info else 0
-    payment_count = payment_info["payment_count"] if payment_info else 0
+    order = cursor.fetchone()
+    if not order:
+        return None
+    return build_payment_summary(order)
 
-    remaining_balance = order_total - total_paid
 
-    return PaymentSummary.model_validate(
-        {
-            "customer_order_id": order_id,
-            "order_total": order_total,
-            "total_paid": total_paid,
-            "remaining_balance": remaining_balance,
-            "payment_count": payment_count,
-            "is_fully_paid": remaining_balance <= 0,
-        }
+def get_payment_summaries(db: dict, order_ids: list[int]) -> List[PaymentSummary]:
+    if not order_ids:
+        return []
+    cursor = db["cursor"]
+    cursor.execute(
+        f"""
+        SELECT id, total_amount, paid_total, refunded_total, payment_count
+        FROM customer_orders
+        WHERE id IN ({in_clause(order_ids)})
+        ORDER BY id
+        """,
+        tuple(order_ids),
     )
+    return [build_payment_summary(o) for o in cursor.fetchall()]
 
 
 def create_payment(db: dict, payment_data: PaymentCreate) -> Optional[PaymentResponse]:
@@ -178,20 +215,24 @@ def create_payment(db: dict, payment_data: PaymentCreate) -> Optional[PaymentRes
         return None
 
     # Simply create the payment without any validation
-    cursor.execute(
-        """
-        INSERT INTO payments
-        (customer_order_id, amount, payment_method, payment_status, transaction_reference, payment_date, created_at)
-        VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-        """,
-        (
-            payment_data.customer_order_id,
-            payment_data.amount,
-            payment_data.payment_method.value,
-            "pending",
-            payment_data.transaction_reference,
-        ),
-    )
+    try:
+        cursor.execute(
+            """
+            INSERT INTO payments
+            (customer_order_id, amount, payment_method, payment_status, transaction_reference, payment_date, created_at)
+            VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            """,
+            (
+                payment_data.customer_order_id,
+                payment_data.amount,
+                payment_data.payment_method.value,
+                "pending",
+                payment_data.transaction_reference,
+            ),
+        )
+    except pymysql.err.IntegrityError:
+        # transaction references are unique so statements can be reconciled
+        raise ValueError("Duplicate transaction reference")
     payment_id = cursor.lastrowid
 
     return get_payment_by_id(db, payment_id)
@@ -201,24 +242,27 @@ def complete_payment(db: dict, payment_id: int) -> Optional[dict]:
     cursor = db["cursor"]
 
     cursor.execute(
-        "SELECT id, payment_status, customer_order_id FROM payments WHERE id = %s",
+        """
+        UPDATE payments
+        SET payment_status = 'completed', payment_date = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s AND payment_status = 'pending'
+        """,
         (payment_id,),
     )
-    payment = cursor.fetchone()
-    if not payment:
-        return None
-
-    if payment["payment_status"] != "pending":
+    if cursor.rowcount == 0:
         return None
 
     cursor.execute(
         """
-        UPDATE payments
-        SET payment_status = 'completed', payment_date = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s
+        UPDATE customer_orders co
+        JOIN payments p ON p.customer_order_id = co.id
+        SET co.paid_total = co.paid_total + p.amount,
+            co.payment_count = co.payment_count + 1
+        WHERE p.id = %s
         """,
         (payment_id,),
     )
+    analytics_service.record_payments_completed(db, [payment_id])
 
     return {"message": "Payment completed successfully", "payment_id": payment_id}
 
@@ -258,7 +302,7 @@ def refund_payment(db: dict, payment_id: int) -> Optional[dict]:
     cursor = db["cursor"]
 
     cursor.execute(
-        "SELECT id, payment_status, customer_order_id, amount FROM payments WHERE id = %s",
+        "SELECT id, payment_status, customer_order_id, amount FROM payments WHERE id = %s FOR UPDATE",
         (payment_id,),
     )
     payment = cursor.fetchone()
@@ -276,6 +320,17 @@ def refund_payment(db: dict, payment_id: int) -> Optional[dict]:
         """,
         (payment_id,),
     )
+    cursor.execute(
+        """
+        UPDATE customer_orders
+        SET paid_total = paid_total - %s,
+            refunded_total = refunded_total + %s,
+            payment_count = payment_count - 1
+        WHERE id = %s
+        """,
+        (payment["amount"], payment["amount"], payment["customer_order_id"]),
+    )
+    analytics_service.record_payments_refunded(db, [payment_id])
 
     return {
         "message": "Payment refunded successfully",
@@ -338,3 +393,263 @@ def get_payments_by_method(db: dict, method: str) -> List[PaymentListResponse]:
         )
         for p in payments
     ]
+
+
+def encode_search_cursor(created_at: datetime, payment_id: int) -> str:
+    return f"{created_at.isoformat()}_{payment_id}"
+
+
+def decode_search_cursor(cursor_token: str) -> Optional[tuple[datetime, int]]:
+    try:
+        created_at, payment_id = cursor_token.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), int(payment_id)
+    except ValueError:
+        return None
+
+
+def search_payments(
+    db: dict,
+    status: Optional[str] = None,
+    method: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    order_id: Optional[int] = None,
+    customer_id: Optional[int] = None,
+    after: Optional[tuple[datetime, int]] = None,
+    limit: int = 50,
+) -> PaymentSearchPage:
+    cursor = db["cursor"]
+    clauses = []
+    params: list = []
+    if status:
+        clauses.append("p.payment_status = %s")
+        params.append(status)
+    if method:
+        clauses.append("p.payment_method = %s")
+        params.append(method)
+    if order_id is not None:
+        clauses.append("p.customer_order_id = %s")
+        params.append(order_id)
+    if customer_id is not None:
+        clauses.append(
+            "p.customer_order_id IN (SELECT id FROM customer_orders WHERE customer_id = %s)"
+        )
+        params.append(customer_id)
+    if date_from is not None:
+        clauses.append("p.created_at >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        clauses.append("p.created_at < %s")
+        params.append(date_to)
+    if min_amount is not None:
+        clauses.append("p.amount >= %s")
+        params.append(min_amount)
+    if max_amount is not None:
+        clauses.append("p.amount <= %s")
+        params.append(max_amount)
+    if after is not None:
+        # keyset: continue strictly after the last (created_at, id) returned
+        clauses.append("(p.created_at < %s OR (p.created_at = %s AND p.id < %s))")
+        params.extend([after[0], after[0], after[1]])
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    params.append(limit + 1)
+    cursor.execute(
+        f"""
+        SELECT p.id, p.customer_order_id, p.amount, p.payment_method,
+               p.payment_status, p.payment_date, p.created_at
+        FROM payments p
+        {where}
+        ORDER BY p.created_at DESC, p.id DESC
+        LIMIT %s
+        """,
+        tuple(params),
+    )
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = [
+        PaymentListResponse.model_validate(
+            {
+                "id": p["id"],
+                "customer_order_id": p["customer_order_id"],
+                "amount": float(p["amount"]),
+                "payment_method": p["payment_method"],
+                "payment_status": p["payment_status"],
+                "payment_date": p.get("payment_date"),
+                "created_at": p.get("created_at"),
+            }
+        )
+        for p in rows
+    ]
+    next_cursor = (
+        encode_search_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        if has_more
+        else None
+    )
+    return PaymentSearchPage(items=items, next_cursor=next_cursor)
+
+
+# Status a payment must currently have to move to each settlement outcome
+SETTLEMENT_TRANSITIONS = {
+    "completed": "pending",
+    "failed": "pending",
+    "refunded": "completed",
+}
+
+
+def settle_payments(
+    db: dict, items: list[PaymentSettlementItem]
+) -> PaymentSettlementResponse:
+    cursor = db["cursor"]
+    payment_ids = list({item.payment_id for item in items})
+    cursor.execute(
+        f"""
+        SELECT id, payment_status FROM payments
+        WHERE id IN ({in_clause(payment_ids)})
+        FOR UPDATE
+        """,
+        tuple(payment_ids),
+    )
+    current = {p["id"]: p["payment_status"] for p in cursor.fetchall()}
+
+    results: list[PaymentSettlementResult] = []
+    accepted: dict[str, list[int]] = {outcome: [] for outcome in SETTLEMENT_TRANSITIONS}
+    seen: set[int] = set()
+    for item in items:
+        outcome = item.outcome.value
+        previous = current.get(item.payment_id)
+        detail = None
+        if item.payment_id in seen:
+            detail = "Duplicate payment ID in batch"
+        elif previous is None:
+            detail = "Payment not found"
+        elif previous != SETTLEMENT_TRANSITIONS[outcome]:
+            detail = f"Payment must be in '{SETTLEMENT_TRANSITIONS[outcome]}' status"
+        seen.add(item.payment_id)
+
+        if detail is None:
+            accepted[outcome].append(item.payment_id)
+        results.append(
+            PaymentSettlementResult(
+                payment_id=item.payment_id,
+                outcome=outcome,
+                success=detail is None,
+                previous_status=previous,
+                detail=detail or item.reason,
+            )
+        )
+
+    if accepted["completed"]:
+        ids = accepted["completed"]
+        cursor.execute(
+            f"""
+            UPDATE payments
+            SET payment_status = 'completed', payment_date = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE id IN ({in_clause(ids)}) AND payment_status = 'pending'
+            """,
+            tuple(ids),
+        )
+        cursor.execute(
+            f"""
+            UPDATE customer_orders co
+            JOIN (
+                SELECT customer_order_id, SUM(amount) as amount, COUNT(*) as payments
+                FROM payments WHERE id IN ({in_clause(ids)})
+                GROUP BY customer_order_id
+            ) s ON s.customer_order_id = co.id
+            SET co.paid_total = co.paid_total + s.amount,
+                co.payment_count = co.payment_count + s.payments
+            """,
+            tuple(ids),
+        )
+        analytics_service.record_payments_completed(db, ids)
+
+    if accepted["failed"]:
+        ids = accepted["failed"]
+        cursor.execute(
+            f"""
+            UPDATE payments
+            SET payment_status = 'failed', updated_at = CURRENT_TIMESTAMP
+            WHERE id IN ({in_clause(ids)}) AND payment_status = 'pending'
+            """,
+            tuple(ids),
+        )
+
+    if accepted["refunded"]:
+        ids = accepted["refunded"]
+        cursor.execute(
+            f"""
+            UPDATE payments
+            SET payment_status = 'refunded', updated_at = CURRENT_TIMESTAMP
+            WHERE id IN ({in_clause(ids)}) AND payment_status = 'completed'
+            """,
+            tuple(ids),
+        )
+        cursor.execute(
+            f"""
+            UPDATE customer_orders co
+            JOIN (
+                SELECT customer_order_id, SUM(amount) as amount, COUNT(*) as payments
+                FROM payments WHERE id IN ({in_clause(ids)})
+                GROUP BY customer_order_id
+            ) s ON s.customer_order_id = co.id
+            SET co.paid_total = co.paid_total - s.amount,
+                co.refunded_total = co.refunded_total + s.amount,
+                co.payment_count = co.payment_count - s.payments
+            """,
+            tuple(ids),
+        )
+        analytics_service.record_payments_refunded(db, ids)
+
+    settled = sum(1 for r in results if r.success)
+    return PaymentSettlementResponse(
+        settled=settled, rejected=len(results) - settled, results=results
+    )
+
+
+def rebuild_payment_balances(db: dict) -> dict:
+    """Recompute every order's paid_total, refunded_total and payment_count
+    from its payments, for orders that predate them or have drifted"""
+    cursor = db["cursor"]
+    cursor.execute(
+        """
+        UPDATE customer_orders co
+        LEFT JOIN (
+            SELECT customer_order_id,
+                   SUM(CASE WHEN payment_status = 'completed' THEN amount ELSE 0 END) as paid,
+                   SUM(CASE WHEN payment_status = 'refunded' THEN amount ELSE 0 END) as refunded,
+                   SUM(payment_status = 'completed') as completed
+            FROM payments
+            GROUP BY customer_order_id
+        ) s ON s.customer_order_id = co.id
+        SET co.paid_total = COALESCE(s.paid, 0),
+            co.refunded_total = COALESCE(s.refunded, 0),
+            co.payment_count = COALESCE(s.completed, 0)
+        """
+    )
+    # only rows whose values changed are counted
+    return {"message": "Payment balances rebuilt", "orders_corrected": cursor.rowcount}
+
+
+def run_balance_rebuild_job() -> dict:
+    """Full rebuild, e.g. after payments were changed outside the API"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        result = rebuild_payment_balances({"conn": conn, "cursor": cursor})
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    print(run_balance_rebuild_job())
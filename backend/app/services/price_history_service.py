@@ -0,0 +1,155 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from app.database import get_connection
+from app.schemas.analytics import MarginReport, MarginRow
+from app.schemas.product import ProductPricePoint
+
+# Correlated lookup of the price row in effect at a point in time. It is a
+# single descending probe of the (product_id, valid_from) primary key.
+PRICE_IN_EFFECT_SQL = """
+    SELECT h.{column} FROM product_price_history h
+    WHERE h.product_id = {product_id} AND h.valid_from <= {at}
+    ORDER BY h.valid_from DESC LIMIT 1
+"""
+
+
+def record_prices_where(
+    db: dict, where_sql: str, params: tuple, valid_from: Optional[datetime] = None
+) -> None:
+    """Append a history row for every product matching a WHERE clause over
+    ``products p`` whose prices differ from its latest history row"""
+    db["cursor"].execute(
+        f"""
+        INSERT INTO product_price_history
+            (product_id, valid_from, selling_price, purchase_price)
+        SELECT p.id, %s, p.selling_price, p.purchase_price
+        FROM products p
+        LEFT JOIN product_price_history h
+            ON h.product_id = p.id
+            AND h.valid_from = (
+                SELECT MAX(h2.valid_from) FROM product_price_history h2
+                WHERE h2.product_id = p.id
+            )
+        WHERE ({where_sql})
+          AND (h.product_id IS NULL
+               OR h.selling_price <> p.selling_price
+               OR h.purchase_price <> p.purchase_price)
+        ON DUPLICATE KEY UPDATE
+            product_price_history.selling_price = VALUES(selling_price),
+            product_price_history.purchase_price = VALUES(purchase_price)
+        """,
+        (valid_from or datetime.utcnow(),) + tuple(params),
+    )
+
+
+def get_price_history(db: dict, product_id: int) -> Optional[list[ProductPricePoint]]:
+    cursor = db["cursor"]
+    cursor.execute("SELECT id FROM products WHERE id = %s", (product_id,))
+    if not cursor.fetchone():
+        return None
+    cursor.execute(
+        """
+        SELECT valid_from, selling_price, purchase_price
+        FROM product_price_history
+        WHERE product_id = %s
+        ORDER BY valid_from
+        """,
+        (product_id,),
+    )
+    rows = cursor.fetchall()
+    return [
+        ProductPricePoint(
+            valid_from=r["valid_from"],
+            # a price is in effect until the next change
+            valid_to=rows[i + 1]["valid_from"] if i + 1 < len(rows) else None,
+            selling_price=float(r["selling_price"]),
+            purchase_price=float(r["purchase_price"]),
+            margin=float(r["selling_price"] - r["purchase_price"]),
+        )
+        for i, r in enumerate(rows)
+    ]
+
+
+def get_margin_report(db: dict, date_from: date, date_to: date) -> MarginReport:
+    """Margin of completed orders, costing each line at the purchase price in
+    effect when the order was placed"""
+    cost_sql = PRICE_IN_EFFECT_SQL.format(
+        column="purchase_price", product_id="i.product_id", at="co.created_at"
+    )
+    cursor = db["cursor"]
+    cursor.execute(
+        f"""
+        SELECT i.product_id, p.name as product_name,
+               SUM(i.quantity) as quantity,
+               SUM(i.quantity * i.unit_price) as revenue,
+               SUM(i.quantity * COALESCE(({cost_sql}), p.purchase_price)) as cost
+        FROM customer_orders co
+        JOIN customer_order_items i ON i.customer_order_id = co.id
+        JOIN products p ON p.id = i.product_id
+        WHERE co.status = 'completed'
+          AND co.completed_at >= %s AND co.completed_at < %s
+        GROUP BY i.product_id, p.name
+        ORDER BY revenue DESC
+        """,
+        (date_from, date_to + timedelta(days=1)),
+    )
+    rows = [
+        MarginRow(
+            product_id=r["product_id"],
+            product_name=r["product_name"],
+            quantity=int(r["quantity"]),
+            revenue=float(r["revenue"]),
+            cost=float(r["cost"]),
+            margin=float(r["revenue"] - r["cost"]),
+        )
+        for r in cursor.fetchall()
+    ]
+    revenue = sum(r.revenue for r in rows)
+    cost = sum(r.cost for r in rows)
+    return MarginReport(
+        date_from=date_from,
+        date_to=date_to,
+        revenue=revenue,
+        cost=cost,
+        margin=revenue - cost,
+        rows=rows,
+    )
+
+
+def backfill_price_history(db: dict) -> dict:
+    """Seed a starting row for products that have no price history yet"""
+    cursor = db["cursor"]
+    cursor.execute(
+        """
+        INSERT IGNORE INTO product_price_history
+            (product_id, valid_from, selling_price, purchase_price)
+        SELECT p.id, COALESCE(p.created_at, UTC_TIMESTAMP()),
+               p.selling_price, p.purchase_price
+        FROM products p
+        WHERE NOT EXISTS (
+            SELECT 1 FROM product_price_history h WHERE h.product_id = p.id
+        )
+        """
+    )
+    return {"message": "Price history backfilled", "products": cursor.rowcount}
+
+
+def run_backfill_job() -> dict:
+    """For products inserted outside the API"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        result = backfill_price_history({"conn": conn, "cursor": cursor})
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    print(run_backfill_job())
@@ -0,0 +1,178 @@
+import os
+from typing import Optional
+
+import numpy as np
+
+from app.schemas.product import (
+    FacetCount,
+    PriceRangeFacet,
+    ProductBrowsePage,
+    ProductFacets,
+    ProductListResponse,
+)
+from app.services import catalog_service, supplier_service
+from app.utils.cache import VersionedValue, get_version
+from app.utils.sql import in_clause
+
+FACET_INDEX_CHECK_SECONDS = float(os.getenv("FACET_INDEX_CHECK_SECONDS", "2"))
+# Lower bounds of the selling price facet buckets, the last one is open-ended
+PRICE_BUCKETS = [0, 10, 50, 100, 500, 1000, 5000]
+
+_facet_index: VersionedValue[dict] = VersionedValue(FACET_INDEX_CHECK_SECONDS)
+
+
+def build_facet_index(db: dict) -> dict:
+    """One boolean bitmap per facet value over products in name order"""
+    cursor = db["cursor"]
+    cursor.execute(
+        """
+        SELECT id, category, supplier_id, selling_price, stock
+        FROM products ORDER BY name, id
+        """
+    )
+    rows = cursor.fetchall()
+    n = len(rows)
+    ids = np.fromiter((r["id"] for r in rows), dtype=np.int64, count=n)
+    prices = np.fromiter(
+        (float(r["selling_price"]) for r in rows), dtype=np.float64, count=n
+    )
+    stock = np.fromiter((r["stock"] or 0 for r in rows), dtype=np.int64, count=n)
+
+    categories: dict[str, np.ndarray] = {}
+    suppliers: dict[int, np.ndarray] = {}
+    for pos, r in enumerate(rows):
+        categories.setdefault(r["category"], np.zeros(n, dtype=bool))[pos] = True
+        suppliers.setdefault(r["supplier_id"], np.zeros(n, dtype=bool))[pos] = True
+
+    bounds = PRICE_BUCKETS + [np.inf]
+    price_buckets = [
+        (low, high, (prices >= low) & (prices < high))
+        for low, high in zip(bounds, bounds[1:])
+    ]
+    return {
+        "ids": ids,
+        "prices": prices,
+        "categories": categories,
+        "suppliers": suppliers,
+        "price_buckets": price_buckets,
+        "in_stock": stock > 0,
+    }
+
+
+def refresh_facet_index(db: dict) -> dict:
+    """Return the current index. A rebuild swaps in a new dict so a query never
+    mixes bitmaps from two builds."""
+    return _facet_index.get(
+        lambda: get_version(db["cursor"], catalog_service.CATALOG_CACHE_KEY),
+        lambda version, previous: build_facet_index(db),
+    )
+
+
+def _union(bitmaps: dict, keys: list, n: int) -> np.ndarray:
+    mask = np.zeros(n, dtype=bool)
+    for key in keys:
+        if key in bitmaps:
+            mask |= bitmaps[key]
+    return mask
+
+
+def browse_products(
+    db: dict,
+    categories: Optional[list[str]] = None,
+    supplier_ids: Optional[list[int]] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: Optional[bool] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> ProductBrowsePage:
+    index = refresh_facet_index(db)
+    n = len(index["ids"])
+    everything = np.ones(n, dtype=bool)
+
+    # One mask per dimension so each facet can be counted against the others
+    category_mask = (
+        _union(index["categories"], categories, n) if categories else everything
+    )
+    supplier_mask = (
+        _union(index["suppliers"], supplier_ids, n) if supplier_ids else everything
+    )
+    price_mask = everything
+    if min_price is not None:
+        price_mask = price_mask & (index["prices"] >= min_price)
+    if max_price is not None:
+        price_mask = price_mask & (index["prices"] <= max_price)
+    stock_mask = everything
+    if in_stock is not None:
+        stock_mask = index["in_stock"] if in_stock else ~index["in_stock"]
+
+    match = category_mask & supplier_mask & price_mask & stock_mask
+
+    without_category = supplier_mask & price_mask & stock_mask
+    without_supplier = category_mask & price_mask & stock_mask
+    without_price = category_mask & supplier_mask & stock_mask
+    without_stock = category_mask & supplier_mask & price_mask
+    in_stock_count = int(np.count_nonzero(without_stock & index["in_stock"]))
+
+    facets = ProductFacets(
+        categories=[
+            FacetCount(
+                value=name,
+                label=name,
+                count=int(np.count_nonzero(without_category & bitmap)),
+            )
+            for name, bitmap in sorted(index["categories"].items())
+        ],
+        suppliers=[
+            FacetCount(
+                value=str(supplier_id),
+                label=supplier_service.get_supplier_name(db, supplier_id) or "Unknown",
+                count=int(np.count_nonzero(without_supplier & bitmap)),
+            )
+            for supplier_id, bitmap in sorted(index["suppliers"].items())
+        ],
+        price_ranges=[
+            PriceRangeFacet(
+                min_price=low,
+                max_price=None if np.isinf(high) else high,
+                count=int(np.count_nonzero(without_price & bitmap)),
+            )
+            for low, high, bitmap in index["price_buckets"]
+        ],
+        in_stock=in_stock_count,
+        out_of_stock=int(np.count_nonzero(without_stock)) - in_stock_count,
+    )
+
+    matching_ids = index["ids"][match]
+    page_ids = [int(pid) for pid in matching_ids[offset : offset + limit]]
+    items = []
+    if page_ids:
+        cursor = db["cursor"]
+        cursor.execute(
+            f"SELECT * FROM products WHERE id IN ({in_clause(page_ids)})",
+            tuple(page_ids),
+        )
+        by_id = {r["id"]: r for r in cursor.fetchall()}
+        for pid in page_ids:
+            # skip products deleted since the index was built
+            p = by_id.get(pid)
+            if not p:
+                continue
+            items.append(
+                ProductListResponse.model_validate(
+                    {
+                        **p,
+                        "supplier_name": supplier_service.get_supplier_name(
+                            db, p["supplier_id"]
+                        )
+                        or "Unknown",
+                    }
+                )
+            )
+    return ProductBrowsePage(
+        items=items,
+        total=len(matching_ids),
+        limit=limit,
+        offset=offset,
+        facets=facets,
+    )
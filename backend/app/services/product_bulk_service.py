@@ -0,0 +1,261 @@
+from datetime import datetime
+
+import pymysql
+
+from app.schemas.product import (
+    ProductBulkFilter,
+    ProductBulkItem,
+    ProductBulkRule,
+    ProductBulkUpdateRequest,
+    ProductBulkUpdateResult,
+)
+from app.services import (
+    catalog_service,
+    inventory_valuation_service,
+    price_history_service,
+    product_image_service,
+    stock_journal_service,
+    supplier_service,
+)
+from app.utils.sql import in_clause
+
+# SQL condition on the new value that would break the ProductBase rules
+INVALID_VALUE_CONDITIONS = {
+    "selling_price": "<= 0",
+    "purchase_price": "<= 0",
+    "stock": "< 0",
+    "reorder_level": "< 0",
+    "reorder_amount": "<= 0",
+}
+PRICE_FIELDS = ("selling_price", "purchase_price")
+
+
+def _rule_where(where: ProductBulkFilter) -> tuple[str, tuple]:
+    clauses = []
+    params: list = []
+    if where.category is not None:
+        clauses.append("p.category = %s")
+        params.append(where.category)
+    if where.supplier_id is not None:
+        clauses.append("p.supplier_id = %s")
+        params.append(where.supplier_id)
+    if where.ids is not None:
+        if not where.ids:
+            clauses.append("1 = 0")
+        else:
+            clauses.append(f"p.id IN ({in_clause(where.ids)})")
+            params.extend(where.ids)
+    if not clauses:
+        # an unfiltered rule would silently rewrite the whole catalog
+        raise ValueError("A rule needs at least one filter in where")
+    return " AND ".join(clauses), tuple(params)
+
+
+def _rule_expression(rule: ProductBulkRule) -> tuple[str, tuple]:
+    column = f"COALESCE(p.{rule.field}, 0)"
+    if rule.operation == "set":
+        expr = "%s"
+    elif rule.operation == "add":
+        expr = f"{column} + %s"
+    elif rule.operation == "multiply":
+        expr = f"{column} * %s"
+    else:
+        expr = f"{column} * (1 + %s / 100)"
+    digits = 2 if rule.field in PRICE_FIELDS else 0
+    return f"ROUND({expr}, {digits})", (rule.value,)
+
+
+def _apply_item_group(
+    db: dict, fields: tuple[str, ...], items: list[ProductBulkItem], now: datetime
+) -> int:
+    """One UPDATE ... JOIN for every item that sets the same columns"""
+    cursor = db["cursor"]
+    ids = [item.id for item in items]
+    id_where = f"p.id IN ({in_clause(ids)})"
+    columns = ", ".join(f"%s as {field}" for field in fields)
+    values_sql = " UNION ALL ".join([f"SELECT %s as id, {columns}"] * len(items))
+    values_params = tuple(
+        v
+        for item in items
+        for v in (item.id, *(getattr(item.fields, field) for field in fields))
+    )
+
+    touches_valuation = any(
+        f in inventory_valuation_service.VALUATION_FIELDS for f in fields
+    )
+    if touches_valuation:
+        inventory_valuation_service.apply_contributions_where(
+            db, id_where, tuple(ids), -1
+        )
+    if "stock" in fields:
+        stock_journal_service.record_movements_from_query(
+            db,
+            f"""
+            SELECT p.id as product_id, v.stock - COALESCE(p.stock, 0) as delta
+            FROM products p JOIN ({values_sql}) v ON v.id = p.id
+            """,
+            values_params,
+            "adjustment",
+        )
+    # the categories the items are leaving, then (below) the ones they join
+    catalog_service.touch_categories(db, where_sql=id_where, params=tuple(ids))
+    assignments = ", ".join(f"p.{field} = v.{field}" for field in fields)
+    if "image_url" in fields:
+        # must precede the image_url assignment, which MySQL applies in order
+        assignments = ", ".join(
+            [
+                f"p.{column} = IF(p.image_url <=> v.image_url, p.{column}, NULL)"
+                for column in product_image_service.IMAGE_METADATA_COLUMNS
+            ]
+            + [assignments]
+        )
+    try:
+        cursor.execute(
+            f"""
+            UPDATE products p JOIN ({values_sql}) v ON v.id = p.id
+            SET {assignments}, p.updated_at = %s, p.version = p.version + 1
+            """,
+            values_params + (now,),
+        )
+    except pymysql.err.IntegrityError:
+        raise ValueError("Update would give a supplier two products with the same name")
+    updated = cursor.rowcount
+    if touches_valuation:
+        inventory_valuation_service.apply_contributions_where(
+            db, id_where, tuple(ids), 1
+        )
+    if "category" in fields:
+        catalog_service.touch_categories(db, where_sql=id_where, params=tuple(ids))
+    if any(f in PRICE_FIELDS for f in fields):
+        price_history_service.record_prices_where(db, id_where, tuple(ids), now)
+    return updated
+
+
+def _apply_rule(
+    db: dict, index: int, rule: ProductBulkRule, now: datetime
+) -> tuple[int, int]:
+    """Returns (matched, updated) for one rule-based update"""
+    cursor = db["cursor"]
+    where_sql, where_params = _rule_where(rule.where)
+    expr, expr_params = _rule_expression(rule)
+
+    # lock the matched rows so the check still holds when the UPDATE runs
+    cursor.execute(
+        f"""
+        SELECT COUNT(*) as matched,
+               COALESCE(SUM({expr} {INVALID_VALUE_CONDITIONS[rule.field]}), 0) as invalid
+        FROM products p
+        WHERE {where_sql}
+        FOR UPDATE
+        """,
+        expr_params + where_params,
+    )
+    check = cursor.fetchone()
+    if check["invalid"]:
+        raise ValueError(
+            f"Rule {index} would leave {int(check['invalid'])} products with an invalid {rule.field}"
+        )
+    if not check["matched"]:
+        return 0, 0
+
+    touches_valuation = rule.field in inventory_valuation_service.VALUATION_FIELDS
+    if touches_valuation:
+        inventory_valuation_service.apply_contributions_where(
+            db, where_sql, where_params, -1
+        )
+    if rule.field == "stock":
+        stock_journal_service.record_movements_from_query(
+            db,
+            f"""
+            SELECT p.id as product_id, {expr} - COALESCE(p.stock, 0) as delta
+            FROM products p WHERE {where_sql}
+            """,
+            expr_params + where_params,
+            "adjustment",
+        )
+    cursor.execute(
+        f"""
+        UPDATE products p
+        SET p.{rule.field} = {expr}, p.updated_at = %s, p.version = p.version + 1
+        WHERE {where_sql}
+        """,
+        expr_params + (now,) + where_params,
+    )
+    updated = cursor.rowcount
+    if touches_valuation:
+        inventory_valuation_service.apply_contributions_where(
+            db, where_sql, where_params, 1
+        )
+    if rule.field in PRICE_FIELDS:
+        price_history_service.record_prices_where(db, where_sql, where_params, now)
+    if updated:
+        catalog_service.touch_categories(
+            db, where_sql=where_sql, params=where_params
+        )
+    return check["matched"], updated
+
+
+def bulk_update_products(
+    db: dict, request: ProductBulkUpdateRequest
+) -> ProductBulkUpdateResult:
+    """Apply explicit item updates, then rules, as set-based SQL in the request
+    transaction. Raises ValueError (and nothing is committed) if any part is invalid."""
+    cursor = db["cursor"]
+    now = datetime.utcnow()
+
+    ids = [item.id for item in request.items]
+    if len(ids) != len(set(ids)):
+        raise ValueError("Each product may appear only once in items")
+    for item in request.items:
+        supplier_id = item.fields.supplier_id
+        if supplier_id is not None and not supplier_service.get_supplier_by_id(
+            db, supplier_id
+        ):
+            raise ValueError(f"Supplier {supplier_id} not found for product {item.id}")
+    # check every rule's filter before anything is written
+    for index, rule in enumerate(request.rules):
+        try:
+            _rule_where(rule.where)
+        except ValueError as e:
+            raise ValueError(f"Rule {index}: {e}")
+
+    existing: set[int] = set()
+    if ids:
+        cursor.execute(
+            f"SELECT id FROM products WHERE id IN ({in_clause(ids)}) FOR UPDATE",
+            tuple(ids),
+        )
+        existing = {r["id"] for r in cursor.fetchall()}
+
+    groups: dict[tuple[str, ...], list[ProductBulkItem]] = {}
+    for item in request.items:
+        fields = tuple(
+            sorted(item.fields.model_dump(exclude_unset=True, exclude_none=True))
+        )
+        if item.id in existing and fields:
+            groups.setdefault(fields, []).append(item)
+
+    items_updated = 0
+    for fields, items in groups.items():
+        items_updated += _apply_item_group(db, fields, items, now)
+
+    rules_matched: list[int] = []
+    rules_updated: list[int] = []
+    for index, rule in enumerate(request.rules):
+        matched, updated = _apply_rule(db, index, rule, now)
+        rules_matched.append(matched)
+        rules_updated.append(updated)
+
+    if items_updated or any(rules_updated):
+        catalog_service.invalidate_catalog(
+            db,
+            names_changed=any(
+                catalog_service.NAME_FIELDS.intersection(fields) for fields in groups
+            ),
+        )
+    return ProductBulkUpdateResult(
+        items_updated=items_updated,
+        items_not_found=[pid for pid in ids if pid not in existing],
+        rules_matched=rules_matched,
+        rules_updated=rules_updated,
+    )
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import BinaryIO, Optional
+
+from PIL import Image, ImageOps
+
+from app.services import catalog_service
+
+# Local directory served at IMAGE_BASE_URL; swap for object storage in production
+IMAGE_STORAGE_DIR = os.getenv("IMAGE_STORAGE_DIR", "media")
+IMAGE_BASE_URL = "/media"
+# Stored URLs are absolute, the frontend is served from a different origin
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://localhost:8000").rstrip("/")
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+# Checked against the header before decoding, so oversized images never load
+MAX_IMAGE_PIXELS = 40_000_000
+THUMBNAIL_SIZE = (320, 320)
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Pillow format -> stored file extension
+ALLOWED_FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+
+# Derived from image_url, reset whenever image_url changes some other way
+IMAGE_METADATA_COLUMNS = ("thumbnail_url", "image_width", "image_height", "image_color")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+        return _pool
+
+
+def shutdown_image_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def _dominant_color(image: Image.Image) -> str:
+    sample = image.convert("RGB")
+    sample.thumbnail((64, 64))
+    palette = sample.quantize(colors=8)
+    _, index = max(palette.getcolors())
+    r, g, b = palette.getpalette()[index * 3 : index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def _decode(source_path: str) -> tuple[Image.Image, str]:
+    """Open and fully decode an upload, returning the image and its extension"""
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    try:
+        with Image.open(source_path) as image:
+            if image.format not in ALLOWED_FORMATS:
+                raise ValueError(
+                    f"Unsupported image format. Allowed: {', '.join(ALLOWED_FORMATS)}"
+                )
+            # Pillow only raises DecompressionBombError at twice MAX_IMAGE_PIXELS
+            if image.width * image.height > MAX_IMAGE_PIXELS:
+                raise ValueError(
+                    f"Image is larger than {MAX_IMAGE_PIXELS // 1_000_000} megapixels"
+                )
+            extension = ALLOWED_FORMATS[image.format]
+            # phone photos are often stored sideways with an EXIF rotation
+            return ImageOps.exif_transpose(image), extension
+    except (OSError, Image.DecompressionBombError):
+        # not an image at all, or a truncated or corrupt one failing to decode
+        raise ValueError("File is not a supported image")
+
+
+def process_image(source_path: str, dest_dir: str, stem: str) -> dict:
+    """Decode, measure and thumbnail one upload. Runs in a worker process,
+    so it only takes and returns plain values."""
+    image, extension = _decode(source_path)
+    width, height = image.size
+    color = _dominant_color(image)
+
+    thumbnail = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+    thumbnail.thumbnail(THUMBNAIL_SIZE)
+
+    os.makedirs(dest_dir, exist_ok=True)
+    original_name = f"{stem}.{extension}"
+    thumbnail_name = f"{stem}_thumb.webp"
+    shutil.copyfile(source_path, os.path.join(dest_dir, original_name))
+    thumbnail.save(os.path.join(dest_dir, thumbnail_name), "WEBP", quality=80)
+
+    return {
+        "original": original_name,
+        "thumbnail": thumbnail_name,
+        "width": width,
+        "height": height,
+        "color": color,
+    }
+
+
+def _spool_upload(fileobj: BinaryIO) -> tuple[str, str]:
+    """Copy the upload to a temp file, returning its path and content hash"""
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(prefix="upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := fileobj.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_IMAGE_BYTES:
+                    raise ValueError(
+                        f"Image is larger than {MAX_IMAGE_BYTES // (1024 * 1024)} MB"
+                    )
+                digest.update(chunk)
+                out.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    if size == 0:
+        os.remove(path)
+        raise ValueError("Uploaded file is empty")
+    return path, digest.hexdigest()
+
+
+def save_product_image(db: dict, product_id: int, fileobj: BinaryIO) -> Optional[dict]:
+    cursor = db["cursor"]
+    cursor.execute("SELECT id, category FROM products WHERE id = %s", (product_id,))
+    product = cursor.fetchone()
+    if not product:
+        return None
+
+    path, digest = _spool_upload(fileobj)
+    try:
+        # same bytes -> same file names, so re-uploads don't pile up copies
+        dest_dir = os.path.join(IMAGE_STORAGE_DIR, "products", str(product_id))
+        # invalid images come back as ValueError from the worker
+        result = _get_pool().submit(process_image, path, dest_dir, digest[:16]).result()
+    finally:
+        os.remove(path)
+
+    base_url = f"{PUBLIC_BASE_URL}{IMAGE_BASE_URL}/products/{product_id}"
+    cursor.execute(
+        """
+        UPDATE products
+        SET image_url = %s, thumbnail_url = %s, image_width = %s,
+            image_height = %s, image_color = %s,
+            updated_at = %s, version = version + 1
+        WHERE id = %s
+        """,
+        (
+            f"{base_url}/{result['original']}",
+            f"{base_url}/{result['thumbnail']}",
+            result["width"],
+            result["height"],
+            result["color"],
+            datetime.utcnow(),
+            product_id,
+        ),
+    )
+    catalog_service.invalidate_catalog(db, categories=[product["category"]])
+    cursor.execute("SELECT * FROM products WHERE id = %s", (product_id,))
+    return cursor.fetchone()
@@ -0,0 +1,232 @@
+import csv
+import json
+from datetime import datetime
+from typing import IO, Iterator
+
+import pymysql
+from pydantic import ValidationError
+
+from app.database import commit_db, get_connection, new_db
+from app.schemas.product import ProductCreate, ProductImportError, ProductImportReport
+from app.services import (
+    catalog_service,
+    inventory_valuation_service,
+    price_history_service,
+    product_image_service,
+    stock_journal_service,
+    supplier_service,
+)
+from app.utils.sql import in_clause
+
+IMPORT_CHUNK_SIZE = 500
+# The report keeps counting past this, it just stops listing rows
+MAX_REPORTED_ERRORS = 1000
+IMPORT_COLUMNS = [
+    "name",
+    "description",
+    "selling_price",
+    "purchase_price",
+    "supplier_id",
+    "stock",
+    "reorder_level",
+    "reorder_amount",
+    "category",
+    "image_url",
+]
+
+
+def _iter_records(
+    stream: IO[str], file_format: str
+) -> Iterator[tuple[int, dict | None, str | None]]:
+    """Yield (line number, record, parse error) without reading the whole file"""
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            # drop empty cells so ProductCreate defaults apply
+            record = {k: v for k, v in record.items() if k and v != ""}
+            yield reader.line_num, record, None
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Each line must be a JSON object"
+            continue
+        yield line_number, record, None
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+        for err in e.errors()
+    )
+
+
+def _resolve_row(db: dict, record: dict) -> ProductCreate:
+    code = record.pop("supplier_code", None)
+    if code and not record.get("supplier_id"):
+        supplier = supplier_service.get_supplier_by_code(db, str(code))
+        if not supplier:
+            raise ValueError(f"Unknown supplier code '{code}'")
+        record["supplier_id"] = supplier["id"]
+    product = ProductCreate.model_validate(record)
+    if not supplier_service.get_supplier_by_id(db, product.supplier_id):
+        raise ValueError("Supplier not found")
+    return product
+
+
+def _key(supplier_id: int, name: str) -> tuple[int, str]:
+    # products.name compares case-insensitively under the table collation
+    return supplier_id, name.lower()
+
+
+def _select_by_keys(cursor, keys: list[tuple[int, str]]) -> dict:
+    cursor.execute(
+        f"""
+        SELECT * FROM products
+        WHERE (supplier_id, name) IN ({', '.join(['(%s, %s)'] * len(keys))})
+        """,
+        tuple(v for key in keys for v in key),
+    )
+    return {_key(r["supplier_id"], r["name"]): r for r in cursor.fetchall()}
+
+
+def _upsert_chunk(db: dict, products: list[ProductCreate]) -> tuple[int, int]:
+    """Upsert one chunk keyed on (supplier_id, name); returns (created, updated)"""
+    # a later row for the same product wins, as it would row by row
+    by_key = {_key(p.supplier_id, p.name): p for p in products}
+    keys = list(by_key)
+    cursor = db["cursor"]
+    before = _select_by_keys(cursor, keys)
+
+    now = datetime.utcnow()
+    params = []
+    for product in by_key.values():
+        params.extend(getattr(product, column) for column in IMPORT_COLUMNS)
+        params.extend([now, now])
+    placeholders = ", ".join(["%s"] * (len(IMPORT_COLUMNS) + 2))
+    # image metadata is reset before image_url is overwritten, as MySQL
+    # applies the assignments in order
+    updates = ", ".join(
+        [
+            f"{column} = IF(image_url <=> VALUES(image_url), {column}, NULL)"
+            for column in product_image_service.IMAGE_METADATA_COLUMNS
+        ]
+        + [
+            f"{column} = VALUES({column})"
+            for column in IMPORT_COLUMNS
+            if column not in ("supplier_id", "name")
+        ]
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO products ({', '.join(IMPORT_COLUMNS)}, created_at, updated_at)
+        VALUES {', '.join([f'({placeholders})'] * len(by_key))}
+        ON DUPLICATE KEY UPDATE {updates}, updated_at = VALUES(updated_at),
+            version = version + 1
+        """,
+        tuple(params),
+    )
+    after = _select_by_keys(cursor, keys)
+    after_ids = [row["id"] for row in after.values()]
+    price_history_service.record_prices_where(
+        db, f"p.id IN ({in_clause(after_ids)})", tuple(after_ids), now
+    )
+
+    inventory_valuation_service.apply_product_contributions(
+        db,
+        [(row, -1) for row in before.values()] + [(row, 1) for row in after.values()],
+    )
+    created = [row for key, row in after.items() if key not in before]
+    stock_journal_service.record_movements(
+        db, [(row["id"], row["stock"] or 0) for row in created], "product_created"
+    )
+    stock_journal_service.record_movements(
+        db,
+        [
+            (row["id"], (row["stock"] or 0) - (before[key]["stock"] or 0))
+            for key, row in after.items()
+            if key in before
+        ],
+        "adjustment",
+    )
+    catalog_service.invalidate_catalog(
+        db,
+        categories=[row["category"] for row in [*before.values(), *after.values()]],
+        names_changed=bool(created)
+        or any(
+            row["category"] != before[key]["category"]
+            for key, row in after.items()
+            if key in before
+        ),
+    )
+    return len(created), len(after) - len(created)
+
+
+def import_products(stream: IO[str], file_format: str) -> ProductImportReport:
+    """Validate and upsert products from a CSV or NDJSON stream.
+
+    Rows are upserted ``IMPORT_CHUNK_SIZE`` at a time on the import's own
+    connection and each chunk is committed, so memory and lock time stay flat
+    however large the file is. An import is therefore not all-or-nothing: if
+    it stops early, ``aborted`` says why and every valid row up to
+    ``committed_through_line`` is saved.
+    """
+    report = ProductImportReport(processed=0, created=0, updated=0, failed=0, errors=[])
+    conn = get_connection()
+    db = new_db(conn)
+    cursor = db["cursor"]
+
+    def fail(line_number: int, error: str) -> None:
+        report.failed += 1
+        if len(report.errors) < MAX_REPORTED_ERRORS:
+            report.errors.append(ProductImportError(line=line_number, error=error))
+        else:
+            report.errors_truncated = True
+
+    def flush(chunk: list[ProductCreate], through_line: int) -> None:
+        created, updated = _upsert_chunk(db, chunk)
+        commit_db(db)
+        report.created += created
+        report.updated += updated
+        report.committed_through_line = through_line
+
+    chunk: list[ProductCreate] = []
+    line_number = 0
+    try:
+        for line_number, record, parse_error in _iter_records(stream, file_format):
+            report.processed += 1
+            if parse_error:
+                fail(line_number, parse_error)
+                continue
+            try:
+                chunk.append(_resolve_row(db, record))
+            except ValidationError as e:
+                fail(line_number, _format_validation_error(e))
+                continue
+            except ValueError as e:
+                fail(line_number, str(e))
+                continue
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                flush(chunk, line_number)
+                chunk = []
+        if chunk:
+            flush(chunk, line_number)
+        else:
+            report.committed_through_line = line_number
+    except UnicodeDecodeError:
+        conn.rollback()
+        report.aborted = "File must be UTF-8 encoded"
+    except pymysql.MySQLError as e:
+        conn.rollback()
+        report.aborted = f"Database error: {e}"
+    finally:
+        cursor.close()
+        conn.close()
+    return report
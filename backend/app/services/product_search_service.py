@@ -0,0 +1,164 @@
+import os
+import re
+from typing import Optional
+
+import numpy as np
+
+from app.schemas.product import ProductSearchHit, ProductSearchPage
+from app.services import catalog_service, supplier_service
+from app.utils.cache import VersionedValue, get_version
+from app.utils.sql import in_clause
+
+SEARCH_INDEX_CHECK_SECONDS = float(os.getenv("SEARCH_INDEX_CHECK_SECONDS", "2"))
+# Share of the query's trigrams a name must contain to count as a fuzzy match
+TRIGRAM_MIN_SIMILARITY = 0.5
+# Ranked candidates kept from each source before merging and paginating
+MAX_CANDIDATES = 500
+
+_TOKEN_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+_search_index: VersionedValue[dict] = VersionedValue(SEARCH_INDEX_CHECK_SECONDS)
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN_RE.split(text.lower()) if t]
+
+
+def trigrams(text: str, prefix: bool = False) -> set[str]:
+    """Padded word trigrams; with prefix=True the last word gets no end pad so
+    "choc" matches "chocolate"."""
+    words = tokenize(text)
+    grams = set()
+    for i, word in enumerate(words):
+        padded = f"  {word}" if prefix and i == len(words) - 1 else f"  {word} "
+        grams.update(padded[j : j + 3] for j in range(len(padded) - 2))
+    return grams
+
+
+def build_search_index(db: dict) -> dict:
+    cursor = db["cursor"]
+    cursor.execute("SELECT id, name, category FROM products ORDER BY id")
+    rows = cursor.fetchall()
+
+    category_codes: dict[str, int] = {}
+    categories = np.empty(len(rows), dtype=np.int32)
+    postings: dict[str, list[int]] = {}
+    for pos, row in enumerate(rows):
+        categories[pos] = category_codes.setdefault(row["category"], len(category_codes))
+        for gram in trigrams(row["name"]):
+            postings.setdefault(gram, []).append(pos)
+
+    return {
+        "ids": np.fromiter((r["id"] for r in rows), dtype=np.int64, count=len(rows)),
+        "category_codes": category_codes,
+        "categories": categories,
+        "postings": {g: np.array(p, dtype=np.int32) for g, p in postings.items()},
+    }
+
+
+def refresh_search_index(db: dict) -> dict:
+    """Return the current index. Callers keep the returned dict for the whole
+    query, a rebuild swaps in a new one rather than mutating it."""
+    return _search_index.get(
+        # stock and price writes don't touch names, so they don't rebuild
+        lambda: get_version(db["cursor"], catalog_service.PRODUCT_NAMES_CACHE_KEY),
+        lambda version, previous: build_search_index(db),
+    )
+
+
+def fuzzy_candidates(
+    db: dict, q: str, category: Optional[str]
+) -> dict[int, float]:
+    """Trigram similarity (0..1) of product names to the query, by product id"""
+    index = refresh_search_index(db)
+    query_grams = trigrams(q, prefix=True)
+    lists = [index["postings"][g] for g in query_grams if g in index["postings"]]
+    if not query_grams or not lists:
+        return {}
+
+    counts = np.bincount(np.concatenate(lists), minlength=len(index["ids"]))
+    similarity = counts / len(query_grams)
+    if category is not None:
+        code = index["category_codes"].get(category)
+        if code is None:
+            return {}
+        similarity[index["categories"] != code] = 0
+    positions = np.nonzero(similarity >= TRIGRAM_MIN_SIMILARITY)[0]
+    if len(positions) > MAX_CANDIDATES:
+        top = np.argpartition(-similarity[positions], MAX_CANDIDATES)[:MAX_CANDIDATES]
+        positions = positions[top]
+    return {
+        int(pid): float(sim)
+        for pid, sim in zip(index["ids"][positions], similarity[positions])
+    }
+
+
+def fulltext_candidates(
+    db: dict, q: str, category: Optional[str]
+) -> dict[int, float]:
+    """FULLTEXT relevance over name and description, normalised to 0..1"""
+    terms = tokenize(q)
+    if not terms:
+        return {}
+    # Boolean mode with prefix wildcards; tokenize() already drops operators
+    against = " ".join(f"{t}*" for t in terms)
+    sql = """
+        SELECT id, MATCH(name, description) AGAINST (%s IN BOOLEAN MODE) as relevance
+        FROM products
+        WHERE MATCH(name, description) AGAINST (%s IN BOOLEAN MODE)
+    """
+    params: list = [against, against]
+    if category is not None:
+        sql += " AND category = %s"
+        params.append(category)
+    sql += " ORDER BY relevance DESC LIMIT %s"
+    params.append(MAX_CANDIDATES)
+
+    cursor = db["cursor"]
+    cursor.execute(sql, tuple(params))
+    rows = cursor.fetchall()
+    if not rows:
+        return {}
+    best = float(rows[0]["relevance"]) or 1.0
+    return {r["id"]: float(r["relevance"]) / best for r in rows}
+
+
+def search_products(
+    db: dict,
+    q: str,
+    category: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> ProductSearchPage:
+    scores = fulltext_candidates(db, q, category)
+    for pid, sim in fuzzy_candidates(db, q, category).items():
+        scores[pid] = scores.get(pid, 0.0) + sim
+    ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+    page = ranked[offset : offset + limit]
+
+    items = []
+    if page:
+        cursor = db["cursor"]
+        cursor.execute(
+            f"SELECT * FROM products WHERE id IN ({in_clause(page)})",
+            tuple(pid for pid, _ in page),
+        )
+        by_id = {r["id"]: r for r in cursor.fetchall()}
+        for pid, score in page:
+            # skip products deleted since the index was built
+            p = by_id.get(pid)
+            if not p:
+                continue
+            items.append(
+                ProductSearchHit.model_validate(
+                    {
+                        **p,
+                        "supplier_name": supplier_service.get_supplier_name(
+                            db, p["supplier_id"]
+                        )
+                        or "Unknown",
+                        "score": round(score, 4),
+                    }
+                )
+            )
+    return ProductSearchPage(items=items, total=len(ranked), limit=limit, offset=offset)
@@ -0,0 +1,143 @@
+import csv
+import io
+import os
+from decimal import Decimal, InvalidOperation
+from typing import Iterator
+
+from app.database import get_connection
+from app.utils.sql import in_clause
+
+RECONCILE_CHUNK_SIZE = 1000
+REPORT_COLUMNS = [
+    "line_number",
+    "transaction_reference",
+    "result",
+    "statement_amount",
+    "payment_id",
+    "payment_amount",
+    "payment_status",
+    "detail",
+]
+
+
+def _csv_line(row: list) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue()
+
+
+def _parse_amount(value: str | None) -> Decimal | None:
+    try:
+        return Decimal((value or "").strip())
+    except InvalidOperation:
+        return None
+
+
+def _classify(line_number: int, entry: dict, payment: dict | None) -> list:
+    reference = entry["reference"]
+    amount = entry["amount"]
+    if payment is None:
+        return [
+            line_number,
+            reference,
+            "missing",
+            amount,
+            "",
+            "",
+            "",
+            "No payment with this reference",
+        ]
+
+    payment_amount = Decimal(payment["amount"])
+    problems = []
+    if amount != payment_amount:
+        problems.append(f"amount differs by {amount - payment_amount}")
+    if payment["payment_status"] != "completed":
+        problems.append(f"payment is {payment['payment_status']}")
+    return [
+        line_number,
+        reference,
+        "mismatched" if problems else "matched",
+        amount,
+        payment["id"],
+        payment_amount,
+        payment["payment_status"],
+        "; ".join(problems),
+    ]
+
+
+def _reconcile_chunk(cursor, chunk: list[tuple[int, dict]], only_exceptions: bool) -> str:
+    references = list({entry["reference"] for _, entry in chunk})
+    cursor.execute(
+        f"""
+        SELECT id, transaction_reference, amount, payment_status
+        FROM payments
+        WHERE transaction_reference IN ({in_clause(references)})
+        """,
+        tuple(references),
+    )
+    by_reference = {p["transaction_reference"]: p for p in cursor.fetchall()}
+
+    out = io.StringIO()
+    writer = csv.writer(out)
+    for line_number, entry in chunk:
+        row = _classify(line_number, entry, by_reference.get(entry["reference"]))
+        if only_exceptions and row[2] == "matched":
+            continue
+        writer.writerow(row)
+    return out.getvalue()
+
+
+def _error_line(line_number, reference: str, value, detail: str) -> str:
+    return _csv_line([line_number, reference, "error", value, "", "", "", detail])
+
+
+def reconcile_statement(
+    path: str,
+    reference_column: str = "transaction_reference",
+    amount_column: str = "amount",
+    only_exceptions: bool = False,
+) -> Iterator[str]:
+    """Stream a CSV report comparing a statement file against recorded payments.
+
+    The statement is read and matched ``RECONCILE_CHUNK_SIZE`` lines at a
+    time, so memory stays flat however long the file is. The file at
+    ``path`` is deleted once the report has been produced.
+    """
+    try:
+        yield _csv_line(REPORT_COLUMNS)
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                reader = csv.DictReader(f)
+                for column in (reference_column, amount_column):
+                    if column not in (reader.fieldnames or []):
+                        yield _error_line("", "", "", f"Missing column '{column}'")
+                        return
+
+                chunk: list[tuple[int, dict]] = []
+                # header is line 1
+                for line_number, record in enumerate(reader, start=2):
+                    reference = (record.get(reference_column) or "").strip()
+                    amount = _parse_amount(record.get(amount_column))
+                    if not reference or amount is None:
+                        yield _error_line(
+                            line_number,
+                            reference,
+                            record.get(amount_column),
+                            "Missing reference or unparseable amount",
+                        )
+                        continue
+                    chunk.append((line_number, {"reference": reference, "amount": amount}))
+                    if len(chunk) >= RECONCILE_CHUNK_SIZE:
+                        yield _reconcile_chunk(cursor, chunk, only_exceptions)
+                        chunk = []
+                if chunk:
+                    yield _reconcile_chunk(cursor, chunk, only_exceptions)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+    finally:
+        os.remove(path)
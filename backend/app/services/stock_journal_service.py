@@ -0,0 +1,162 @@
+from datetime import datetime
+from typing import Optional
+
+from app.database import get_connection
+from app.schemas.stock import StockAsOf
+
+
+def record_movements(
+    db: dict,
+    movements: list[tuple[int, int]],
+    reason: str,
+    reference_id: Optional[int] = None,
+) -> None:
+    """Append (product_id, delta) stock changes to the journal"""
+    movements = [(pid, delta) for pid, delta in movements if delta]
+    if not movements:
+        return
+    created_at = datetime.utcnow()
+    params = []
+    for pid, delta in movements:
+        params.extend([pid, delta, reason, reference_id, created_at])
+    db["cursor"].execute(
+        f"""
+        INSERT INTO stock_movements (product_id, delta, reason, reference_id, created_at)
+        VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(movements))}
+        """,
+        tuple(params),
+    )
+
+
+def record_movements_from_query(
+    db: dict,
+    select_sql: str,
+    params: tuple,
+    reason: str,
+    reference_id: Optional[int] = None,
+) -> None:
+    """Journal the (product_id, delta) rows of a SELECT in one statement"""
+    db["cursor"].execute(
+        f"""
+        INSERT INTO stock_movements (product_id, delta, reason, reference_id, created_at)
+        SELECT m.product_id, m.delta, %s, %s, %s
+        FROM ({select_sql}) m
+        WHERE m.delta <> 0
+        """,
+        (reason, reference_id, datetime.utcnow()) + tuple(params),
+    )
+
+
+def take_snapshots(db: dict, missing_only: bool = False) -> dict:
+    """Checkpoint every product's stock with the last journal entry it includes"""
+    where = (
+        "WHERE NOT EXISTS (SELECT 1 FROM stock_snapshots s WHERE s.product_id = p.id)"
+        if missing_only
+        else ""
+    )
+    cursor = db["cursor"]
+    cursor.execute(
+        f"""
+        INSERT IGNORE INTO stock_snapshots (product_id, taken_at, stock, last_movement_id)
+        SELECT p.id, %s, COALESCE(p.stock, 0),
+               COALESCE((SELECT MAX(m.id) FROM stock_movements m WHERE m.product_id = p.id), 0)
+        FROM products p
+        {where}
+        """,
+        (datetime.utcnow(),),
+    )
+    return {"message": f"Took {cursor.rowcount} stock snapshots", "snapshots": cursor.rowcount}
+
+
+def get_stock_as_of(db: dict, product_id: int, as_of: datetime) -> Optional[StockAsOf]:
+    cursor = db["cursor"]
+    cursor.execute("SELECT stock FROM products WHERE id = %s", (product_id,))
+    product = cursor.fetchone()
+    if not product:
+        return None
+
+    # Replay forward from the latest checkpoint at or before as_of
+    cursor.execute(
+        """
+        SELECT taken_at, stock, last_movement_id FROM stock_snapshots
+        WHERE product_id = %s AND taken_at <= %s
+        ORDER BY taken_at DESC LIMIT 1
+        """,
+        (product_id, as_of),
+    )
+    checkpoint = cursor.fetchone()
+    if checkpoint:
+        cursor.execute(
+            """
+            SELECT COALESCE(SUM(delta), 0) as delta, COUNT(*) as movements
+            FROM stock_movements
+            WHERE product_id = %s AND id > %s AND created_at <= %s
+            """,
+            (product_id, checkpoint["last_movement_id"], as_of),
+        )
+        replay = cursor.fetchone()
+        return StockAsOf(
+            product_id=product_id,
+            as_of=as_of,
+            stock=checkpoint["stock"] + int(replay["delta"]),
+            checkpoint_at=checkpoint["taken_at"],
+            replayed_movements=replay["movements"],
+        )
+
+    # Otherwise unwind backward from the earliest later checkpoint, or from
+    # the live stock when the product has never been checkpointed
+    cursor.execute(
+        """
+        SELECT taken_at, stock, last_movement_id FROM stock_snapshots
+        WHERE product_id = %s AND taken_at > %s
+        ORDER BY taken_at ASC LIMIT 1
+        """,
+        (product_id, as_of),
+    )
+    checkpoint = cursor.fetchone()
+    if checkpoint:
+        start_stock = checkpoint["stock"]
+        upper_clause, upper_params = "AND id <= %s", (checkpoint["last_movement_id"],)
+    else:
+        start_stock = product["stock"] or 0
+        upper_clause, upper_params = "", ()
+    cursor.execute(
+        f"""
+        SELECT COALESCE(SUM(delta), 0) as delta, COUNT(*) as movements
+        FROM stock_movements
+        WHERE product_id = %s AND created_at > %s {upper_clause}
+        """,
+        (product_id, as_of) + upper_params,
+    )
+    replay = cursor.fetchone()
+    return StockAsOf(
+        product_id=product_id,
+        as_of=as_of,
+        stock=start_stock - int(replay["delta"]),
+        checkpoint_at=checkpoint["taken_at"] if checkpoint else None,
+        replayed_movements=replay["movements"],
+    )
+
+
+def run_snapshot_job(missing_only: bool = False) -> dict:
+    """Periodic checkpoint, e.g. from a nightly cron"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        result = take_snapshots({"conn": conn, "cursor": cursor}, missing_only)
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def run_baseline_snapshot_job() -> dict:
+    return run_snapshot_job(missing_only=True)
+
+
+if __name__ == "__main__":
+    print(run_snapshot_job())
@@ -1,20 +1,32 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 from app.schemas.supplier_order import (
     BulkSupplierOrderCreate,
+    ReceivingLedgerEntry,
     SupplierOrderCreate,
     SupplierOrderItemResponse,
     SupplierOrderListResponse,
     SupplierOrderWithItems,
 )
+from app.services import (
+    catalog_service,
+    inventory_valuation_service,
+    stock_journal_service,
+    supplier_service,
+    supplier_stats_service,
+)
+from app.utils.sql import in_clause
 
 
 def calculate_total_cost(items: list[dict]) -> float:
     return sum(i["quantity"] * i["purchase_price"] for i in items)
 
 
-def build_order_response(order_row: dict, items: list[dict]) -> SupplierOrderWithItems:
+def build_order_response(
+    db: dict, order_row: dict, items: list[dict]
+) -> SupplierOrderWithItems:
+    supplier_name = supplier_service.get_supplier_name(db, order_row["supplier_id"])
     item_responses = []
     for it in items:
         item_responses.append(
@@ -31,7 +43,7 @@ def build_order_response(order_row: dict, items: list[dict]) -> SupplierOrderWit
         {
             "id": order_row["id"],
             "supplier_id": order_row["supplier_id"],
-            "supplier_name": order_row.get("supplier_name") or "Unknown",
+            "supplier_name": supplier_name or "Unknown",
             "employee_id": order_row.get("employee_id"),
             "employee_username": order_row.get("employee_username"),
             "status": order_row["status"],
@@ -47,9 +59,8 @@ def get_all_supplier_orders(db: dict) -> List[SupplierOrderListResponse]:
     cursor = db["cursor"]
     cursor.execute(
         """
-        SELECT so.*, s.name as supplier_name, u.username as employee_username
+        SELECT so.*, u.username as employee_username
         FROM supplier_orders so
-        LEFT JOIN suppliers s ON so.supplier_id = s.id
         LEFT JOIN users u ON so.employee_id = u.id
         ORDER BY so.created_at DESC
         """
@@ -72,7 +83,10 @@ def get_all_supplier_orders(db: dict) -> List[SupplierOrderListResponse]:
                 {
                     "id": o["id"],
                     "supplier_id": o["supplier_id"],
-                    "supplier_name": o.get("supplier_name") or "Unknown",
+                    "supplier_name": supplier_service.get_supplier_name(
+                        db, o["supplier_id"]
+                    )
+                    or "Unknown",
                     "employee_id": o.get("employee_id"),
                     "employee_username": o.get("employee_username"),
                     "status": o["status"],
@@ -90,9 +104,8 @@ def get_pending_supplier_orders(db: dict) -> List[SupplierOrderWithItems]:
     cursor = db["cursor"]
     cursor.execute(
         """
-        SELECT so.*, s.name as supplier_name, u.username as employee_username
+        SELECT so.*, u.username as employee_username
         FROM supplier_orders so
-        LEFT JOIN suppliers s ON so.supplier_id = s.id
         LEFT JOIN users u ON so.employee_id = u.id
         WHERE so.status IN (%s, %s)
         ORDER BY so.created_at DESC
@@ -112,7 +125,7 @@ def get_pending_supplier_orders(db: dict) -> List[SupplierOrderWithItems]:
             (o["id"],),
         )
         items = cursor.fetchall()
-        results.append(build_order_response(o, items))
+        results.append(build_order_response(db, o, items))
     return results
 
 
@@ -120,9 +133,8 @@ def get_supplier_order(db: dict, order_id: int) -> SupplierOrderWithItems | None
     cursor = db["cursor"]
     cursor.execute(
         """
-        SELECT so.*, s.name as supplier_name, u.username as employee_username
+        SELECT so.*, u.username as employee_username
         FROM supplier_orders so
-        LEFT JOIN suppliers s ON so.supplier_id = s.id
         LEFT JOIN users u ON so.employee_id = u.id
         WHERE so.id = %s
         """,
@@ -142,7 +154,59 @@ def get_supplier_order(db: dict, order_id: int) -> SupplierOrderWithItems | None
         (order_id,),
     )
     items = cursor.fetchall()
-    return build_order_response(order, items)
+    return build_order_response(db, order, items)
+
+
+def get_or_create_open_order(
+    cursor, supplier_id: int, employee_id: int | None
+) -> int:
+    """Return the supplier's order still in 'processing', creating one if needed.
+
+    The unique open_supplier_id key makes this a single statement, so two
+    first requests for a supplier can't both create an order or deadlock
+    on gap locks; the loser gets the winner's id."""
+    cursor.execute(
+        """
+        INSERT INTO supplier_orders (supplier_id, employee_id, status, created_at)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+        """,
+        (supplier_id, employee_id, "processing", datetime.utcnow()),
+    )
+    return cursor.lastrowid
+
+
+def add_order_items(
+    cursor, order_id: int, items: list[tuple[int, int]], employee_id: int | None
+) -> None:
+    """Upsert lines, adding to the quantity of products already on the order,
+    and record who asked for each quantity"""
+    if not items:
+        return
+    placeholders = ", ".join(["(%s,%s,%s)"] * len(items))
+    params = []
+    for pid, qty in items:
+        params.extend([order_id, pid, qty])
+    cursor.execute(
+        f"""
+        INSERT INTO supplier_order_items (supplier_order_id, product_id, quantity)
+        VALUES {placeholders}
+        ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)
+        """,
+        tuple(params),
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO supplier_order_item_additions
+        (supplier_order_id, product_id, quantity, employee_id)
+        VALUES {", ".join(["(%s,%s,%s,%s)"] * len(items))}
+        """,
+        tuple(
+            value
+            for pid, qty in items
+            for value in (order_id, pid, qty, employee_id)
+        ),
+    )
 
 
 def create_supplier_order(
@@ -151,7 +215,7 @@ def create_supplier_order(
     cursor = db["cursor"]
     # fetch product and supplier
     cursor.execute(
-        "SELECT p.*, s.name as supplier_name FROM products p LEFT JOIN suppliers s ON p.supplier_id = s.id WHERE p.id = %s",
+        "SELECT * FROM products WHERE id = %s",
         (order_data.product_id,),
     )
     product = cursor.fetchone()
@@ -165,30 +229,19 @@ def create_supplier_order(
         if not cursor.fetchone():
             return None
 
-    # create order
-    cursor.execute(
-        "INSERT INTO supplier_orders (supplier_id, employee_id, status, created_at) VALUES (%s,%s,%s,%s)",
-        (
-            product["supplier_id"],
-            order_data.employee_id,
-            "processing",
-            datetime.utcnow(),
-        ),
+    # merge into the supplier's open order, or start a new one
+    order_id = get_or_create_open_order(
+        cursor, product["supplier_id"], order_data.employee_id
     )
-    order_id = cursor.lastrowid
-
-    # create item
-    cursor.execute(
-        "INSERT INTO supplier_order_items (supplier_order_id, product_id, quantity) VALUES (%s,%s,%s)",
-        (order_id, product["id"], order_data.quantity),
+    add_order_items(
+        cursor, order_id, [(product["id"], order_data.quantity)], order_data.employee_id
     )
 
     # reload order + items
     cursor.execute(
         """
-        SELECT so.*, s.name as supplier_name, u.username as employee_username
+        SELECT so.*, u.username as employee_username
         FROM supplier_orders so
-        LEFT JOIN suppliers s ON so.supplier_id = s.id
         LEFT JOIN users u ON so.employee_id = u.id
         WHERE so.id = %s
         """,
@@ -205,7 +258,7 @@ def create_supplier_order(
         (order_id,),
     )
     items = cursor.fetchall()
-    return build_order_response(order, items)
+    return build_order_response(db, order, items)
 
 
 def create_bulk_supplier_order(
@@ -219,28 +272,25 @@ def create_bulk_supplier_order(
 
     # group by supplier
     supplier_items: dict[int, list[tuple[int, int]]] = {}
+    product_ids = list({item.product_id for item in bulk_data.items})
+    if not product_ids:
+        return []
+    cursor.execute(
+        f"SELECT id, supplier_id FROM products WHERE id IN ({in_clause(product_ids)})",
+        tuple(product_ids),
+    )
+    supplier_by_product = {p["id"]: int(p["supplier_id"]) for p in cursor.fetchall()}
     for item in bulk_data.items:
-        cursor.execute(
-            "SELECT id, supplier_id FROM products WHERE id = %s", (item.product_id,)
-        )
-        p = cursor.fetchone()
-        if not p:
+        sid = supplier_by_product.get(item.product_id)
+        if sid is None:
             continue
-        sid = int(p["supplier_id"])
-        supplier_items.setdefault(sid, []).append((p["id"], item.quantity))
+        supplier_items.setdefault(sid, []).append((item.product_id, item.quantity))
 
     created_order_ids = []
-    for supplier_id, items in supplier_items.items():
-        cursor.execute(
-            "INSERT INTO supplier_orders (supplier_id, employee_id, status, created_at) VALUES (%s,%s,%s,%s)",
-            (supplier_id, bulk_data.employee_id, "processing", datetime.utcnow()),
-        )
-        order_id = cursor.lastrowid
-        for pid, qty in items:
-            cursor.execute(
-                "INSERT INTO supplier_order_items (supplier_order_id, product_id, quantity) VALUES (%s,%s,%s)",
-                (order_id, pid, qty),
-            )
+    # in supplier order, so concurrent bulk requests lock open orders alike
+    for supplier_id, items in sorted(supplier_items.items()):
+        order_id = get_or_create_open_order(cursor, supplier_id, bulk_data.employee_id)
+        add_order_items(cursor, order_id, items, bulk_data.employee_id)
         created_order_ids.append(order_id)
 
     # fetch created orders
@@ -248,9 +298,8 @@ def create_bulk_supplier_order(
     for oid in created_order_ids:
         cursor.execute(
             """
-            SELECT so.*, s.name as supplier_name, u.username as employee_username
+            SELECT so.*, u.username as employee_username
             FROM supplier_orders so
-            LEFT JOIN suppliers s ON so.supplier_id = s.id
             LEFT JOIN users u ON so.employee_id = u.id
             WHERE so.id = %s
             """,
@@ -267,35 +316,55 @@ def create_bulk_supplier_order(
             (oid,),
         )
         items = cursor.fetchall()
-        results.append(build_order_response(order, items))
+        results.append(build_order_response(db, order, items))
     return results
 
 
 def mark_as_arrived(db: dict, order_id: int) -> dict | None:
     cursor = db["cursor"]
-    cursor.execute("SELECT status FROM supplier_orders WHERE id = %s", (order_id,))
+    # lock the order so a concurrent arrival waits and isn't counted twice
+    cursor.execute(
+        """
+        SELECT status, supplier_id, created_at FROM supplier_orders
+        WHERE id = %s FOR UPDATE
+        """,
+        (order_id,),
+    )
     o = cursor.fetchone()
     if not o:
         return None
     if o["status"] != "processing":
         return None
+    now = datetime.utcnow()
     cursor.execute(
-        "UPDATE supplier_orders SET status = %s, updated_at = %s WHERE id = %s",
-        ("arrived", datetime.utcnow(), order_id),
+        "UPDATE supplier_orders SET status = %s, arrived_at = %s, updated_at = %s WHERE id = %s",
+        ("arrived", now, now, order_id),
     )
+    supplier_stats_service.record_arrival(db, o["supplier_id"], o["created_at"], now)
     return {"message": "Supplier order marked as arrived"}
 
 
 def complete_supplier_order(db: dict, order_id: int) -> dict | None:
     cursor = db["cursor"]
-    # load order with items and product rows
+    # lock the order so a concurrent completion waits, then finds it gone
     cursor.execute(
         """
-        SELECT soi.quantity, p.id as product_id, p.stock, p.name, p.purchase_price
+        SELECT status, supplier_id, created_at FROM supplier_orders
+        WHERE id = %s FOR UPDATE
+        """,
+        (order_id,),
+    )
+    so = cursor.fetchone()
+    if not so or so["status"] != "arrived":
+        return None
+
+    # load order items with product rows
+    cursor.execute(
+        """
+        SELECT soi.quantity, p.id as product_id, p.name, p.purchase_price
         FROM supplier_order_items soi
         JOIN products p ON soi.product_id = p.id
-        JOIN supplier_orders so ON soi.supplier_order_id = so.id
-        WHERE so.id = %s
+        WHERE soi.supplier_order_id = %s
         """,
         (order_id,),
     )
@@ -303,35 +372,63 @@ def complete_supplier_order(db: dict, order_id: int) -> dict | None:
     if not rows:
         return None
 
-    # check order status
-    cursor.execute("SELECT status FROM supplier_orders WHERE id = %s", (order_id,))
-    so = cursor.fetchone()
-    if not so or so["status"] != "arrived":
-        return None
-
-    stock_updates = []
     for item in rows:
-        new_stock = (item["stock"] or 0) + item["quantity"]
         cursor.execute(
-            "UPDATE products SET stock = %s WHERE id = %s",
-            (new_stock, item["product_id"]),
+            """
+            UPDATE products SET stock = COALESCE(stock, 0) + %s, version = version + 1
+            WHERE id = %s
+            """,
+            (item["quantity"], item["product_id"]),
         )
-        stock_updates.append(
-            {
-                "product_name": item["name"],
-                "quantity_added": item["quantity"],
-                "new_stock": new_stock,
-            }
+    product_ids = [item["product_id"] for item in rows]
+    cursor.execute(
+        f"SELECT id, stock FROM products WHERE id IN ({in_clause(product_ids)})",
+        tuple(product_ids),
+    )
+    new_stock = {r["id"]: r["stock"] for r in cursor.fetchall()}
+    stock_updates = [
+        {
+            "product_name": item["name"],
+            "quantity_added": item["quantity"],
+            "new_stock": new_stock[item["product_id"]],
+        }
+        for item in rows
+    ]
+    stock_deltas = [(item["product_id"], item["quantity"]) for item in rows]
+    inventory_valuation_service.apply_stock_deltas(db, stock_deltas)
+    stock_journal_service.record_movements(db, stock_deltas, "supplier_order", order_id)
+    if stock_deltas:
+        catalog_service.invalidate_catalog(
+            db,
+            where_sql=f"p.id IN ({in_clause(stock_deltas)})",
+            params=tuple(pid for pid, _ in stock_deltas),
         )
 
-    # mark completed and remove order and its items
+    # record received lines in the ledger, then remove order and its items
+    completed_at = datetime.utcnow()
+    cursor.execute(
+        """
+        INSERT INTO supplier_receiving_ledger
+        (supplier_order_id, supplier_id, product_id, quantity, unit_cost, ordered_at, arrived_at, completed_at)
+        SELECT so.id, so.supplier_id, soi.product_id, soi.quantity, p.purchase_price,
+               so.created_at, so.arrived_at, %s
+        FROM supplier_order_items soi
+        JOIN supplier_orders so ON soi.supplier_order_id = so.id
+        JOIN products p ON soi.product_id = p.id
+        WHERE so.id = %s
+        """,
+        (completed_at, order_id),
+    )
+    supplier_stats_service.record_completion(
+        db, so["supplier_id"], so["created_at"], completed_at
+    )
     cursor.execute(
         "DELETE FROM supplier_order_items WHERE supplier_order_id = %s", (order_id,)
     )
     cursor.execute("DELETE FROM supplier_orders WHERE id = %s", (order_id,))
 
     return {
-        "message": f"Order completed and removed. Updated stock for {len(stock_updates)} products.",
+        "message": f"Order completed and moved to receiving history. Updated stock for {len(stock_updates)} products.",
         "stock_updates": stock_updates,
     }
 
@@ -349,3 +446,63 @@ def cancel_supplier_order(db: dict, order_id: int) -> dict | None:
     )
     cursor.execute("DELETE FROM supplier_orders WHERE id = %s", (order_id,))
     return {"message": "Supplier order cancelled"}
+
+
+def get_receiving_history(
+    db: dict,
+    supplier_id: Optional[int] = None,
+    product_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = 500,
+) -> List[ReceivingLedgerEntry]:
+    cursor = db["cursor"]
+    clauses = []
+    params: list = []
+    if supplier_id is not None:
+        clauses.append("l.supplier_id = %s")
+        params.append(supplier_id)
+    if product_id is not None:
+        clauses.append("l.product_id = %s")
+        params.append(product_id)
+    if date_from is not None:
+        clauses.append("l.completed_at >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        clauses.append("l.completed_at < %s")
+        params.append(date_to)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    params.append(limit)
+    cursor.execute(
+        f"""
+        SELECT l.*, p.name as product_name
+        FROM supplier_receiving_ledger l
+        LEFT JOIN products p ON l.product_id = p.id
+        {where}
+        ORDER BY l.completed_at DESC, l.id DESC
+        LIMIT %s
+        """,
+        tuple(params),
+    )
+    return [
+        ReceivingLedgerEntry.model_validate(
+            {
+                "id": r["id"],
+                "supplier_order_id": r["supplier_order_id"],
+                "supplier_id": r["supplier_id"],
+                "supplier_name": supplier_service.get_supplier_name(
+                    db, r["supplier_id"]
+                )
+                or "Unknown",
+                "product_id": r["product_id"],
+                "product_name": r.get("product_name") or "Unknown",
+                "quantity": r["quantity"],
+                "unit_cost": float(r["unit_cost"]),
+                "line_total": r["quantity"] * float(r["unit_cost"]),
+                "ordered_at": r["ordered_at"],
+                "arrived_at": r.get("arrived_at"),
+                "completed_at": r["completed_at"],
+            }
+        )
+        for r in cursor.fetchall()
+    ]
@@ -1,5 +1,11 @@
+import os
+import threading
+import time
 from typing import List
 
+from app.database import get_connection
+from app.utils.cache import bump_version, get_version
+
 SEED_SUPPLIERS = [
     {
         "code": "A",
@@ -238,24 +244,99 @@ SEED_SUPPLIERS = [
 ]
 
 
+SUPPLIER_CACHE_KEY = "suppliers"
+# How long a worker trusts its cached directory before re-checking the version
+SUPPLIER_CACHE_CHECK_SECONDS = float(os.getenv("SUPPLIER_CACHE_CHECK_SECONDS", "5"))
+
+_supplier_cache: dict = {
+    "version": None,
+    "checked_at": 0.0,
+    "rows": [],
+    "brief": [],
+    "by_id": {},
+    "by_code": {},
+}
+_supplier_cache_lock = threading.Lock()
+
+
+def refresh_supplier_cache(db: dict, force: bool = False) -> None:
+    now = time.monotonic()
+    if (
+        not force
+        and _supplier_cache["version"] is not None
+        and now - _supplier_cache["checked_at"] < SUPPLIER_CACHE_CHECK_SECONDS
+    ):
+        return
+
+    with _supplier_cache_lock:
+        cursor = db["cursor"]
+        version = get_version(cursor, SUPPLIER_CACHE_KEY)
+        if force or version != _supplier_cache["version"]:
+            cursor.execute("SELECT * FROM suppliers ORDER BY id")
+            rows = cursor.fetchall()
+            _supplier_cache["rows"] = rows
+            _supplier_cache["brief"] = [
+                {
+                    "id": r["id"],
+                    "code": r["code"],
+                    "name": r["name"],
+                    "full_name": r["full_name"],
+                }
+                for r in sorted(rows, key=lambda r: r["code"])
+            ]
+            _supplier_cache["by_id"] = {r["id"]: r for r in rows}
+            _supplier_cache["by_code"] = {r["code"].upper(): r for r in rows}
+            _supplier_cache["version"] = version
+        _supplier_cache["checked_at"] = now
+
+
+def invalidate_supplier_cache(db: dict) -> None:
+    bump_version(db["cursor"], SUPPLIER_CACHE_KEY)
+    _supplier_cache["checked_at"] = 0.0
+
+
+def preload_supplier_cache() -> None:
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        refresh_supplier_cache({"conn": conn, "cursor": cursor}, force=True)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
 def get_all_suppliers(db: dict) -> List[dict]:
-    cursor = db["cursor"]
-    cursor.execute("SELECT * FROM suppliers ORDER BY id")
-    return cursor.fetchall()
+    refresh_supplier_cache(db)
+    return _supplier_cache["rows"]
 
 
 def get_active_suppliers(db: dict) -> List[dict]:
-    cursor = db["cursor"]
-    cursor.execute("SELECT id, code, name, full_name FROM suppliers ORDER BY code")
-    return cursor.fetchall()
+    refresh_supplier_cache(db)
+    return _supplier_cache["brief"]
 
 
 def get_supplier_by_id(db: dict, supplier_id: int) -> dict | None:
+    refresh_supplier_cache(db)
+    supplier = _supplier_cache["by_id"].get(supplier_id)
+    if supplier:
+        return supplier
+    # Created by another worker since our last version check
     cursor = db["cursor"]
     cursor.execute("SELECT * FROM suppliers WHERE id = %s", (supplier_id,))
     return cursor.fetchone()
 
 
+def get_supplier_by_code(db: dict, code: str) -> dict | None:
+    refresh_supplier_cache(db)
+    return _supplier_cache["by_code"].get(code.strip().upper())
+
+
+def get_supplier_name(db: dict, supplier_id: int) -> str | None:
+    supplier = get_supplier_by_id(db, supplier_id)
+    return supplier["name"] if supplier else None
+
+
 def seed_suppliers(db: dict) -> dict:
     cursor = db["cursor"]
     cursor.execute("SELECT 1 FROM suppliers LIMIT 1")
@@ -277,4 +358,5 @@ def seed_suppliers(db: dict) -> dict:
                 s.get("contact_phone"),
             ),
         )
+    invalidate_supplier_cache(db)
     return {"message": f"Seeded {len(SEED_SUPPLIERS)} suppliers (A-Z Corps)"}
@@ -0,0 +1,139 @@
+import os
+from datetime import datetime
+
+from app.schemas.supplier import SupplierStats
+
+# Weight of the newest sample in the rolling averages
+STATS_ALPHA = 0.2
+# Quantile tracked for the lead-time tail
+LEAD_TIME_QUANTILE = 0.9
+# An arrival counts as on time when it lands within this many hours of ordering
+ON_TIME_THRESHOLD_HOURS = float(os.getenv("SUPPLIER_ON_TIME_HOURS", "72"))
+
+
+def hours_between(start: datetime | None, end: datetime | None) -> float | None:
+    if not start or not end:
+        return None
+    return max((end - start).total_seconds() / 3600, 0.0)
+
+
+def update_estimates(
+    mean: float | None, quantile: float | None, sample: float
+) -> tuple[float, float]:
+    """Fold one sample into an exponential moving mean and a streaming quantile.
+
+    The quantile moves up by ``step * q`` when the sample lies above it and
+    down by ``step * (1 - q)`` otherwise, so it settles where a fraction ``q``
+    of samples fall below it. Both updates are O(1) and need no history.
+    """
+    if mean is None or quantile is None:
+        return sample, sample
+    mean = mean + STATS_ALPHA * (sample - mean)
+    step = STATS_ALPHA * max(mean, 1.0)
+    if sample > quantile:
+        quantile += step * LEAD_TIME_QUANTILE
+    else:
+        quantile -= step * (1 - LEAD_TIME_QUANTILE)
+    return mean, max(quantile, 0.0)
+
+
+def _load_stats_for_update(cursor, supplier_id: int) -> dict:
+    cursor.execute(
+        "INSERT IGNORE INTO supplier_lead_time_stats (supplier_id) VALUES (%s)",
+        (supplier_id,),
+    )
+    cursor.execute(
+        "SELECT * FROM supplier_lead_time_stats WHERE supplier_id = %s FOR UPDATE",
+        (supplier_id,),
+    )
+    return cursor.fetchone()
+
+
+def record_arrival(
+    db: dict, supplier_id: int, ordered_at: datetime, arrived_at: datetime
+) -> None:
+    hours = hours_between(ordered_at, arrived_at)
+    if hours is None:
+        return
+    cursor = db["cursor"]
+    stats = _load_stats_for_update(cursor, supplier_id)
+    mean, p90 = update_estimates(
+        stats["mean_arrival_hours"], stats["p90_arrival_hours"], hours
+    )
+    cursor.execute(
+        """
+        UPDATE supplier_lead_time_stats
+        SET arrivals = arrivals + 1,
+            on_time_arrivals = on_time_arrivals + %s,
+            mean_arrival_hours = %s,
+            p90_arrival_hours = %s,
+            last_arrival_at = %s
+        WHERE supplier_id = %s
+        """,
+        (
+            1 if hours <= ON_TIME_THRESHOLD_HOURS else 0,
+            mean,
+            p90,
+            arrived_at,
+            supplier_id,
+        ),
+    )
+
+
+def record_completion(
+    db: dict, supplier_id: int, ordered_at: datetime, completed_at: datetime
+) -> None:
+    hours = hours_between(ordered_at, completed_at)
+    if hours is None:
+        return
+    cursor = db["cursor"]
+    stats = _load_stats_for_update(cursor, supplier_id)
+    mean, p90 = update_estimates(
+        stats["mean_lead_hours"], stats["p90_lead_hours"], hours
+    )
+    cursor.execute(
+        """
+        UPDATE supplier_lead_time_stats
+        SET completions = completions + 1,
+            mean_lead_hours = %s,
+            p90_lead_hours = %s,
+            last_completed_at = %s
+        WHERE supplier_id = %s
+        """,
+        (mean, p90, completed_at, supplier_id),
+    )
+
+
+def get_supplier_stats(db: dict, supplier_id: int) -> SupplierStats | None:
+    cursor = db["cursor"]
+    cursor.execute(
+        """
+        SELECT s.id as supplier_id, s.name as supplier_name, st.*
+        FROM suppliers s
+        LEFT JOIN supplier_lead_time_stats st ON st.supplier_id = s.id
+        WHERE s.id = %s
+        """,
+        (supplier_id,),
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+
+    arrivals = row.get("arrivals") or 0
+    on_time = row.get("on_time_arrivals") or 0
+    return SupplierStats.model_validate(
+        {
+            "supplier_id": row["supplier_id"],
+            "supplier_name": row["supplier_name"],
+            "arrivals": arrivals,
+            "completions": row.get("completions") or 0,
+            "mean_arrival_hours": row.get("mean_arrival_hours"),
+            "p90_arrival_hours": row.get("p90_arrival_hours"),
+            "mean_lead_hours": row.get("mean_lead_hours"),
+            "p90_lead_hours": row.get("p90_lead_hours"),
+            "on_time_rate": on_time / arrivals if arrivals else None,
+            "on_time_threshold_hours": ON_TIME_THRESHOLD_HOURS,
+            "last_arrival_at": row.get("last_arrival_at"),
+            "last_completed_at": row.get("last_completed_at"),
+        }
+    )
@@ -0,0 +1,134 @@
+import threading
+import time
+from typing import Any, Callable, Generic, Iterable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def get_version(cursor, name: str) -> int:
+    cursor.execute("SELECT version FROM cache_versions WHERE name = %s", (name,))
+    row = cursor.fetchone()
+    return int(row["version"]) if row else 0
+
+
+def bump_version(cursor, name: str) -> None:
+    cursor.execute(
+        """
+        INSERT INTO cache_versions (name, version) VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1
+        """,
+        (name,),
+    )
+
+
+def bump_versions(cursor, names: Iterable[str]) -> None:
+    # sorted, so concurrent writers lock the rows in the same order
+    names = sorted(set(names))
+    if not names:
+        return
+    cursor.execute(
+        f"""
+        INSERT INTO cache_versions (name, version)
+        VALUES {', '.join(['(%s, 1)'] * len(names))}
+        ON DUPLICATE KEY UPDATE version = version + 1
+        """,
+        tuple(names),
+    )
+
+
+def bump_versions_on_commit(db: dict, names: Iterable[str]) -> None:
+    """Bump versions as the last statement of the transaction, so shared
+    rows like the catalog version are locked only until the commit.
+    A bare {"conn", "cursor"} dict bumps them straight away."""
+    pending = db.get("pending_versions")
+    if pending is None:
+        bump_versions(db["cursor"], names)
+    else:
+        pending.update(names)
+
+
+def after_commit(db: dict, callback: Callable[[], None]) -> None:
+    callbacks = db.get("after_commit")
+    if callbacks is None:
+        callback()
+    else:
+        callbacks.append(callback)
+
+
+class CoalescedValue:
+    """A single cached value that is recomputed at most once per TTL.
+
+    Concurrent callers that find the value expired wait on one shared load
+    instead of each running the loader themselves.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._value = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, loader: Callable[[], T]) -> T:
+        if self._value is not None and time.monotonic() < self._expires_at:
+            return self._value
+        with self._lock:
+            # another caller may have refreshed it while we waited
+            if self._value is not None and time.monotonic() < self._expires_at:
+                return self._value
+            self._value = loader()
+            self._expires_at = time.monotonic() + self.ttl_seconds
+            return self._value
+
+    def clear(self) -> None:
+        self._expires_at = 0.0
+
+
+class VersionedValue(Generic[T]):
+    """A per-process value rebuilt whenever its version changes.
+
+    The version (usually read from cache_versions) is re-checked at most once
+    per ``check_seconds``, by one caller while the others wait. A rebuild
+    swaps in a new value, so a reader holding the old one never sees it
+    half-updated.
+    """
+
+    def __init__(self, check_seconds: float):
+        self.check_seconds = check_seconds
+        self._value: Optional[T] = None
+        self._version: Any = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._value is not None
+            and time.monotonic() - self._checked_at < self.check_seconds
+        )
+
+    def peek(self) -> Optional[T]:
+        """The value if it is within its check window, else None"""
+        return self._value if self._is_fresh() else None
+
+    def get(
+        self,
+        read_version: Callable[[], Any],
+        build: Callable[[Any, Optional[T]], T],
+    ) -> T:
+        """``build`` gets the new version and the previous value (None on the
+        first build), so it can reuse the parts that haven't changed."""
+        if self._is_fresh():
+            return self._value
+        with self._lock:
+            # another caller may have checked while we waited
+            if self._is_fresh():
+                return self._value
+            version = read_version()
+            if self._value is None or version != self._version:
+                self._value = build(version, self._value)
+                self._version = version
+            self._checked_at = time.monotonic()
+            return self._value
+
+    def expire(self) -> None:
+        """Re-check the version on the next get"""
+        self._checked_at = 0.0
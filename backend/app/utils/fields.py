@@ -0,0 +1,38 @@
+from decimal import Decimal
+from typing import Any, Optional
+
+from fastapi import HTTPException, Response
+from pydantic import TypeAdapter
+
+_rows_adapter = TypeAdapter(list[dict[str, Any]])
+
+
+def parse_fields(fields: Optional[str], columns: dict[str, str]) -> Optional[list[str]]:
+    """Validate a comma-separated ``?fields=`` value against an endpoint's
+    field -> SQL expression map. None means the full representation."""
+    if fields is None:
+        return None
+    requested = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in columns]
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. "
+            f"Available: {', '.join(columns)}"
+            if unknown
+            else "fields must name at least one field",
+        )
+    return requested
+
+
+def select_list(fields: list[str], columns: dict[str, str]) -> str:
+    return ", ".join(f"{columns[f]} as {f}" for f in fields)
+
+
+def sparse_response(rows: list[dict]) -> Response:
+    """Serialize projected rows directly, skipping the full response model"""
+    for row in rows:
+        for key, value in row.items():
+            if isinstance(value, Decimal):
+                row[key] = float(value)
+    return Response(content=_rows_adapter.dump_json(rows), media_type="application/json")
@@ -0,0 +1,3 @@
+def in_clause(values: list) -> str:
+    """Placeholders for ``IN (...)``; callers must not pass an empty list"""
+    return ", ".join(["%s"] * len(values))
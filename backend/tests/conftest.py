@@ -0,0 +1,97 @@
+import re
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+
+
+class FakeCursor:
+    """Stands in for a pymysql DictCursor. Statements are recorded, and
+    answered by the first rule whose pattern matches the SQL."""
+
+    def __init__(self):
+        self.executed: list[tuple[str, tuple]] = []
+        self.rules: list[tuple[re.Pattern, object]] = []
+        self.rowcount = 0
+        self.lastrowid = None
+        self._rows: list[dict] = []
+
+    def on(self, pattern: str, rows=None, rowcount: int | None = None, error=None):
+        """Answer SQL matching ``pattern`` with ``rows`` (or rows(params)),
+        or raise ``error``"""
+        self.rules.append((re.compile(pattern, re.S | re.I), (rows, rowcount, error)))
+
+    def execute(self, sql: str, params=()):
+        sql = " ".join(sql.split())
+        self.executed.append((sql, tuple(params or ())))
+        self._rows, self.rowcount = [], 0
+        for pattern, (rows, rowcount, error) in self.rules:
+            if pattern.search(sql):
+                if error is not None:
+                    raise error
+                self._rows = list(rows(params) if callable(rows) else rows or [])
+                self.rowcount = len(self._rows) if rowcount is None else rowcount
+                break
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def close(self):
+        pass
+
+    def statements(self, pattern: str) -> list[tuple[str, tuple]]:
+        regex = re.compile(pattern, re.S | re.I)
+        return [(sql, params) for sql, params in self.executed if regex.search(sql)]
+
+
+class FakeConnection:
+    def __init__(self, cursor: FakeCursor):
+        self._cursor = cursor
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def cursor() -> FakeCursor:
+    return FakeCursor()
+
+
+@pytest.fixture
+def db(cursor) -> dict:
+    return {
+        "conn": FakeConnection(cursor),
+        "cursor": cursor,
+        "pending_versions": set(),
+        "after_commit": [],
+    }
+
+
+@pytest.fixture
+def make_client(db):
+    """TestClient for the given routers, with get_db answered by the fake cursor"""
+
+    def make(*routers) -> TestClient:
+        app = FastAPI()
+        for router in routers:
+            app.include_router(router)
+        app.dependency_overrides[get_db] = lambda: db
+        return TestClient(app)
+
+    return make
@@ -0,0 +1,45 @@
+from app.services import customer_order_service
+
+# sales_daily, sales_daily_product and sales_daily_category
+ROLLUP_INSERT = r"^INSERT INTO sales_daily(_product|_category)? \("
+
+
+def rollup_inserts(cursor) -> list[tuple[str, tuple]]:
+    return cursor.statements(ROLLUP_INSERT)
+
+
+def test_completing_an_order_records_it_in_each_rollup_once(db, cursor):
+    cursor.on(r"SELECT status FROM customer_orders", [{"status": "processing"}])
+
+    result = customer_order_service.update_order_status(db, 7, "completed")
+
+    assert result == {"message": "Order status updated to completed"}
+    assert len(rollup_inserts(cursor)) == 3
+    assert all(params == (7,) for _, params in rollup_inserts(cursor))
+
+
+def test_status_is_read_with_a_row_lock(db, cursor):
+    cursor.on(r"SELECT status FROM customer_orders", [{"status": "processing"}])
+
+    customer_order_service.update_order_status(db, 7, "completed")
+
+    select_sql, _ = cursor.executed[0]
+    assert select_sql.endswith("FOR UPDATE")
+
+
+def test_completing_a_completed_order_records_nothing(db, cursor):
+    # what a second, concurrent completion sees once the first has committed
+    cursor.on(r"SELECT status FROM customer_orders", [{"status": "completed"}])
+
+    assert customer_order_service.update_order_status(db, 7, "completed") is None
+    assert rollup_inserts(cursor) == []
+    assert cursor.statements(r"^UPDATE customer_orders") == []
+
+
+def test_other_transitions_do_not_touch_the_rollups(db, cursor):
+    cursor.on(r"SELECT status FROM customer_orders", [{"status": "pending"}])
+
+    customer_order_service.update_order_status(db, 7, "processing")
+
+    assert rollup_inserts(cursor) == []
+    assert len(cursor.statements(r"^UPDATE customer_orders SET status")) == 1
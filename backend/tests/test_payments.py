@@ -0,0 +1,49 @@
+import pymysql
+import pytest
+
+from app.routers import payments
+from app.schemas.payment import PaymentCreate
+from app.services import payment_service
+
+PAYMENT = {
+    "customer_order_id": 12,
+    "amount": 50.0,
+    "payment_method": "cash",
+    "transaction_reference": "TX-1001",
+}
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client(payments.router)
+
+
+def duplicate_key_error() -> pymysql.err.IntegrityError:
+    return pymysql.err.IntegrityError(
+        1062, "Duplicate entry 'TX-1001' for key 'idx_payments_transaction_reference'"
+    )
+
+
+def test_duplicate_transaction_reference_is_a_conflict(client, cursor):
+    cursor.on(r"SELECT id FROM customer_orders", [{"id": 12}])
+    cursor.on(r"^INSERT INTO payments", error=duplicate_key_error())
+
+    response = client.post("/payments/", json=PAYMENT)
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Duplicate transaction reference"
+
+
+def test_service_raises_on_duplicate_reference(db, cursor):
+    cursor.on(r"SELECT id FROM customer_orders", [{"id": 12}])
+    cursor.on(r"^INSERT INTO payments", error=duplicate_key_error())
+
+    with pytest.raises(ValueError, match="Duplicate transaction reference"):
+        payment_service.create_payment(db, PaymentCreate(**PAYMENT))
+
+
+def test_missing_order_is_still_a_bad_request(client, cursor):
+    response = client.post("/payments/", json=PAYMENT)
+
+    assert response.status_code == 400
+    assert cursor.statements(r"^INSERT INTO payments") == []
@@ -0,0 +1,86 @@
+import pytest
+
+from app.routers import products
+from app.schemas.product import ProductBulkFilter, ProductBulkUpdateRequest
+from app.services import product_bulk_service
+
+
+def bulk_request(*rules: dict) -> ProductBulkUpdateRequest:
+    return ProductBulkUpdateRequest.model_validate({"rules": list(rules)})
+
+
+def test_rule_without_a_filter_is_rejected():
+    with pytest.raises(ValueError, match="at least one filter"):
+        product_bulk_service._rule_where(ProductBulkFilter())
+
+
+def test_empty_id_list_matches_nothing():
+    where_sql, params = product_bulk_service._rule_where(ProductBulkFilter(ids=[]))
+    assert where_sql == "1 = 0"
+    assert params == ()
+
+
+def test_filters_are_combined():
+    where_sql, params = product_bulk_service._rule_where(
+        ProductBulkFilter(category="Food", ids=[4, 5])
+    )
+    assert where_sql == "p.category = %s AND p.id IN (%s, %s)"
+    assert params == ("Food", 4, 5)
+
+
+def test_every_rule_is_checked_before_anything_is_written(db, cursor):
+    request = bulk_request(
+        {
+            "field": "selling_price",
+            "operation": "percent",
+            "value": 5,
+            "where": {"category": "Food"},
+        },
+        {"field": "stock", "operation": "set", "value": 0},
+    )
+
+    with pytest.raises(ValueError, match=r"^Rule 1: "):
+        product_bulk_service.bulk_update_products(db, request)
+    assert cursor.executed == []
+
+
+def test_rule_leaving_invalid_values_is_rejected(db, cursor):
+    cursor.on(r"SELECT COUNT\(\*\) as matched", [{"matched": 3, "invalid": 2}])
+    request = bulk_request(
+        {
+            "field": "selling_price",
+            "operation": "add",
+            "value": -100,
+            "where": {"category": "Food"},
+        }
+    )
+
+    with pytest.raises(ValueError, match="Rule 0 would leave 2 products"):
+        product_bulk_service.bulk_update_products(db, request)
+    assert cursor.statements(r"^UPDATE products") == []
+
+
+def test_rule_check_locks_the_matched_rows(db, cursor):
+    cursor.on(r"SELECT COUNT\(\*\) as matched", [{"matched": 0, "invalid": 0}])
+    request = bulk_request(
+        {"field": "stock", "operation": "add", "value": 5, "where": {"supplier_id": 2}}
+    )
+
+    result = product_bulk_service.bulk_update_products(db, request)
+
+    [(check_sql, params)] = cursor.statements(r"SELECT COUNT\(\*\) as matched")
+    assert check_sql.endswith("FOR UPDATE")
+    assert params == (5.0, 2)
+    assert result.rules_matched == [0]
+
+
+def test_invalid_rule_is_a_bad_request(make_client):
+    client = make_client(products.router)
+
+    response = client.patch(
+        "/products/bulk",
+        json={"rules": [{"field": "stock", "operation": "set", "value": 0}]},
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Rule 0: ")
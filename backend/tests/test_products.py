@@ -0,0 +1,118 @@
+import pytest
+from pydantic import ValidationError
+
+from app.routers import products
+from app.schemas.product import ProductCreate, ProductResponse, ProductUpdate
+
+LEGACY_IMAGE_URL = "www.example.com/old-shelf-photo.jpg"
+
+
+def product_row(**overrides) -> dict:
+    row = {
+        "id": 1,
+        "name": "Cogito Vial",
+        "description": None,
+        "selling_price": 19.99,
+        "purchase_price": 9.5,
+        "supplier_id": 3,
+        "stock": 10,
+        "reorder_level": 50,
+        "reorder_amount": 100,
+        "category": "Medical",
+        "image_url": None,
+        "thumbnail_url": None,
+        "image_width": None,
+        "image_height": None,
+        "image_color": None,
+        "version": 4,
+        "created_at": None,
+        "updated_at": None,
+    }
+    return {**row, **overrides}
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client(products.router)
+
+
+def test_get_returns_the_version_as_etag(client, cursor):
+    cursor.on(r"SELECT \* FROM products WHERE id", [product_row()])
+
+    response = client.get("/products/1")
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"4"'
+
+
+def test_put_with_a_stale_if_match_is_a_conflict(client, cursor):
+    cursor.on(r"SELECT \* FROM products WHERE id", [product_row(version=5)])
+
+    response = client.put(
+        "/products/1", json={"stock": 20}, headers={"If-Match": '"4"'}
+    )
+
+    assert response.status_code == 409
+    assert cursor.statements(r"^UPDATE products") == []
+
+
+def test_put_racing_another_write_is_a_conflict(client, cursor):
+    # the row matched If-Match when read, but was written before our UPDATE
+    cursor.on(r"SELECT \* FROM products WHERE id", [product_row()])
+    cursor.on(r"^UPDATE products SET", rowcount=0)
+
+    response = client.put(
+        "/products/1", json={"stock": 20}, headers={"If-Match": '"4"'}
+    )
+
+    assert response.status_code == 409
+    [(sql, params)] = cursor.statements(r"^UPDATE products SET")
+    assert sql.endswith("WHERE id = %s AND version = %s")
+    assert params[-2:] == (1, 4)
+
+
+def test_delete_with_a_stale_if_match_is_a_conflict(client, cursor):
+    cursor.on(r"SELECT \* FROM products WHERE id", [product_row(version=5)])
+
+    response = client.delete("/products/1", headers={"If-Match": '"4"'})
+
+    assert response.status_code == 409
+    assert cursor.statements(r"^DELETE FROM products") == []
+
+
+def test_legacy_image_url_still_loads(client, cursor):
+    cursor.on(
+        r"SELECT \* FROM products WHERE id", [product_row(image_url=LEGACY_IMAGE_URL)]
+    )
+
+    response = client.get("/products/1")
+
+    assert response.status_code == 200
+    assert response.json()["image_url"] == LEGACY_IMAGE_URL
+
+
+def test_response_model_accepts_legacy_image_url():
+    product = ProductResponse.model_validate(product_row(image_url=LEGACY_IMAGE_URL))
+    assert product.image_url == LEGACY_IMAGE_URL
+
+
+@pytest.mark.parametrize("model", [ProductCreate, ProductUpdate])
+def test_input_models_reject_a_non_http_image_url(model):
+    fields = {
+        key: value for key, value in product_row().items() if key in model.model_fields
+    }
+    with pytest.raises(ValidationError):
+        model.model_validate({**fields, "image_url": LEGACY_IMAGE_URL})
+
+
+@pytest.mark.parametrize(
+    "url, stored",
+    [
+        ("https://cdn.example.com/p/1.jpg", "https://cdn.example.com/p/1.jpg"),
+        ("/media/products/1/abc.jpg", "/media/products/1/abc.jpg"),
+        ("  ", None),
+        (None, None),
+    ],
+)
+def test_input_models_accept_http_and_local_image_urls(url, stored):
+    assert ProductUpdate(image_url=url).image_url == stored
@@ -129,10 +129,14 @@ export function EditProductDialog({
 
     try {
       setLoading(true);
+      const { image_url, ...fields } = formData;
       await updateProduct(product.id, {
-        ...formData,
+        ...fields,
         description: formData.description || null,
-        image_url: formData.image_url || null,
+        // older products may have image URLs the API no longer accepts
+        ...(image_url !== (product.image_url || "")
+          ? { image_url: image_url || null }
+          : {}),
       });
 
       setOpen(false);